@@ -0,0 +1,5 @@
+"""
+Benchmarks of the PBK parsing, conversion, validation and plist writing stages.
+
+Run ``PYTHONPATH=src python -m benchmarks --help`` from the repository root.
+"""
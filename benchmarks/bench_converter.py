@@ -0,0 +1,52 @@
+"""
+Benchmark VPNProfileConverter.generate_mobileconfig throughput.
+
+Usage: PYTHONPATH=src python benchmarks/bench_converter.py [ENTRIES] [ROUNDS]
+"""
+
+import sys
+import time
+from pbk2mobileconfig.converter import VPNProfileConverter
+from pbk2mobileconfig.models import VPNEntry
+
+DEFAULT_ENTRIES = 10000
+DEFAULT_ROUNDS = 5
+
+# Windows Type values covering the L2TP, PPTP and IKEv2 payloads
+TYPES = ("4", "2", "10", "8")
+
+
+def make_entries(count: int) -> list:
+    """Build parsed entries with mixed VPN types."""
+    return [
+        VPNEntry(
+            name=f"VPN {i}",
+            type=TYPES[i % len(TYPES)],
+            phone_number=f"vpn{i}.example.com",
+            dns_address="10.0.0.1",
+            dns_suffix="corp.example.com",
+        )
+        for i in range(count)
+    ]
+
+
+def main(count: int, rounds: int) -> None:
+    """Run the benchmark and print the best throughput over all rounds."""
+    entries = make_entries(count)
+    converter = VPNProfileConverter()
+
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        profile = converter.generate_mobileconfig(entries)
+        best = min(best, time.perf_counter() - start)
+        assert len(profile["PayloadContent"]) == count
+
+    print(f"entries:     {count}")
+    print(f"best time:   {best * 1000:.1f} ms")
+    print(f"throughput:  {count / best:,.0f} entries/s")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [DEFAULT_ENTRIES, DEFAULT_ROUNDS][len(args) :]))
@@ -0,0 +1,49 @@
+"""
+Benchmark per-entry parsing cost with a .cms sidecar of growing size.
+
+With the sidecar parsed once per PBKParser the cost per entry should stay
+flat as the number of sections grows.
+
+Usage: PYTHONPATH=src python benchmarks/bench_sidecars.py [SECTIONS ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pbk2mobileconfig.parser import PBKParser
+
+DEFAULT_SIZES = [100, 1000, 5000]
+
+
+def write_profile(directory: str, sections: int) -> str:
+    """Write a PBK file and a matching .cms file with the given section count."""
+    pbk_path = os.path.join(directory, f"profile{sections}.pbk")
+    cms_path = os.path.join(directory, f"profile{sections}.cms")
+    with open(pbk_path, "w", encoding="utf-8") as pbk, open(
+        cms_path, "w", encoding="utf-8"
+    ) as cms:
+        for i in range(sections):
+            pbk.write(f"[VPN {i}]\nType=4\nPhoneNumber=vpn{i}.example.com\n\n")
+            cms.write(f"[VPN {i}]\nDialup=0\nTunnelAddress=vpn{i}.example.com\n\n")
+    return pbk_path
+
+
+def main(sizes: list) -> None:
+    """Run the benchmark and print the per-entry cost for each size."""
+    print(f"{'sections':>10} {'total ms':>10} {'us/entry':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for sections in sizes:
+            path = write_profile(directory, sections)
+            start = time.perf_counter()
+            entries = PBKParser(path).parse()
+            elapsed = time.perf_counter() - start
+            assert len(entries) == sections
+            print(
+                f"{sections:>10} {elapsed * 1000:>10.1f} "
+                f"{elapsed / sections * 1e6:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,161 @@
+"""
+Generator of realistic synthetic phonebooks for benchmarks.
+
+Entries look like the ones Windows writes to rasphone.pbk: a few dozen
+options per section, mixed VPN types, non-VPN sections in between and
+names with non-ASCII characters. Output is deterministic for a given seed.
+"""
+
+import os
+import random
+from typing import Dict, List, Optional, Tuple
+
+# Encodings Windows and Connection Manager write phonebooks in
+ENCODINGS = ("utf-8", "utf-16", "cp1252")
+
+# Windows Type values: PPTP, L2TP and IKEv2 variants
+VPN_TYPES = ("1", "2", "4", "8", "10")
+
+# Share of sections without a Type, e.g. modem or broadband connections
+NON_VPN_RATIO = 0.05
+
+# Share of entries that get a matching section in the .cms sidecar
+SIDECAR_RATIO = 0.5
+
+# Options Windows writes to every entry, with typical values
+FILLER_OPTIONS = (
+    ("Encoding", "1"),
+    ("PBVersion", "4"),
+    ("AutoLogon", "0"),
+    ("UseRasCredentials", "1"),
+    ("LowDateTime", "-1781480480"),
+    ("HighDateTime", "30925371"),
+    ("DialParamsUID", "12345678"),
+    ("ShowMonitorIconInTaskBar", "1"),
+    ("IpPrioritizeRemote", "1"),
+    ("IpInterfaceMetric", "0"),
+    ("IpHeaderCompression", "0"),
+    ("IpAssign", "1"),
+    ("IpNameAssign", "1"),
+    ("IpDnsFlags", "0"),
+    ("IpNBTFlags", "1"),
+    ("TcpWindowSize", "0"),
+    ("UseFlags", "2"),
+    ("IpSecFlags", "0"),
+    ("IpDnsSuffix", ""),
+    ("DisableClassBasedDefaultRoute", "0"),
+    ("DisableMobility", "0"),
+    ("NetworkOutageTime", "0"),
+    ("ProvisionType", "0"),
+    ("PreSharedKey", ""),
+    ("CacheCredentials", "1"),
+    ("NumCustomPolicy", "0"),
+    ("NumEku", "0"),
+    ("UseMachineRootCert", "0"),
+    ("Disable_IKEv2_Fragmentation", "0"),
+    ("PlumbIKEv2TSAsRoutes", "0"),
+    ("NumServers", "0"),
+    ("RouteVersion", "1"),
+    ("NumRoutes", "0"),
+    ("NumNrptRules", "0"),
+    ("AutoTiggerCapable", "0"),
+    ("NumAppIds", "0"),
+    ("NumClassicAppIds", "0"),
+    ("SecurityDescriptor", ""),
+    ("ApnInfoProviderId", ""),
+    ("ApnInfoUsername", ""),
+    ("ApnInfoPassword", ""),
+    ("ApnInfoAccessPoint", ""),
+    ("ApnInfoAuthentication", "1"),
+    ("ApnInfoCompression", "0"),
+    ("DeviceComment", ""),
+    ("LastSelectedPhone", "0"),
+    ("PromoteAlternates", "0"),
+    ("TryNextAlternateOnFail", "1"),
+)
+
+# Words for entry names; some need more than ASCII but fit in cp1252
+NAME_WORDS = ("Office", "Büro", "Zentrale", "Filiale", "Café", "Branch", "HQ")
+
+
+def _entry_name(rng: random.Random, index: int) -> str:
+    """Return a unique entry name."""
+    return f"{rng.choice(NAME_WORDS)} VPN {index}"
+
+
+def _write_entry(lines: List[str], rng: random.Random, name: str) -> None:
+    """Append the lines of one VPN entry."""
+    host = f"vpn{rng.randrange(10000)}.example.com"
+    lines.append(f"[{name}]")
+    lines.append(f"Type={rng.choice(VPN_TYPES)}")
+    lines.extend(f"{key}={value}" for key, value in FILLER_OPTIONS)
+    lines.append(f"PhoneNumber={host}")
+    lines.append(f"Device=WAN Miniport ({rng.choice(('L2TP', 'PPTP', 'IKEv2'))})")
+    lines.append(f"IpDnsAddress=10.{rng.randrange(256)}.0.1")
+    lines.append("IpDns2Address=10.0.0.2")
+    lines.append(f"DataEncryption={rng.choice(('8', '256', '512'))}")
+    lines.append("")
+
+
+def generate_phonebook(
+    count: int, seed: int = 0, sidecar: bool = False
+) -> Tuple[str, Optional[str]]:
+    """
+    Generate a phonebook with ``count`` VPN entries.
+
+    Returns the PBK text and, with ``sidecar``, the text of a ``.cms``
+    file with matching sections for about half of the entries.
+    """
+    rng = random.Random(seed)
+    pbk_lines: List[str] = []
+    cms_lines: List[str] = []
+    for index in range(count):
+        if rng.random() < NON_VPN_RATIO:
+            pbk_lines.extend([f"[Modem {index}]", "Encoding=1", "PBVersion=4", ""])
+
+        name = _entry_name(rng, index)
+        _write_entry(pbk_lines, rng, name)
+
+        if sidecar and rng.random() < SIDECAR_RATIO:
+            cms_lines.extend(
+                [
+                    f"[{name}]",
+                    "Dialup=0",
+                    f"TunnelAddress=vpn{index}.example.com",
+                    f"AdditionalSetting={rng.randrange(1000)}",
+                    "",
+                ]
+            )
+
+    pbk_text = "\r\n".join(pbk_lines)
+    return pbk_text, ("\r\n".join(cms_lines) if sidecar else None)
+
+
+def write_phonebook(
+    directory: str,
+    count: int,
+    encoding: str = "utf-8",
+    sidecar: bool = False,
+    seed: int = 0,
+    name: Optional[str] = None,
+) -> Dict[str, str]:
+    """
+    Write a generated phonebook (and sidecar) into a directory.
+
+    Returns the written paths by extension, e.g. ``{".pbk": ..., ".cms": ...}``.
+    UTF-16 files start with a byte order mark, as written by Windows.
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unsupported encoding: {encoding}")
+
+    pbk_text, cms_text = generate_phonebook(count, seed, sidecar)
+    stem = name or f"synthetic-{count}-{encoding}"
+    paths = {".pbk": os.path.join(directory, stem + ".pbk")}
+    if cms_text is not None:
+        paths[".cms"] = os.path.join(directory, stem + ".cms")
+
+    for extension, text in ((".pbk", pbk_text), (".cms", cms_text)):
+        if extension in paths:
+            with open(paths[extension], "wb") as f:
+                f.write(text.encode(encoding))
+    return paths
@@ -0,0 +1,284 @@
+"""
+Per-stage benchmarks of converting generated phonebooks, with baselines.
+
+Each scenario (entry count, encoding, with or without a .cms sidecar) is
+measured in four stages: parsing (encoding detection, sidecar loading
+and tokenizing), conversion to payloads, validation of the payloads and
+writing the plist. The time of a stage is the best of several rounds;
+its peak memory is measured in a separate round under tracemalloc, which
+would otherwise skew the time.
+"""
+
+import io
+import os
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from pbk2mobileconfig import encoding, index, sidecars
+from pbk2mobileconfig.parser import PBKParser
+from pbk2mobileconfig.converter import VPNProfileConverter
+from pbk2mobileconfig.plistwriter import FORMATS, dump_profile
+from pbk2mobileconfig.validation import validate_profile
+from .generator import ENCODINGS, write_phonebook
+
+DEFAULT_ENTRIES = (100, 1000)
+DEFAULT_ROUNDS = 5
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+# Metrics compared against the baseline; lower is better for both
+COMPARED_METRICS = ("seconds", "peak_bytes")
+
+
+def scenario_name(count: int, encoding_name: str, sidecar: bool) -> str:
+    """Return the key of a scenario in results and baselines."""
+    return f"{count}-{encoding_name}" + ("-cms" if sidecar else "")
+
+
+def _clear_caches() -> None:
+    """Forget cached encodings, indexes and sidecars so every round starts cold."""
+    encoding.clear_cache()
+    index.clear_cache()
+    sidecars.clear_cache()
+
+
+def _measure(
+    run: Callable[[], Any], rounds: int, setup: Callable[[], None] = lambda: None
+) -> Tuple[float, int, Any]:
+    """Return the best time, the peak traced memory and the last result."""
+    best = float("inf")
+    result = None
+    for _ in range(rounds):
+        setup()
+        start = time.perf_counter()
+        result = run()
+        best = min(best, time.perf_counter() - start)
+
+    setup()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak, result
+
+
+def run_scenario(
+    directory: str,
+    count: int,
+    encoding_name: str = "utf-8",
+    sidecar: bool = False,
+    rounds: int = DEFAULT_ROUNDS,
+) -> Dict[str, Dict[str, float]]:
+    """Measure all stages of one scenario and return metrics by stage."""
+    paths = write_phonebook(
+        directory,
+        count,
+        encoding_name,
+        sidecar,
+        name=scenario_name(count, encoding_name, sidecar),
+    )
+    input_bytes = sum(os.path.getsize(path) for path in paths.values())
+    converter = VPNProfileConverter(deterministic_uuids=True)
+
+    def dump(fmt: Any) -> Callable[[], int]:
+        def run() -> int:
+            output = io.BytesIO()
+            dump_profile(profile, output, fmt)
+            return len(output.getvalue())
+
+        return run
+
+    results: Dict[str, Dict[str, float]] = {}
+
+    seconds, peak, entries = _measure(
+        lambda: PBKParser(paths[".pbk"]).parse(), rounds, _clear_caches
+    )
+    results["parse"] = {
+        "seconds": seconds,
+        "peak_bytes": peak,
+        "entries_per_s": len(entries) / seconds,
+        "mb_per_s": input_bytes / seconds / 1e6,
+    }
+
+    seconds, peak, profile = _measure(
+        lambda: converter.generate_mobileconfig(entries), rounds
+    )
+    results["convert"] = {
+        "seconds": seconds,
+        "peak_bytes": peak,
+        "entries_per_s": len(entries) / seconds,
+    }
+
+    seconds, peak, _ = _measure(lambda: validate_profile(profile), rounds)
+    results["validate"] = {
+        "seconds": seconds,
+        "peak_bytes": peak,
+        "entries_per_s": len(entries) / seconds,
+    }
+
+    for stage, fmt in (
+        ("dump-xml", FORMATS["xml"]),
+        ("dump-binary", FORMATS["binary"]),
+    ):
+        seconds, peak, size = _measure(dump(fmt), rounds)
+        results[stage] = {
+            "seconds": seconds,
+            "peak_bytes": peak,
+            "entries_per_s": len(entries) / seconds,
+            "mb_per_s": size / seconds / 1e6,
+        }
+    return results
+
+
+def run_suite(
+    counts: List[int],
+    encodings: List[str],
+    sidecar_modes: List[bool],
+    rounds: int = DEFAULT_ROUNDS,
+    report: Callable[[str, Dict[str, Dict[str, float]]], None] = lambda *args: None,
+) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Run every combination of the given scenario parameters."""
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="pbk2mobileconfig-bench-") as directory:
+        for count in counts:
+            for encoding_name in encodings:
+                for sidecar in sidecar_modes:
+                    name = scenario_name(count, encoding_name, sidecar)
+                    results[name] = run_scenario(
+                        directory, count, encoding_name, sidecar, rounds
+                    )
+                    report(name, results[name])
+    return results
+
+
+def load_baseline(path: str) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Read stored baselines, or nothing if the file does not exist."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path: str, results: Dict[str, Dict[str, Dict[str, float]]]) -> None:
+    """Merge results into the stored baselines."""
+    baseline = load_baseline(path)
+    baseline.update(results)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def find_regressions(
+    results: Dict[str, Dict[str, Dict[str, float]]],
+    baseline: Dict[str, Dict[str, Dict[str, float]]],
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> List[str]:
+    """
+    Compare results against baselines and describe every regression.
+
+    A metric regresses when it exceeds its baseline by more than
+    ``tolerance`` (a fraction). Scenarios without baseline are skipped.
+    """
+    regressions = []
+    for scenario, stages in results.items():
+        for stage, metrics in stages.items():
+            expected = baseline.get(scenario, {}).get(stage, {})
+            for metric in COMPARED_METRICS:
+                if metric not in expected or not expected[metric]:
+                    continue
+                ratio = metrics[metric] / expected[metric]
+                if ratio > 1 + tolerance:
+                    regressions.append(
+                        f"{scenario} {stage} {metric}: {metrics[metric]:.6g} "
+                        f"vs. baseline {expected[metric]:.6g} ({ratio - 1:+.0%})"
+                    )
+    return regressions
+
+
+def _print_scenario(name: str, results: Dict[str, Dict[str, float]]) -> None:
+    """Print the metrics of one scenario as a table."""
+    print(name)
+    for stage, metrics in results.items():
+        throughput = f"{metrics['entries_per_s']:>12,.0f} entries/s"
+        if "mb_per_s" in metrics:
+            throughput += f" {metrics['mb_per_s']:>8.1f} MB/s"
+        print(
+            f"  {stage:<12} {metrics['seconds'] * 1000:>10.2f} ms"
+            f" {metrics['peak_bytes'] / 1e6:>9.2f} MB peak {throughput}"
+        )
+
+
+def main(args: Optional[list] = None) -> int:
+    """Run the benchmark suite from the command line."""
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Measure parsing, conversion and plist writing per stage",
+    )
+    parser.add_argument(
+        "-n",
+        "--entries",
+        type=int,
+        nargs="+",
+        default=list(DEFAULT_ENTRIES),
+        help="Entry counts of the generated phonebooks (1 to 100000)",
+    )
+    parser.add_argument(
+        "--encoding",
+        nargs="+",
+        choices=ENCODINGS,
+        default=list(ENCODINGS),
+        help="Encodings of the generated phonebooks",
+    )
+    parser.add_argument(
+        "--sidecar",
+        choices=("yes", "no", "both"),
+        default="both",
+        help="Whether to generate a .cms sidecar (default: %(default)s)",
+    )
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS)
+    parser.add_argument(
+        "--baseline",
+        default=DEFAULT_BASELINE,
+        help="Baseline file to compare against (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--save", action="store_true", help="Store the results as new baseline"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="Allowed slowdown before reporting a regression (default: %(default)s)",
+    )
+    args = parser.parse_args(args)
+
+    for count in args.entries:
+        if not 1 <= count <= 100000:
+            parser.error(f"entry count out of range: {count}")
+    sidecar_modes = {"yes": [True], "no": [False], "both": [False, True]}
+
+    results = run_suite(
+        args.entries,
+        args.encoding,
+        sidecar_modes[args.sidecar],
+        args.rounds,
+        _print_scenario,
+    )
+
+    if args.save:
+        save_baseline(args.baseline, results)
+        print(f"Baseline saved to: {args.baseline}")
+        return 0
+
+    regressions = find_regressions(
+        results, load_baseline(args.baseline), args.tolerance
+    )
+    for regression in regressions:
+        print(f"Regression: {regression}")
+    return 1 if regressions else 0
@@ -0,0 +1,36 @@
+"""
+Convert Windows VPN profiles (.pbk) to Apple configuration profiles (.mobileconfig).
+"""
+
+__version__ = "0.1.0"
+
+# Public names and their modules, imported on first attribute access so
+# that importing the package (e.g. by the CLI) stays cheap
+_EXPORTS = {
+    "PBKParser": "parser",
+    "ValidationError": "validation",
+    "VPNProfileConverter": "converter",
+    "convert_many": "aio",
+    "convert_pbk": "api",
+    "convert_pbk_bytes": "api",
+    "convert_pbk_for_tenants": "api",
+    "convert_pbk_to_mobileconfig": "api",
+    "validate_profile": "validation",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+
+    value = getattr(import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
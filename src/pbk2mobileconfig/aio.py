@@ -0,0 +1,176 @@
+"""
+Asyncio API for converting many phonebooks from slow storage.
+
+On network mounts (SMB, NFS) the latency of every open and read dominates
+the conversion of a phonebook, while the CPU sits idle. convert_many()
+reads the phonebooks and their sidecar files on a thread pool, up to
+``max_concurrency`` phonebooks at a time, and sends parsing and conversion
+of the contents read to an executor, so that slow reads of some files
+overlap with reads and conversions of others. Results are yielded as
+they finish.
+
+At most ``max_concurrency`` phonebooks are in flight, including finished
+ones whose results the consumer has not taken yet, so a slow consumer
+stops further reads. Leaving the ``async for`` loop early or cancelling
+the consuming task cancels all reads and conversions not yet started.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+from .api import convert_pbk_counted
+from .archive import read_archive_path, split_archive_path
+from .plistwriter import FORMATS
+from .sidecars import find_sidecars
+
+DEFAULT_MAX_CONCURRENCY = 16
+
+# Read threads per phonebook in flight: the phonebook and the directory
+# listing are read together, then up to three sidecars
+READS_PER_PHONEBOOK = 4
+
+
+class ConversionResult(NamedTuple):
+    """Outcome of converting one phonebook of convert_many()."""
+
+    # Position of the path in the ``paths`` given to convert_many()
+    index: int
+    input_path: str
+    entries: int = 0
+    data: Optional[bytes] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        """Whether the phonebook was converted successfully."""
+        return self.error is None
+
+
+def _read_file(path: str) -> bytes:
+    """Read a whole file; runs on the read threads."""
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class _Converter:
+    """Reading and conversion of the phonebooks of one convert_many() call."""
+
+    def __init__(
+        self,
+        readers: Executor,
+        executor: Executor,
+        options: Dict[str, Any],
+        fmt: str,
+    ):
+        self._loop = asyncio.get_running_loop()
+        self._readers = readers
+        self._executor = executor
+        self._options = options
+        self._format = fmt
+        # Archives are kept open per process, see archive.open_archive()
+        self._archive_lock = asyncio.Lock()
+
+    async def _read(self, function: Callable[..., Any], *args: Any) -> Any:
+        """Run a blocking read on the read threads."""
+        return await self._loop.run_in_executor(self._readers, function, *args)
+
+    async def _read_inputs(self, path: str) -> Tuple[bytes, Dict[str, bytes]]:
+        """Read a phonebook and its sidecars, overlapping all reads."""
+        if split_archive_path(path) is not None:
+            async with self._archive_lock:
+                return await self._read(read_archive_path, path)
+
+        pbk_data, paths = await asyncio.gather(
+            self._read(_read_file, path), self._read(find_sidecars, path)
+        )
+        contents = await asyncio.gather(
+            *(self._read(_read_file, sidecar) for sidecar in paths.values())
+        )
+        return pbk_data, dict(zip(paths, contents))
+
+    async def convert(self, index: int, path: str) -> ConversionResult:
+        """Read and convert one phonebook, turning failures into results."""
+        try:
+            pbk_data, sidecars = await self._read_inputs(path)
+            entries, data = await self._loop.run_in_executor(
+                self._executor,
+                functools.partial(
+                    convert_pbk_counted,
+                    pbk_data,
+                    sidecars,
+                    format=self._format,
+                    **self._options,
+                ),
+            )
+        except Exception as e:
+            return ConversionResult(index, path, error=str(e))
+        return ConversionResult(index, path, entries, data)
+
+
+async def convert_many(
+    paths: Iterable[str],
+    format: str = "xml",
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    executor: Optional[Executor] = None,
+    workers: Optional[int] = None,
+    **options: Any,
+) -> AsyncIterator[ConversionResult]:
+    """
+    Convert PBK files concurrently and yield results as they finish.
+
+    ``paths`` may be PBK files or ``<archive>!<member>`` paths and is
+    consumed lazily. Sidecar files are found and read like by
+    convert_pbk_to_mobileconfig(). Parsing and conversion run on
+    ``executor``, by default a process pool with ``workers`` processes
+    that is shut down when the iteration ends. Profiles are returned in
+    ``format`` (``xml`` or ``binary``); remaining keyword arguments are
+    those of convert_pbk(). A failing phonebook does not stop the others;
+    its error is reported in its result.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format: {format}")
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+
+    readers = ThreadPoolExecutor(
+        max_workers=max_concurrency * READS_PER_PHONEBOOK,
+        thread_name_prefix="pbk2mobileconfig-read",
+    )
+    owned = executor is None
+    if executor is None:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    converter = _Converter(readers, executor, options, format)
+    pending: Set["asyncio.Future[ConversionResult]"] = set()
+    inputs = enumerate(paths)
+    try:
+        while True:
+            for index, path in inputs:
+                pending.add(asyncio.ensure_future(converter.convert(index, path)))
+                if len(pending) >= max_concurrency:
+                    break
+            if not pending:
+                return
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        readers.shutdown(wait=False)
+        if owned:
+            executor.shutdown(wait=False)
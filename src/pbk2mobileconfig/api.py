@@ -0,0 +1,196 @@
+"""
+Python API for converting PBK content to configuration profiles.
+
+convert_pbk() and convert_pbk_bytes() work entirely in memory: the PBK
+content and its sidecar files are passed as bytes, text or binary file
+objects and nothing is read from or written to disk.
+convert_pbk_to_mobileconfig() is the file-based counterpart, and
+convert_pbk_for_tenants() writes one profile per tenant from a single
+parse.
+"""
+
+import io
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
+from .encoding import decode_bytes
+from .fsutil import write_atomically
+from .parser import PBKParser
+from .converter import VPNProfileConverter
+from .plistwriter import FORMATS, dump_profile
+from .sidecars import SIDECAR_EXTENSIONS, find_sidecars
+from .validation import Validator
+
+if TYPE_CHECKING:
+    from .tenants import TenantResult
+
+Source = Union[bytes, bytearray, memoryview, str, IO[bytes]]
+
+
+def _read_source(source: Source, name: str) -> str:
+    """Decode PBK or sidecar content given as bytes, text or a file object."""
+    if isinstance(source, str):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return decode_bytes(bytes(source), name)
+    data = source.read()
+    if isinstance(data, str):
+        return data
+    return decode_bytes(data, name)
+
+
+def _sidecar_extension(key: str) -> str:
+    """Normalize a sidecar key such as ``cms`` or ``.CMS`` to ``.cms``."""
+    extension = "." + key.lower().lstrip(".")
+    if extension not in SIDECAR_EXTENSIONS:
+        raise ValueError(f"Unsupported sidecar type: {key}")
+    return extension
+
+
+def _dump(profile: Dict[str, Any], fp: IO[bytes], format: str) -> None:
+    """Serialize a profile in the named property list format."""
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format: {format}")
+    dump_profile(profile, fp, FORMATS[format])
+
+
+def convert_pbk(
+    source: Source,
+    sidecars: Optional[Mapping[str, Source]] = None,
+    entry: Optional[str] = None,
+    strict: bool = False,
+    **options: Any,
+) -> Dict[str, Any]:
+    """
+    Convert PBK content to a configuration profile dictionary.
+
+    ``sidecars`` maps sidecar types (``cms``, ``cmp``, ``inf``) to their
+    contents. With ``entry`` only the named entry is converted. With
+    ``strict`` the payloads are validated and validation.ValidationError
+    lists every problem found. Remaining keyword arguments are passed to
+    VPNProfileConverter.
+    """
+    text = _read_source(source, "<memory>")
+    contents = {}
+    for key, content in (sidecars or {}).items():
+        extension = _sidecar_extension(key)
+        contents[extension] = _read_source(content, f"<memory>{extension}")
+    parser = PBKParser.from_text(text, contents)
+
+    if entry is not None:
+        vpn_config = parser.get_entry(entry)
+        if vpn_config is None:
+            raise ValueError(f"Entry not found: {entry}")
+        vpn_configs = [vpn_config]
+    else:
+        vpn_configs = parser.parse()
+    if not vpn_configs:
+        raise ValueError("No VPN configurations found in the input file")
+
+    if strict:
+        options["validator"] = Validator(strict=True)
+    return VPNProfileConverter(**options).generate_mobileconfig(vpn_configs)
+
+
+def convert_pbk_bytes(
+    source: Source,
+    sidecars: Optional[Mapping[str, Source]] = None,
+    entry: Optional[str] = None,
+    format: str = "xml",
+    **options: Any,
+) -> bytes:
+    """
+    Convert PBK content to a serialized configuration profile.
+
+    ``format`` is ``xml`` or ``binary``; the other arguments are those of
+    convert_pbk().
+    """
+    return convert_pbk_counted(source, sidecars, entry, format, **options)[1]
+
+
+def convert_pbk_counted(
+    source: Source,
+    sidecars: Optional[Mapping[str, Source]] = None,
+    entry: Optional[str] = None,
+    format: str = "xml",
+    **options: Any,
+) -> Tuple[int, bytes]:
+    """
+    Like convert_pbk_bytes(), but also return the number of converted entries.
+
+    Used by the HTTP service and convert_many() to run conversions on an
+    executor.
+    """
+    profile = convert_pbk(source, sidecars, entry, **options)
+    output = io.BytesIO()
+    _dump(profile, output, format)
+    return len(profile["PayloadContent"]), output.getvalue()
+
+
+def convert_pbk_to_mobileconfig(
+    input_path: str,
+    output_path: str,
+    entry: Optional[str] = None,
+    format: str = "xml",
+    **options: Any,
+) -> int:
+    """
+    Convert a PBK file and its sidecar files to a mobileconfig file.
+
+    Returns the number of converted entries. Arguments are those of
+    convert_pbk_bytes(). The file is written under a temporary name and
+    renamed when complete, so an existing profile is never left truncated.
+    """
+    with open(input_path, "rb") as f:
+        source = f.read()
+    sidecars = {}
+    for extension, path in find_sidecars(input_path).items():
+        with open(path, "rb") as f:
+            sidecars[extension] = f.read()
+
+    profile = convert_pbk(source, sidecars, entry, **options)
+    write_atomically(output_path, lambda f: _dump(profile, f, format))
+    return len(profile["PayloadContent"])
+
+
+def convert_pbk_for_tenants(
+    input_path: str,
+    tenants: Iterable[Mapping[str, Any]],
+    output_dir: str,
+    format: str = "xml",
+    workers: Optional[int] = None,
+    **options: Any,
+) -> List["TenantResult"]:
+    """
+    Convert a PBK file once and write a profile for each tenant.
+
+    ``tenants`` are mappings with a ``name`` and VPNProfileConverter
+    options overriding ``options``, as in a tenant manifest (see the
+    tenants module). Profiles are written to
+    ``<output_dir>/<name>.mobileconfig`` on ``workers`` processes.
+    """
+    # Imported here, as it loads the process pool machinery
+    from .tenants import PayloadPrototypes, fan_out, parse_tenants
+
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format: {format}")
+    tenant_list = parse_tenants(tenants)
+    vpn_configs = PBKParser.for_path(input_path).parse()
+    if not vpn_configs:
+        raise ValueError("No VPN configurations found in the input file")
+
+    prototypes = PayloadPrototypes.from_entries(
+        vpn_configs, options.get("include_secrets", False)
+    )
+    return list(
+        fan_out(prototypes, tenant_list, output_dir, options, FORMATS[format], workers)
+    )
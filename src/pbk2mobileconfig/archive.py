@@ -0,0 +1,320 @@
+"""
+Reading PBK files from zip and tar archives and writing profiles into them.
+
+Connection Manager bundles ship the phonebook together with its .cms,
+.cmp and .inf sidecar files. Archive members are read into memory and
+decoded like uploads, so nothing is extracted to disk. A member is
+addressed as ``<archive>!<member>``, e.g. ``bundles.zip!corp/corp.pbk``;
+sidecars are paired with a phonebook by base name within the same
+directory of the archive.
+
+ArchiveWriter adds generated profiles to a new archive, which may also be
+a stream such as stdout.
+"""
+
+import io
+import os
+import time
+import tarfile
+import zipfile
+import posixpath
+from typing import BinaryIO, Dict, List, NamedTuple, Optional, Tuple, Union
+from .sidecars import SIDECAR_EXTENSIONS
+
+MEMBER_SEPARATOR = "!"
+
+ARCHIVE_EXTENSIONS = (
+    ".tar.bz2",
+    ".tar.gz",
+    ".tar.xz",
+    ".tbz2",
+    ".tgz",
+    ".txz",
+    ".tar",
+    ".zip",
+)
+
+PBK_EXTENSION = ".pbk"
+
+# Archive kinds ArchiveWriter can write, by file extension
+OUTPUT_KINDS = {
+    ".zip": "zip",
+    ".tar": "tar",
+    ".tar.gz": "tar.gz",
+    ".tgz": "tar.gz",
+    ".tar.bz2": "tar.bz2",
+    ".tbz2": "tar.bz2",
+    ".tar.xz": "tar.xz",
+    ".txz": "tar.xz",
+}
+
+
+class Bundle(NamedTuple):
+    """A phonebook member and its sidecar members, by extension."""
+
+    pbk: str
+    sidecars: Dict[str, str]
+
+
+def is_archive(path: str) -> bool:
+    """Check whether a path names a supported archive by its extension."""
+    return path.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def archive_stem(path: str) -> str:
+    """Return an archive path without its archive extension."""
+    lower = path.lower()
+    for extension in ARCHIVE_EXTENSIONS:
+        if lower.endswith(extension):
+            return path[: -len(extension)]
+    return path
+
+
+def member_path(archive_path: str, member: str) -> str:
+    """Return the ``<archive>!<member>`` path of an archive member."""
+    return f"{archive_path}{MEMBER_SEPARATOR}{member}"
+
+
+def split_archive_path(path: str) -> Optional[Tuple[str, Optional[str]]]:
+    """
+    Split a path into archive and member if it refers into an archive.
+
+    Returns ``(archive, member)`` for ``<archive>!<member>`` paths,
+    ``(archive, None)`` for a plain archive path and None otherwise,
+    including for existing files whose name merely contains ``!``.
+    """
+    if MEMBER_SEPARATOR in path and os.path.isfile(path):
+        return None
+    start = 0
+    while True:
+        position = path.find(MEMBER_SEPARATOR, start)
+        if position < 0:
+            break
+        if is_archive(path[:position]):
+            return path[:position], path[position + 1 :]
+        start = position + 1
+    if is_archive(path):
+        return path, None
+    return None
+
+
+def _normalize(name: str) -> str:
+    """Normalize a member name, e.g. ``./corp/corp.pbk`` to ``corp/corp.pbk``."""
+    while name.startswith("./"):
+        name = name[2:]
+    return name
+
+
+class Archive:
+    """Read access to the regular file members of a zip or tar archive."""
+
+    def __init__(self, path: str):
+        """Open an archive and index its members."""
+        self.path = path
+        self._zip: Optional[zipfile.ZipFile] = None
+        self._tar: Optional[tarfile.TarFile] = None
+        self._members: Dict[str, Union[zipfile.ZipInfo, tarfile.TarInfo]] = {}
+        self._bundles: Optional[Dict[str, Bundle]] = None
+        if path.lower().endswith(".zip"):
+            self._zip = zipfile.ZipFile(path)
+            for info in self._zip.infolist():
+                if not info.is_dir():
+                    self._members[_normalize(info.filename)] = info
+        else:
+            self._tar = tarfile.open(path, "r:*")
+            for member in self._tar.getmembers():
+                if member.isfile():
+                    self._members[_normalize(member.name)] = member
+        self._order = {name: position for position, name in enumerate(self._members)}
+
+    def __enter__(self) -> "Archive":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the archive file."""
+        if self._zip is not None:
+            self._zip.close()
+        if self._tar is not None:
+            self._tar.close()
+
+    def names(self) -> List[str]:
+        """Return the names of all file members in archive order."""
+        return list(self._members)
+
+    def read(self, name: str) -> bytes:
+        """Return the content of a member."""
+        info = self._members.get(name)
+        if info is None:
+            path = member_path(self.path, name)
+            raise FileNotFoundError(f"File not found: {path}")
+        if isinstance(info, zipfile.ZipInfo):
+            assert self._zip is not None
+            return self._zip.read(info)
+        assert self._tar is not None
+        fp = self._tar.extractfile(info)
+        assert fp is not None
+        with fp:
+            return fp.read()
+
+    def bundles(self) -> List[Bundle]:
+        """Return every phonebook with its sidecars, in archive order."""
+        if self._bundles is None:
+            self._bundles = {bundle.pbk: bundle for bundle in self._find_bundles()}
+        return list(self._bundles.values())
+
+    def _find_bundles(self) -> List[Bundle]:
+        """Pair phonebooks with sidecars of the same base name."""
+        groups: Dict[str, Dict[str, str]] = {}
+        for name in self._members:
+            stem, extension = posixpath.splitext(name)
+            extension = extension.lower()
+            if extension == PBK_EXTENSION or extension in SIDECAR_EXTENSIONS:
+                groups.setdefault(stem.lower(), {}).setdefault(extension, name)
+
+        phonebooks = sorted(
+            (group for group in groups.values() if PBK_EXTENSION in group),
+            key=lambda group: self._order[group[PBK_EXTENSION]],
+        )
+        return [
+            Bundle(
+                group[PBK_EXTENSION],
+                {ext: group[ext] for ext in SIDECAR_EXTENSIONS if ext in group},
+            )
+            for group in phonebooks
+        ]
+
+    def bundle(self, member: Optional[str] = None) -> Bundle:
+        """
+        Return the bundle of a phonebook member.
+
+        Without ``member`` the archive must contain exactly one phonebook.
+        """
+        bundles = self.bundles()
+        if member is None:
+            if len(bundles) != 1:
+                raise ValueError(
+                    f"{self.path} contains {len(bundles)} phonebooks; "
+                    f"choose one as {member_path(self.path, '<member>')}"
+                )
+            return bundles[0]
+        member = _normalize(member)
+        assert self._bundles is not None
+        if member in self._bundles:
+            return self._bundles[member]
+        path = member_path(self.path, member)
+        raise FileNotFoundError(f"File not found: {path}")
+
+    def read_bundle(self, bundle: Bundle) -> Tuple[bytes, Dict[str, bytes]]:
+        """
+        Return the contents of a phonebook and its sidecars.
+
+        Members are read in archive order, so compressed tar archives are
+        read forward instead of being decompressed again from the start.
+        """
+        names = [(PBK_EXTENSION, bundle.pbk)] + list(bundle.sidecars.items())
+        contents = {
+            extension: self.read(name)
+            for extension, name in sorted(names, key=lambda item: self._order[item[1]])
+        }
+        pbk = contents.pop(PBK_EXTENSION)
+        return pbk, contents
+
+
+# The archive most recently opened by this process, see open_archive()
+_open: Optional[Tuple[Tuple[str, int, int], Archive]] = None
+
+
+def read_archive_path(path: str) -> Tuple[bytes, Dict[str, bytes]]:
+    """Return the contents of the phonebook and sidecars an archive path names."""
+    archive = split_archive_path(path)
+    if archive is None:
+        raise ValueError(f"Not an archive path: {path}")
+    archive_file = open_archive(archive[0])
+    return archive_file.read_bundle(archive_file.bundle(archive[1]))
+
+
+def open_archive(path: str) -> Archive:
+    """
+    Return an open Archive, reusing the previous one for the same file.
+
+    Batch workers convert many bundles of the same archive in a row; this
+    keeps the archive and its member index open between them until a
+    different or modified archive is requested.
+    """
+    global _open
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if _open is not None:
+        if _open[0] == key:
+            return _open[1]
+        _open[1].close()
+        _open = None
+    archive = Archive(path)
+    _open = (key, archive)
+    return archive
+
+
+def output_kind(path: str) -> str:
+    """Return the ArchiveWriter kind for an output archive path."""
+    lower = path.lower()
+    for extension, kind in OUTPUT_KINDS.items():
+        if lower.endswith(extension):
+            return kind
+    raise ValueError(f"Unsupported archive type: {path}")
+
+
+class ArchiveWriter:
+    """
+    Writer of generated files into a new zip or tar archive.
+
+    Tar archives are written in stream mode and zip archives with data
+    descriptors where needed, so ``fp`` does not have to be seekable.
+    Compression happens in add(), in the calling thread.
+    """
+
+    def __init__(self, fp: BinaryIO, kind: str = "zip"):
+        """Start an archive of the given kind (see OUTPUT_KINDS) in fp."""
+        self.kind = kind
+        self._zip: Optional[zipfile.ZipFile] = None
+        self._tar: Optional[tarfile.TarFile] = None
+        if kind == "zip":
+            self._zip = zipfile.ZipFile(fp, "w", zipfile.ZIP_DEFLATED)
+        elif kind.startswith("tar"):
+            compression = kind[len("tar.") :] if "." in kind else ""
+            self._tar = tarfile.open(fileobj=fp, mode=f"w|{compression}")
+        else:
+            raise ValueError(f"Unsupported archive type: {kind}")
+
+    def __enter__(self) -> "ArchiveWriter":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def add(self, name: str, data: bytes) -> None:
+        """Add a file with the given member name and content."""
+        now = time.time()
+        if self._zip is not None:
+            info = zipfile.ZipInfo(name, time.localtime(now)[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            self._zip.writestr(info, data)
+        else:
+            assert self._tar is not None
+            tarinfo = tarfile.TarInfo(name)
+            tarinfo.size = len(data)
+            tarinfo.mtime = int(now)
+            tarinfo.mode = 0o644
+            self._tar.addfile(tarinfo, io.BytesIO(data))
+
+    def close(self) -> None:
+        """Write the archive trailer; the underlying file is left open."""
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
@@ -0,0 +1,611 @@
+"""
+Batch conversion of many PBK files on a process pool.
+"""
+
+import io
+import os
+import sys
+import glob
+import json
+import itertools
+import plistlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import (
+    BinaryIO,
+    Callable,
+    Dict,
+    Any,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+from .archive import (
+    ArchiveWriter,
+    archive_stem,
+    is_archive,
+    member_path,
+    open_archive,
+    output_kind,
+    split_archive_path,
+)
+from .cache import ConversionCache, input_key
+from .fsutil import OUTPUT_EXTENSION, atomic_output, chunksize, write_atomically
+from .parser import PBKParser
+from .converter import VPNProfileConverter
+from .dedup import DedupConverter
+from .plistwriter import dump_profile
+from .stats import CountingWriter, Instrumentation
+from .validation import ValidationIssue, Validator
+
+PBK_EXTENSION = ".pbk"
+MANIFEST_PREFIX = "@"
+
+# Output archive path meaning standard output, and the kind written there
+STDOUT = "-"
+STDOUT_KIND = "tar.gz"
+
+# Name of the manifest inside output archives
+ARCHIVE_MANIFEST = "manifest.json"
+
+
+class BatchJob(NamedTuple):
+    """A single input/output pair of a batch run."""
+
+    input_path: str
+    output_path: str
+
+
+class BatchResult(NamedTuple):
+    """Outcome of converting a single batch job."""
+
+    input_path: str
+    output_path: str
+    entries: int = 0
+    error: Optional[str] = None
+    # Entries whose payload was reused from an identical entry (dedup)
+    reused: int = 0
+    # Problems of the generated payloads (validation)
+    issues: Tuple[ValidationIssue, ...] = ()
+
+    @property
+    def ok(self) -> bool:
+        """Whether the job was converted successfully."""
+        return self.error is None
+
+
+def _is_glob(pattern: str) -> bool:
+    """Check whether a source argument contains glob wildcards."""
+    return glob.has_magic(pattern)
+
+
+def _walk_directory(directory: str) -> List[str]:
+    """Find all PBK files below a directory, in a stable order."""
+    found = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(PBK_EXTENSION):
+                found.append(os.path.join(root, name))
+    return found
+
+
+def _read_manifest(manifest_path: str) -> List[str]:
+    """Read input paths from a manifest file, one per line."""
+    base_dir = os.path.dirname(manifest_path)
+    paths = []
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            paths.append(os.path.join(base_dir, line))
+    return paths
+
+
+def collect_inputs(sources: Iterable[str]) -> List[str]:
+    """
+    Expand batch sources into a list of PBK file paths.
+
+    A source can be a directory (searched recursively for ``.pbk`` files),
+    a glob pattern, a manifest file prefixed with ``@`` or a plain path.
+    Zip and tar archives expand to ``<archive>!<member>`` paths of the
+    phonebooks inside them. Duplicates are dropped while preserving the
+    first occurrence.
+    """
+    paths: List[str] = []
+    for source in sources:
+        if source.startswith(MANIFEST_PREFIX):
+            paths.extend(_read_manifest(source[len(MANIFEST_PREFIX) :]))
+        elif os.path.isdir(source):
+            paths.extend(_walk_directory(source))
+        elif _is_glob(source):
+            paths.extend(sorted(glob.glob(source, recursive=True)))
+        else:
+            paths.append(source)
+
+    expanded: List[str] = []
+    for path in paths:
+        if is_archive(path) and os.path.isfile(path):
+            expanded.extend(
+                member_path(path, bundle.pbk) for bundle in open_archive(path).bundles()
+            )
+        else:
+            expanded.append(path)
+
+    seen = set()
+    unique = []
+    for path in expanded:
+        key = os.path.normpath(path)
+        if key not in seen:
+            seen.add(key)
+            unique.append(path)
+    return unique
+
+
+def _layout_path(path: str) -> str:
+    """Return the path of an input as if archives were directories."""
+    archive = split_archive_path(path)
+    if archive is None or archive[1] is None:
+        return path
+    # Dropping ".." keeps outputs of hostile member names in the output dir
+    parts = [part for part in archive[1].split("/") if part not in ("", ".", "..")]
+    return os.path.join(archive_stem(archive[0]), *parts)
+
+
+def plan_jobs(
+    input_paths: List[str], output_dir: str, root: Optional[str] = None
+) -> List[BatchJob]:
+    """
+    Map input files to output files inside ``output_dir``.
+
+    The directory layout relative to ``root`` (by default the common parent
+    of all inputs) is mirrored, so that identically named phonebooks (e.g.
+    many ``rasphone.pbk`` files) do not overwrite each other. Members of
+    an archive are placed like files in a directory named after the
+    archive without its extension.
+    """
+    if not input_paths:
+        return []
+
+    dirs = [
+        os.path.dirname(os.path.abspath(_layout_path(path))) for path in input_paths
+    ]
+    if root is not None:
+        root = os.path.abspath(root)
+    else:
+        try:
+            root = os.path.commonpath(dirs)
+        except ValueError:
+            # Inputs on different drives have no common path
+            root = ""
+
+    jobs = []
+    for path, parent in zip(input_paths, dirs):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        relative = os.path.relpath(parent, root) if root else ""
+        if relative == os.curdir:
+            relative = ""
+        output_path = os.path.join(output_dir, relative, stem + OUTPUT_EXTENSION)
+        jobs.append(BatchJob(path, output_path))
+    return jobs
+
+
+def dump_entries(
+    fp: BinaryIO,
+    converter: VPNProfileConverter,
+    vpn_configs: Iterable[Mapping],
+    fmt: Any = plistlib.FMT_XML,
+    instrumentation: Optional[Instrumentation] = None,
+) -> int:
+    """
+    Stream VPN configurations into a binary file and return the entry count.
+
+    Payloads are converted and written one at a time. With
+    ``instrumentation`` the writing is recorded as the ``dump`` stage.
+    """
+    entries = iter(vpn_configs)
+    first = next(entries, None)
+    if first is None:
+        raise ValueError("No VPN configurations found in the input file")
+
+    count = 0
+
+    def counted() -> Iterator[Mapping]:
+        nonlocal count
+        for config in itertools.chain([first], entries):
+            count += 1
+            yield config
+
+    profile = converter.build_profile(converter.iter_payloads(counted()))
+    if instrumentation is None:
+        dump_profile(profile, fp, fmt)
+    else:
+        with instrumentation.stage("dump") as stats:
+            writer = CountingWriter(fp)
+            dump_profile(profile, writer, fmt)
+            stats.bytes_written += writer.written
+    return count
+
+
+def write_profile(
+    output_path: str,
+    converter: VPNProfileConverter,
+    vpn_configs: Iterable[Mapping],
+    fmt: Any = plistlib.FMT_XML,
+    instrumentation: Optional[Instrumentation] = None,
+) -> int:
+    """
+    Stream VPN configurations into a profile file and return the entry count.
+
+    The file is written under a temporary name and renamed when complete,
+    so a failure halfway never leaves a truncated profile behind. See
+    dump_entries() for the other arguments.
+    """
+    entries = iter(vpn_configs)
+    first = next(entries, None)
+    if first is None:
+        raise ValueError("No VPN configurations found in the input file")
+
+    count = 0
+
+    def write(f: BinaryIO) -> None:
+        nonlocal count
+        configs = itertools.chain([first], entries)
+        count = dump_entries(f, converter, configs, fmt, instrumentation)
+
+    write_atomically(output_path, write)
+    return count
+
+
+def convert_file(
+    input_path: str,
+    output_path: str,
+    converter: VPNProfileConverter,
+    fmt: Any = plistlib.FMT_XML,
+    cache: Optional[ConversionCache] = None,
+    entry: Optional[str] = None,
+    instrumentation: Optional[Instrumentation] = None,
+) -> int:
+    """
+    Convert a single PBK file and return the number of entries written.
+
+    With ``entry`` only the named entry is converted. With a ``cache``, a
+    previous conversion of identical inputs and options is copied instead
+    of parsing and converting again. ``instrumentation`` records the
+    ``cache``, ``sidecars``, ``parse`` and ``dump`` stages; pass the same
+    object to the converter to record ``convert`` as well. Conversions
+    with a converter validator are stored in the cache but never read
+    from it, so that every payload is validated.
+    """
+    if cache is not None and converter.validator is not None:
+        key = _cache_key(input_path, converter, fmt, entry)
+    elif cache is not None:
+        hit = None
+        if instrumentation is not None:
+            with instrumentation.stage("cache") as stats:
+                reads: List[int] = []
+                key, hit = _cache_lookup(
+                    cache, input_path, converter, fmt, entry, reads
+                )
+                # The inputs are hashed on every lookup, hit or miss
+                stats.bytes_read += sum(reads)
+                if hit is not None:
+                    stats.entries += hit[0]
+                    stats.bytes_read += len(hit[1])
+        else:
+            key, hit = _cache_lookup(cache, input_path, converter, fmt, entry)
+        if hit is not None:
+            count, data = hit
+            write_atomically(output_path, lambda f: f.write(data))
+            return count
+
+    parser = PBKParser.for_path(input_path, instrumentation)
+    if entry is not None:
+        vpn_config = parser.get_entry(entry)
+        if vpn_config is None:
+            raise ValueError(f"Entry not found: {entry}")
+        entries: Iterable[Mapping] = [vpn_config]
+    else:
+        entries = parser.iter_entries()
+    count = write_profile(output_path, converter, entries, fmt, instrumentation)
+
+    if cache is not None:
+        with open(output_path, "rb") as f:
+            cache.put(key, count, f.read())
+    return count
+
+
+def render_file(
+    input_path: str,
+    converter: VPNProfileConverter,
+    fmt: Any = plistlib.FMT_XML,
+    cache: Optional[ConversionCache] = None,
+) -> Tuple[int, bytes]:
+    """
+    Convert a single PBK file in memory; return the entry count and profile.
+
+    Like convert_file(), but the profile is returned instead of written,
+    e.g. for adding it to an output archive.
+    """
+    if cache is not None and converter.validator is not None:
+        key = _cache_key(input_path, converter, fmt, None)
+    elif cache is not None:
+        key, hit = _cache_lookup(cache, input_path, converter, fmt, None)
+        if hit is not None:
+            return hit
+
+    output = io.BytesIO()
+    entries = PBKParser.for_path(input_path).iter_entries()
+    count = dump_entries(output, converter, entries, fmt)
+    data = output.getvalue()
+    if cache is not None:
+        cache.put(key, count, data)
+    return count, data
+
+
+def _cache_key(
+    input_path: str,
+    converter: VPNProfileConverter,
+    fmt: Any,
+    entry: Optional[str],
+    reads: Optional[List[int]] = None,
+) -> str:
+    """Return the cache key of a conversion; hashed sizes go to ``reads``."""
+    return input_key(
+        input_path,
+        {"converter": converter.options, "format": fmt.name, "entry": entry},
+        reads,
+    )
+
+
+def _cache_lookup(
+    cache: ConversionCache,
+    input_path: str,
+    converter: VPNProfileConverter,
+    fmt: Any,
+    entry: Optional[str],
+    reads: Optional[List[int]] = None,
+) -> Tuple[str, Optional[Tuple[int, bytes]]]:
+    """Return the cache key of a conversion and the cached result, if any."""
+    key = _cache_key(input_path, converter, fmt, entry, reads)
+    return key, cache.get(key)
+
+
+# Settings of the current worker process, set by _init_worker
+_worker_converter: Optional[VPNProfileConverter] = None
+_worker_format: Any = plistlib.FMT_XML
+_worker_cache: Optional[ConversionCache] = None
+
+
+def _init_worker(
+    options: Dict[str, Any],
+    fmt: Any = plistlib.FMT_XML,
+    cache: Optional[ConversionCache] = None,
+    dedup: bool = False,
+    validate: Optional[str] = None,
+) -> None:
+    """Create the per-process converter used by _convert_job."""
+    global _worker_converter, _worker_format, _worker_cache
+    validator = None if validate is None else Validator(validate == "strict")
+    if dedup:
+        _worker_converter = DedupConverter(**options, validator=validator)
+    else:
+        _worker_converter = VPNProfileConverter(**options, validator=validator)
+    _worker_format = fmt
+    _worker_cache = cache
+
+
+def _take_issues() -> Tuple[ValidationIssue, ...]:
+    """Return and forget the issues the worker validator found in a job."""
+    assert _worker_converter is not None
+    validator = _worker_converter.validator
+    if validator is None:
+        return ()
+    issues = tuple(validator.issues)
+    validator.issues.clear()
+    return issues
+
+
+def _convert_job(job: BatchJob) -> BatchResult:
+    """Convert one job, turning any failure into an error result."""
+    assert _worker_converter is not None
+    hits = getattr(_worker_converter, "hits", 0)
+    try:
+        entries = convert_file(
+            job.input_path,
+            job.output_path,
+            _worker_converter,
+            _worker_format,
+            _worker_cache,
+        )
+    except Exception as e:
+        return BatchResult(
+            job.input_path, job.output_path, error=str(e), issues=_take_issues()
+        )
+    reused = getattr(_worker_converter, "hits", 0) - hits
+    return BatchResult(
+        job.input_path, job.output_path, entries, reused=reused, issues=_take_issues()
+    )
+
+
+def _render_job(job: BatchJob) -> Tuple[BatchResult, Optional[bytes]]:
+    """Convert one job in memory, turning any failure into an error result."""
+    assert _worker_converter is not None
+    hits = getattr(_worker_converter, "hits", 0)
+    try:
+        entries, data = render_file(
+            job.input_path, _worker_converter, _worker_format, _worker_cache
+        )
+    except Exception as e:
+        result = BatchResult(
+            job.input_path, job.output_path, error=str(e), issues=_take_issues()
+        )
+        return result, None
+    reused = getattr(_worker_converter, "hits", 0) - hits
+    result = BatchResult(
+        job.input_path, job.output_path, entries, reused=reused, issues=_take_issues()
+    )
+    return result, data
+
+
+class ConversionPool:
+    """
+    Long-lived pool of worker processes converting batch jobs.
+
+    Each worker imports the package and builds its converter once, so
+    repeated calls to convert() (e.g. from watch mode) stay warm. With a
+    single worker, jobs are converted in the current process. With
+    ``dedup`` each worker converts identical entries only once, see
+    DedupConverter. With ``validate`` (a validation.MODES value) the
+    payloads are validated and results carry their issues; in ``strict``
+    mode jobs with issues fail.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        options: Optional[Dict[str, Any]] = None,
+        fmt: Any = plistlib.FMT_XML,
+        cache: Optional[ConversionCache] = None,
+        dedup: bool = False,
+        validate: Optional[str] = None,
+    ):
+        """Initialize pool; worker processes are started on first use."""
+        self.workers = workers or os.cpu_count() or 1
+        self._initargs = (options or {}, fmt, cache, dedup, validate)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._local_ready = False
+
+    def __enter__(self) -> "ConversionPool":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Shut down the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def convert(self, jobs: List[BatchJob]) -> Iterator[BatchResult]:
+        """Convert jobs and yield their results in job order."""
+        return self._map(_convert_job, jobs)
+
+    def render(
+        self, jobs: List[BatchJob]
+    ) -> Iterator[Tuple[BatchResult, Optional[bytes]]]:
+        """
+        Convert jobs in memory and yield results with profiles in job order.
+
+        The ``output_path`` of the jobs is not written; profiles are None
+        for failed jobs.
+        """
+        return self._map(_render_job, jobs)
+
+    def _map(
+        self, function: Callable[[BatchJob], Any], jobs: List[BatchJob]
+    ) -> Iterator[Any]:
+        """Apply a job function on the workers, yielding results in job order."""
+        if self.workers == 1:
+            if not self._local_ready:
+                _init_worker(*self._initargs)
+                self._local_ready = True
+            for job in jobs:
+                yield function(job)
+            return
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=self._initargs,
+            )
+        yield from self._executor.map(
+            function, jobs, chunksize=chunksize(len(jobs), self.workers)
+        )
+
+
+def run_batch(
+    jobs: List[BatchJob],
+    workers: Optional[int] = None,
+    options: Optional[Dict[str, Any]] = None,
+    fmt: Any = plistlib.FMT_XML,
+    cache: Optional[ConversionCache] = None,
+    dedup: bool = False,
+    validate: Optional[str] = None,
+) -> Iterator[BatchResult]:
+    """
+    Convert jobs on a pool of worker processes.
+
+    Results are yielded in job order. A failing job never stops the run;
+    its error is reported in the corresponding ``BatchResult``. With
+    ``workers=1`` the jobs are converted in the current process.
+    ``options`` are passed to VPNProfileConverter, ``fmt`` selects the
+    plistlib output format and ``cache`` is shared by all workers. With
+    ``dedup`` identical entries are converted once per worker and the
+    results report how many entries were reused. ``validate`` is
+    described in ConversionPool.
+    """
+    workers = min(workers or os.cpu_count() or 1, max(len(jobs), 1))
+    with ConversionPool(workers, options, fmt, cache, dedup, validate) as pool:
+        yield from pool.convert(jobs)
+
+
+def run_batch_to_archive(
+    jobs: List[BatchJob],
+    archive_path: str,
+    workers: Optional[int] = None,
+    options: Optional[Dict[str, Any]] = None,
+    fmt: Any = plistlib.FMT_XML,
+    cache: Optional[ConversionCache] = None,
+    dedup: bool = False,
+    validate: Optional[str] = None,
+) -> Iterator[BatchResult]:
+    """
+    Convert jobs and stream the profiles into a single archive.
+
+    The ``output_path`` of each job is its member name inside the archive
+    (see plan_jobs() with an empty output directory). Workers return the
+    profiles instead of writing files, and this process compresses them
+    into the archive while the workers go on converting. The archive ends
+    with a JSON manifest of all inputs, member names and errors. With
+    ``archive_path`` ``-`` a gzipped tar stream is written to stdout.
+    Other arguments are those of run_batch().
+    """
+    workers = min(workers or os.cpu_count() or 1, max(len(jobs), 1))
+    manifest: Dict[str, List[Dict[str, Any]]] = {"profiles": [], "errors": []}
+
+    def write(fp: BinaryIO, kind: str) -> Iterator[BatchResult]:
+        with ConversionPool(workers, options, fmt, cache, dedup, validate) as pool:
+            with ArchiveWriter(fp, kind) as archive:
+                for result, data in pool.render(jobs):
+                    name = result.output_path.replace(os.sep, "/")
+                    if data is not None:
+                        archive.add(name, data)
+                        manifest["profiles"].append(
+                            {
+                                "input": result.input_path,
+                                "file": name,
+                                "entries": result.entries,
+                            }
+                        )
+                    else:
+                        manifest["errors"].append(
+                            {"input": result.input_path, "error": result.error}
+                        )
+                    yield result
+                data = json.dumps(manifest, indent=2, ensure_ascii=False)
+                archive.add(ARCHIVE_MANIFEST, data.encode("utf-8") + b"\n")
+
+    if archive_path == STDOUT:
+        yield from write(sys.stdout.buffer, STDOUT_KIND)
+        sys.stdout.buffer.flush()
+        return
+    kind = output_kind(archive_path)
+    with atomic_output(archive_path) as fp:
+        yield from write(fp, kind)
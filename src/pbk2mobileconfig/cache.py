@@ -0,0 +1,141 @@
+"""
+Content-addressed on-disk cache of converted profiles.
+
+A cache key is the SHA-256 of everything that determines the output: the
+tool version, the converter options, the output format and the bytes of
+the PBK file and of the sidecar files the parser would load with it, on
+disk or inside an archive.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+from . import __version__
+from .sidecars import find_sidecars
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+ENTRY_SUFFIX = ".profile"
+
+
+def input_key(
+    pbk_path: str, options: Dict[str, Any], reads: Optional[List[int]] = None
+) -> str:
+    """
+    Compute the cache key of converting a PBK file with the given options.
+
+    ``options`` must be JSON-serializable and contain everything besides the
+    input files that affects the output, e.g. converter options and format.
+    The sizes of the hashed files are appended to ``reads``.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"pbk2mobileconfig {__version__}\n".encode())
+    digest.update(json.dumps(options, sort_keys=True).encode())
+
+    for ext, data in _input_files(pbk_path):
+        digest.update(f"\n{ext}:{len(data)}\n".encode())
+        digest.update(data)
+        if reads is not None:
+            reads.append(len(data))
+
+    return digest.hexdigest()
+
+
+def _input_files(pbk_path: str) -> List[Tuple[str, bytes]]:
+    """Return the contents of a PBK file and its sidecars, by extension."""
+    from .archive import read_archive_path, split_archive_path
+
+    if split_archive_path(pbk_path) is not None:
+        pbk, sidecars = read_archive_path(pbk_path)
+        return [("", pbk)] + sorted(sidecars.items())
+
+    files = []
+    for ext, path in [("", pbk_path)] + sorted(find_sidecars(pbk_path).items()):
+        with open(path, "rb") as f:
+            files.append((ext, f.read()))
+    return files
+
+
+class ConversionCache:
+    """
+    Directory of converted profiles with least-recently-used eviction.
+
+    Each entry stores the number of converted entries on its first line,
+    followed by the profile bytes. Hits refresh the modification time,
+    which evict() uses as the recency of an entry.
+    """
+
+    def __init__(self, directory: str, max_size: int = DEFAULT_MAX_SIZE):
+        """Initialize cache in a directory, limited to max_size bytes."""
+        self.directory = directory
+        self.max_size = max_size
+
+    def _path(self, key: str) -> str:
+        """Return the file path of a cache entry."""
+        return os.path.join(self.directory, key[:2], key + ENTRY_SUFFIX)
+
+    def get(self, key: str) -> Optional[Tuple[int, bytes]]:
+        """Return the entry count and profile bytes for a key, if cached."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                count = int(f.readline())
+                data = f.read()
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return count, data
+
+    def put(self, key: str, count: int, data: bytes) -> None:
+        """Store a converted profile under a key."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(b"%d\n" % count)
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """List (mtime, size, path) of all cache entries."""
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(ENTRY_SUFFIX):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def size(self) -> int:
+        """Return the total size of all cache entries in bytes."""
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self) -> int:
+        """
+        Remove least recently used entries until the cache fits max_size.
+
+        Returns the number of removed entries.
+        """
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
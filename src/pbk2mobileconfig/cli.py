@@ -1,22 +1,39 @@
 """
 Command-line interface for pbk2mobileconfig converter.
+
+Only what a subcommand needs is imported, when it runs: the parser,
+converter, plistlib and chardet are not loaded for ``--help`` or
+``--version``, and asyncio only for ``serve``.
 """
 
-import argparse
+import os
 import sys
-import plistlib
-from typing import Optional
-from .parser import PBKParser
-from .converter import VPNProfileConverter
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Mapping, Optional
+from . import __version__
 
+if TYPE_CHECKING:
+    import argparse
+    from .batch import BatchResult
+    from .cache import ConversionCache
+    from .converter import VPNProfileConverter
+    from .stats import Instrumentation
 
-def main(args: Optional[list] = None) -> int:
-    """Main entry point for the command line interface."""
-    parser = argparse.ArgumentParser(
-        description="Convert Windows VPN profiles (.pbk) to Apple configuration profiles (.mobileconfig)"
-    )
-    parser.add_argument("input", help="Input .pbk file path")
-    parser.add_argument("output", help="Output .mobileconfig file path")
+# Names of the plistwriter.FORMATS, without importing plistlib for --help
+FORMAT_NAMES = ("binary", "xml")
+
+VERSION_FLAGS = ("--version", "-V")
+
+# First arguments that select a subcommand, unless a file of that name exists
+SUBCOMMANDS = ("batch", "serve")
+
+
+def _version() -> str:
+    """Return the version banner."""
+    return f"pbk2mobileconfig {__version__}"
+
+
+def _add_profile_arguments(parser: "argparse.ArgumentParser") -> None:
+    """Add the profile options shared by all conversion modes."""
     parser.add_argument(
         "--org", help="Organization name for the profile", default="Organization"
     )
@@ -34,32 +51,693 @@ def main(args: Optional[list] = None) -> int:
     parser.add_argument(
         "--description", help="Profile description", default="VPN Configuration"
     )
+    parser.add_argument(
+        "--format",
+        help="Property list format of the output (default: xml)",
+        choices=FORMAT_NAMES,
+        default="xml",
+    )
+    parser.add_argument(
+        "--deterministic-uuids",
+        help="Derive payload UUIDs from the identifier and entry names",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--include-secrets",
+        help="Write the pre-shared keys of the phonebook into the profile "
+        "instead of leaving them to be entered on the device",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="Reuse earlier conversions of unchanged inputs from this directory "
+        "(implies --deterministic-uuids)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        help="Maximal cache size in MB (default: 256)",
+        type=int,
+    )
+    validation = parser.add_mutually_exclusive_group()
+    validation.add_argument(
+        "--validate",
+        help="Check the generated payloads and print every problem as a warning",
+        action="store_true",
+    )
+    validation.add_argument(
+        "--strict",
+        help="Check the generated payloads and fail without writing a profile "
+        "if any is invalid",
+        action="store_true",
+    )
+
+
+def _parse_size(value: str) -> int:
+    """Parse a byte count with an optional K or M suffix for argparse."""
+    import argparse
+
+    units = {"k": 1024, "m": 1024 * 1024}
+    factor = units.get(value[-1:].lower(), 1)
+    digits = value[:-1] if factor > 1 else value
+    try:
+        size = int(digits) * factor
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size: {value}")
+    if size < 1:
+        raise argparse.ArgumentTypeError(f"size must be positive: {value}")
+    return size
+
+
+def _converter_options(args: "argparse.Namespace") -> Dict[str, Any]:
+    """Build VPNProfileConverter options from parsed arguments."""
+    return {
+        "organization": args.org,
+        "identifier": args.identifier,
+        "removable": args.removable,
+        "deterministic_uuids": args.deterministic_uuids or bool(args.cache_dir),
+        "include_secrets": args.include_secrets,
+    }
+
+
+def _validation_mode(args: "argparse.Namespace") -> Optional[str]:
+    """Return the validation.MODES value requested by the arguments, if any."""
+    if args.strict:
+        return "strict"
+    if args.validate:
+        return "warn"
+    return None
+
+
+def _print_issues(issues: Iterable[Any], label: str = "Warning") -> None:
+    """Print validation issues to stderr, one per line."""
+    for issue in issues:
+        print(f"{label}: {issue}", file=sys.stderr)
+
+
+def _validate_entries(
+    converter: "VPNProfileConverter", vpn_configs: List[Mapping]
+) -> None:
+    """Validate entries up front where they are converted elsewhere."""
+    if converter.validator is not None:
+        for _ in converter.validator.checked(
+            map(converter.convert_vpn_config, vpn_configs)
+        ):
+            pass
+
+
+def _conversion_cache(args: "argparse.Namespace") -> Optional["ConversionCache"]:
+    """Create the conversion cache requested by the arguments, if any."""
+    if not args.cache_dir:
+        return None
+    from .cache import DEFAULT_MAX_SIZE, ConversionCache
+
+    if args.cache_size is None:
+        return ConversionCache(args.cache_dir, DEFAULT_MAX_SIZE)
+    return ConversionCache(args.cache_dir, args.cache_size * 1024 * 1024)
+
+
+def batch_main(args: Optional[list] = None) -> int:
+    """Entry point for converting many PBK files at once."""
+    import argparse
+    from .watch import DEFAULT_DEBOUNCE, DEFAULT_INTERVAL
+
+    parser = argparse.ArgumentParser(
+        prog="pbk2mobileconfig batch",
+        description="Convert many Windows VPN profiles (.pbk) in parallel",
+    )
+    parser.add_argument(
+        "sources",
+        nargs="+",
+        help="Input directories, glob patterns, .pbk files, zip/tar archives "
+        "or @manifest files",
+    )
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("-o", "--output-dir", help="Directory for .mobileconfig files")
+    output.add_argument(
+        "--output-archive",
+        metavar="ARCHIVE",
+        help="Stream all profiles and a manifest into a single .zip, .tar, "
+        ".tar.gz, .tar.bz2 or .tar.xz archive, or '-' for a gzipped tar "
+        "stream on stdout",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="Convert identical entries found in many phonebooks only once "
+        "and report how many were reused",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and reconvert phonebooks whenever they or their "
+        "sidecars change (directory sources only)",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=DEFAULT_INTERVAL,
+        help="Polling interval in seconds in watch mode (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=DEFAULT_DEBOUNCE,
+        help="Seconds without further changes before reconverting "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--polling",
+        action="store_true",
+        help="Detect changes by polling even where inotify is available",
+    )
+    _add_profile_arguments(parser)
 
     args = parser.parse_args(args)
 
+    if args.watch:
+        if args.output_archive:
+            parser.error("--watch requires --output-dir")
+        return _watch(args)
+
+    from .archive import output_kind
+    from .batch import (
+        STDOUT,
+        collect_inputs,
+        plan_jobs,
+        run_batch,
+        run_batch_to_archive,
+    )
+    from .plistwriter import FORMATS
+
+    if args.output_archive not in (None, STDOUT):
+        try:
+            output_kind(args.output_archive)
+        except ValueError as e:
+            parser.error(str(e))
+
+    # Keep stdout clean when the archive is streamed to it
+    out = sys.stderr if args.output_archive == STDOUT else sys.stdout
     try:
-        # Parse PBK file
-        pbk_parser = PBKParser(args.input)
-        vpn_configs = pbk_parser.parse()
+        jobs = plan_jobs(collect_inputs(args.sources), args.output_dir or "")
+    except OSError as e:
+        print(f"Error: {e}", file=out)
+        return 1
+
+    if not jobs:
+        print("No input files found.", file=out)
+        return 1
+
+    cache = _conversion_cache(args)
+    converted = 0
+    failed = 0
+    entries = 0
+    reused = 0
+    batch_options: Dict[str, Any] = {
+        "workers": args.workers,
+        "options": _converter_options(args),
+        "fmt": FORMATS[args.format],
+        "cache": cache,
+        "dedup": args.dedup,
+        "validate": _validation_mode(args),
+    }
+    if args.output_archive:
+        results = run_batch_to_archive(jobs, args.output_archive, **batch_options)
+    else:
+        results = run_batch(jobs, **batch_options)
+    for result in results:
+        _report_issues(result)
+        if result.ok:
+            converted += 1
+            entries += result.entries
+            reused += result.reused
+        else:
+            failed += 1
+            if not result.issues:
+                print(f"Error: {result.input_path}: {result.error}", file=sys.stderr)
+
+    if cache is not None:
+        cache.evict()
+
+    print(f"Successfully converted {converted} of {len(jobs)} file(s).", file=out)
+    if args.dedup:
+        ratio = reused / entries if entries else 0.0
+        print(
+            f"Reused the payloads of {reused} of {entries} entries ({ratio:.1%}) "
+            "from identical entries.",
+            file=out,
+        )
+    if failed:
+        print(f"{failed} file(s) failed.", file=out)
+        return 1
+    return 0
+
+
+def _report_issues(result: "BatchResult") -> None:
+    """Print the validation issues of a batch result."""
+    _print_issues(
+        (f"{result.input_path}: {issue}" for issue in result.issues),
+        "Warning" if result.ok else "Error",
+    )
 
-        if not vpn_configs:
-            print("No VPN configurations found in the input file.")
+
+def _watch(args: "argparse.Namespace") -> int:
+    """Run batch conversion in watch mode until interrupted."""
+    from .batch import ConversionPool
+    from .plistwriter import FORMATS
+    from .watch import watch
+
+    for source in args.sources:
+        if not os.path.isdir(source):
+            print(f"Error: --watch requires directories, got: {source}")
             return 1
 
-        # Convert configurations
+    def report(result: "BatchResult") -> None:
+        _report_issues(result)
+        if result.ok:
+            print(f"Converted {result.input_path} -> {result.output_path}")
+        else:
+            print(f"Error: {result.input_path}: {result.error}", file=sys.stderr)
+        if cache is not None:
+            cache.evict()
+
+    cache = _conversion_cache(args)
+    print(f"Watching {', '.join(args.sources)} (press Ctrl+C to stop)")
+    try:
+        with ConversionPool(
+            args.workers,
+            _converter_options(args),
+            FORMATS[args.format],
+            cache,
+            args.dedup,
+            _validation_mode(args),
+        ) as pool:
+            watch(
+                args.sources,
+                args.output_dir,
+                pool,
+                report,
+                debounce=args.debounce,
+                interval=args.interval,
+                polling=args.polling,
+            )
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+    return 0
+
+
+def serve_main(args: Optional[list] = None) -> int:
+    """Entry point for running the local HTTP conversion service."""
+    import argparse
+    import asyncio
+    from .server import (
+        DEFAULT_HOST,
+        DEFAULT_KEEP_ALIVE_TIMEOUT,
+        DEFAULT_MAX_CONCURRENCY,
+        DEFAULT_PORT,
+        DEFAULT_REQUEST_TIMEOUT,
+        ConversionServer,
+    )
+
+    parser = argparse.ArgumentParser(
+        prog="pbk2mobileconfig serve",
+        description="Serve PBK to mobileconfig conversions over HTTP "
+        "(POST the .pbk file to /convert)",
+    )
+    parser.add_argument(
+        "--host", default=DEFAULT_HOST, help="Address to bind (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--port", type=int, default=DEFAULT_PORT, help="Port (default: %(default)s)"
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=DEFAULT_MAX_CONCURRENCY,
+        help="Maximal number of conversions in progress (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_REQUEST_TIMEOUT,
+        help="Request timeout in seconds (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--keep-alive",
+        type=float,
+        default=DEFAULT_KEEP_ALIVE_TIMEOUT,
+        help="Idle timeout of kept-alive connections in seconds "
+        "(default: %(default)s)",
+    )
+
+    args = parser.parse_args(args)
+
+    server = ConversionServer(
+        args.host,
+        args.port,
+        workers=args.workers,
+        max_concurrency=args.max_concurrency,
+        request_timeout=args.timeout,
+        keep_alive_timeout=args.keep_alive,
+    )
+
+    async def run() -> None:
+        await server.start()
+        print(f"Serving on http://{args.host}:{server.port} (press Ctrl+C to stop)")
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("Stopped serving.")
+    except OSError as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+
+def _print_stats(instrumentation: "Instrumentation", fmt: str) -> None:
+    """Print the recorded per-stage statistics to stderr."""
+    stages = instrumentation.as_dict()
+    if fmt == "json":
+        import json
+
+        print(json.dumps({"stages": stages}, indent=2), file=sys.stderr)
+        return
+
+    print(
+        f"{'stage':<10} {'ms':>10} {'read':>10} {'written':>10} "
+        f"{'attempts':>8} {'entries':>8} {'peak MB':>8}",
+        file=sys.stderr,
+    )
+    for name, stats in stages.items():
+        peak = stats["peak_bytes"]
+        print(
+            f"{name:<10} {stats['seconds'] * 1000:>10.2f} "
+            f"{stats['bytes_read']:>10} {stats['bytes_written']:>10} "
+            f"{stats['encoding_attempts']:>8} {stats['entries']:>8} "
+            f"{'-' if peak is None else f'{peak / 1e6:.2f}':>8}",
+            file=sys.stderr,
+        )
+
+
+def _regenerate(args: "argparse.Namespace", converter: "VPNProfileConverter") -> int:
+    """Regenerate a profile against the previous version given by --previous."""
+    from .fsutil import write_atomically
+    from .incremental import load_digests, load_profile, regenerate, write_digests
+    from .parser import PBKParser
+    from .plistwriter import FORMATS, dump_profile
+
+    pbk_parser = PBKParser.for_path(args.input, converter.instrumentation)
+    if args.entry is not None:
+        vpn_config = pbk_parser.get_entry(args.entry)
+        if vpn_config is None:
+            raise ValueError(f"Entry not found: {args.entry}")
+        vpn_configs = [vpn_config]
+    else:
+        vpn_configs = pbk_parser.parse()
+
+    if not vpn_configs:
+        print("No VPN configurations found in the input file.")
+        return 1
+
+    _validate_entries(converter, vpn_configs)
+    profile, summary, digests = regenerate(
+        converter,
+        vpn_configs,
+        load_profile(args.previous),
+        load_digests(args.previous),
+    )
+    write_atomically(
+        args.output, lambda f: dump_profile(profile, f, FORMATS[args.format])
+    )
+    write_digests(args.output, digests)
+
+    print(f"Unchanged: {len(summary.unchanged)}")
+    for label, names in (
+        ("Changed", summary.changed),
+        ("Added", summary.added),
+        ("Removed", summary.removed),
+    ):
+        print(f"{label}: {len(names)}" + (f" ({', '.join(names)})" if names else ""))
+    print(f"Output saved to: {args.output}")
+    return 0
+
+
+def _split(args: "argparse.Namespace", converter: "VPNProfileConverter") -> int:
+    """Write the entries as several profiles into the output directory."""
+    from .parser import PBKParser
+    from .plistwriter import FORMATS
+    from .sharding import write_shards
+
+    pbk_parser = PBKParser.for_path(args.input, converter.instrumentation)
+    vpn_configs = pbk_parser.parse()
+    if not vpn_configs:
+        print("No VPN configurations found in the input file.")
+        return 1
+
+    _validate_entries(converter, vpn_configs)
+    os.makedirs(args.output, exist_ok=True)
+    results = write_shards(
+        vpn_configs,
+        args.output,
+        _converter_options(args),
+        FORMATS[args.format],
+        per_entry=args.per_entry,
+        max_entries=args.max_entries,
+        max_bytes=args.max_bytes,
+        stem=os.path.splitext(os.path.basename(args.input))[0],
+        workers=args.workers,
+    )
+    oversized = [
+        result for result in results if args.max_bytes and result.size > args.max_bytes
+    ]
+    for result in oversized:
+        print(f"Warning: {result.path} exceeds --max-bytes")
+
+    print(
+        f"Successfully converted {len(vpn_configs)} VPN configuration(s) "
+        f"into {len(results)} profile(s)."
+    )
+    print(f"Output saved to: {args.output}")
+    return 0
+
+
+def _fan_out(args: "argparse.Namespace", converter: "VPNProfileConverter") -> int:
+    """Parse the input once and write a profile per tenant of --tenants."""
+    from .parser import PBKParser
+    from .plistwriter import FORMATS
+    from .tenants import PayloadPrototypes, fan_out, load_tenants
+
+    tenants = load_tenants(args.tenants)
+    vpn_configs = PBKParser.for_path(args.input).parse()
+    if not vpn_configs:
+        print("No VPN configurations found in the input file.")
+        return 1
+
+    _validate_entries(converter, vpn_configs)
+    prototypes = PayloadPrototypes.from_entries(vpn_configs, args.include_secrets)
+    failed = 0
+    for result in fan_out(
+        prototypes,
+        tenants,
+        args.output,
+        _converter_options(args),
+        FORMATS[args.format],
+        args.workers,
+    ):
+        if not result.ok:
+            failed += 1
+            print(f"Error: tenant {result.name}: {result.error}", file=sys.stderr)
+
+    print(
+        f"Successfully converted {len(vpn_configs)} VPN configuration(s) "
+        f"for {len(tenants) - failed} of {len(tenants)} tenant(s)."
+    )
+    print(f"Output saved to: {args.output}")
+    return 1 if failed else 0
+
+
+def main(args: Optional[list] = None) -> int:
+    """Main entry point for the command line interface."""
+    if args is None:
+        args = sys.argv[1:]
+    if args and args[0] in VERSION_FLAGS:
+        print(_version())
+        return 0
+    # An input file named like a subcommand is converted; "--" before the
+    # input does the same where it does not exist yet
+    if args and args[0] in SUBCOMMANDS and not os.path.exists(args[0]):
+        if args[0] == "batch":
+            return batch_main(args[1:])
+        return serve_main(args[1:])
+
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Convert Windows VPN profiles (.pbk) to Apple configuration profiles (.mobileconfig)",
+        epilog="Use 'pbk2mobileconfig batch --help' to convert many files at once "
+        "and 'pbk2mobileconfig serve --help' to run the HTTP service. An "
+        "existing input file named 'batch' or 'serve' is converted instead; "
+        "'--' before the input always treats it as a file.",
+    )
+    parser.add_argument("-V", "--version", action="version", version=_version())
+    parser.add_argument(
+        "input",
+        help="Input .pbk file, zip/tar archive with a single phonebook, "
+        "or <archive>!<member>",
+    )
+    parser.add_argument("output", help="Output .mobileconfig file path")
+    parser.add_argument(
+        "--entry", metavar="NAME", help="Convert only the entry with this name"
+    )
+    parser.add_argument(
+        "--index-dir",
+        metavar="DIR",
+        help="Directory where --entry stores section indexes for later runs "
+        "(default: the user cache directory)",
+    )
+    parser.add_argument(
+        "--previous",
+        metavar="MOBILECONFIG",
+        help="Previous profile; unchanged entries keep their payloads and UUIDs",
+    )
+    parser.add_argument(
+        "--stats",
+        choices=("text", "json"),
+        help="Print time, I/O and entries per conversion stage to stderr",
+    )
+    parser.add_argument(
+        "--stats-memory",
+        action="store_true",
+        help="Also record the peak memory of each stage (slow)",
+    )
+    split = parser.add_argument_group(
+        "split output",
+        "Write several profiles plus manifest.json into the directory given "
+        "as output instead of a single profile",
+    ).add_mutually_exclusive_group()
+    split.add_argument(
+        "--per-entry", action="store_true", help="Write one profile per entry"
+    )
+    split.add_argument(
+        "--max-entries",
+        metavar="N",
+        type=int,
+        help="Write profiles of at most N entries each",
+    )
+    split.add_argument(
+        "--max-bytes",
+        metavar="SIZE",
+        type=_parse_size,
+        help="Write profiles of at most SIZE bytes each (suffixes K and M)",
+    )
+    parser.add_argument(
+        "--tenants",
+        metavar="MANIFEST",
+        help="JSON list of tenants, each with a name and profile options; "
+        "writes <name>.mobileconfig per tenant into the output directory",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes rendering split or tenant profiles "
+        "(default: number of CPUs)",
+    )
+    _add_profile_arguments(parser)
+
+    args = parser.parse_args(args)
+    split = args.per_entry or args.max_entries or args.max_bytes
+    if split or args.tenants:
+        if args.previous or args.entry:
+            parser.error(
+                "--previous and --entry cannot be used with split or tenant output"
+            )
+        if split and args.tenants:
+            parser.error("--tenants cannot be combined with split output")
+        if args.max_entries is not None and args.max_entries < 1:
+            parser.error("--max-entries must be at least 1")
+
+    instrumentation = None
+    if args.stats or args.stats_memory:
+        from .stats import Instrumentation
+
+        instrumentation = Instrumentation(trace_memory=args.stats_memory)
+    try:
+        return _convert(args, instrumentation)
+    finally:
+        if instrumentation is not None:
+            instrumentation.close()
+            _print_stats(instrumentation, args.stats or "text")
+
+
+def _convert(
+    args: "argparse.Namespace", instrumentation: Optional["Instrumentation"]
+) -> int:
+    """Convert a single file as requested by the parsed arguments."""
+    from . import index
+    from .batch import convert_file
+    from .converter import VPNProfileConverter
+    from .plistwriter import FORMATS
+    from .validation import ValidationError, Validator
+
+    mode = _validation_mode(args)
+    validator = None if mode is None else Validator(mode == "strict")
+    if args.entry is not None:
+        index.set_directory(args.index_dir or index.default_directory())
+    try:
         converter = VPNProfileConverter(
-            organization=args.org, identifier=args.identifier, removable=args.removable
+            **_converter_options(args),
+            instrumentation=instrumentation,
+            validator=validator,
         )
-        mobileconfig = converter.generate_mobileconfig(vpn_configs)
+        if args.previous:
+            return _regenerate(args, converter)
+        if args.per_entry or args.max_entries or args.max_bytes:
+            return _split(args, converter)
+        if args.tenants:
+            return _fan_out(args, converter)
 
-        # Save mobileconfig file
-        with open(args.output, "wb") as f:
-            plistlib.dump(mobileconfig, f)
+        # Parse, convert and stream the entries into the mobileconfig file
+        cache = _conversion_cache(args)
+        count = convert_file(
+            args.input,
+            args.output,
+            converter,
+            FORMATS[args.format],
+            cache=cache,
+            entry=args.entry,
+            instrumentation=instrumentation,
+        )
+        if cache is not None:
+            cache.evict()
 
-        print(f"Successfully converted {len(vpn_configs)} VPN configuration(s).")
+        print(f"Successfully converted {count} VPN configuration(s).")
         print(f"Output saved to: {args.output}")
         return 0
 
+    except ValidationError as e:
+        _print_issues(e.issues, "Error")
+        print(f"Error: {len(e.issues)} validation issue(s); no output was written.")
+        return 1
     except FileNotFoundError as e:
         print(f"Error: {e}")
         return 1
@@ -69,6 +747,10 @@ def main(args: Optional[list] = None) -> int:
     except Exception as e:
         print(f"Unexpected error: {e}")
         return 1
+    finally:
+        index.set_directory(None)
+        if validator is not None and not validator.strict:
+            _print_issues(validator.issues)
 
 
 if __name__ == "__main__":
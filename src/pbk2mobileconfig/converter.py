@@ -3,7 +3,77 @@ Converter module for transforming Windows VPN configurations to Apple mobileconf
 """
 
 import uuid
-from typing import Dict, Any, List
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Any,
+    Iterable,
+    Iterator,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
+from .models import VPNEntry
+from .stats import Instrumentation
+
+if TYPE_CHECKING:
+    from .validation import Validator
+
+# rasphone DataEncryption values mapped to (CCPEnabled, MPPE-40, MPPE-128)
+PPTP_ENCRYPTION = {
+    "0": (0, 0, 0),  # No encryption
+    "256": (1, 0, 1),  # Maximum strength encryption
+}
+PPTP_DEFAULT_ENCRYPTION = (1, 1, 1)
+
+# Namespace of the name-based UUIDs generated with deterministic_uuids
+UUID_NAMESPACE = uuid.uuid5(
+    uuid.NAMESPACE_URL, "https://github.com/chuikoffru/pbk2mobileconfig"
+)
+
+
+def _int_flag(value: Union[str, int], default: int) -> int:
+    """
+    Convert a numeric PBK flag, using the default for empty values.
+
+    Parsed entries hold strings, but entries given as dicts may use ints.
+    """
+    value = str(value).strip()
+    return int(value) if value.isdigit() else default
+
+
+class PayloadTemplate:
+    """
+    Constant part of a VPN payload, rendered into fresh dicts per entry.
+
+    A template maps payload keys (such as "VPN" or "PPP") to dicts of
+    settings. Rendering copies each settings dict and the lists or dicts
+    nested in it, so rendered payloads never share mutable state with the
+    template or with each other. Values nested deeper are shared and must
+    be immutable.
+    """
+
+    def __init__(self, sections: Dict[str, Dict[str, Any]]):
+        """Initialize template from payload sections."""
+        self._sections: Tuple[Tuple[str, Dict[str, Any], Tuple[str, ...]], ...] = tuple(
+            (
+                name,
+                dict(values),
+                tuple(k for k, v in values.items() if isinstance(v, (list, dict))),
+            )
+            for name, values in sections.items()
+        )
+
+    def render(self) -> Dict[str, Dict[str, Any]]:
+        """Return a fresh copy of the template sections."""
+        rendered = {}
+        for name, values, containers in self._sections:
+            section = values.copy()
+            for key in containers:
+                section[key] = section[key].copy()
+            rendered[name] = section
+        return rendered
 
 
 class VPNProfileConverter:
@@ -14,54 +84,265 @@ class VPNProfileConverter:
         organization: str = "Organization",
         identifier: str = "com.example.vpn",
         removable: bool = True,
+        deterministic_uuids: bool = False,
+        include_secrets: bool = False,
+        instrumentation: Optional[Instrumentation] = None,
+        validator: Optional["Validator"] = None,
     ):
-        """Initialize converter with basic profile settings."""
+        """
+        Initialize converter with basic profile settings.
+
+        With ``deterministic_uuids`` the payload UUIDs are derived from the
+        profile identifier and entry names instead of being random, so the
+        same input always produces the same profile. Pre-shared keys of
+        the phonebook are only written to the payloads with
+        ``include_secrets``; otherwise they are left to be filled in on
+        the device. With ``instrumentation``, iter_payloads() is recorded
+        as the ``convert`` stage. With a ``validator``, the payloads of iter_payloads() are
+        validated as they are generated.
+        """
         self.organization = organization
         self.identifier = identifier
         self.removable = removable
+        self.deterministic_uuids = deterministic_uuids
+        self.include_secrets = include_secrets
+        self.instrumentation = instrumentation
+        self.validator = validator
+        self._templates = self._build_templates()
+
+    @property
+    def options(self) -> Dict[str, Any]:
+        """Constructor options, e.g. for creating an equivalent converter."""
+        return {
+            "organization": self.organization,
+            "identifier": self.identifier,
+            "removable": self.removable,
+            "deterministic_uuids": self.deterministic_uuids,
+            "include_secrets": self.include_secrets,
+        }
+
+    def _new_uuid(self, name: str) -> str:
+        """Return a random UUID, or one derived from the name if deterministic."""
+        if self.deterministic_uuids:
+            return str(uuid.uuid5(UUID_NAMESPACE, f"{self.identifier}/{name}"))
+        return str(uuid.uuid4())
+
+    def _build_templates(self) -> Dict[str, PayloadTemplate]:
+        """Build the constant payload parts of every VPN type once."""
+        return {
+            "L2TP": PayloadTemplate(
+                {
+                    "VPN": {
+                        "RemoteAddress": "",
+                        "AuthenticationMethod": "Password",
+                        "CommRemoteAddress": "",
+                        "AuthName": "",  # Will be filled by user
+                        "AuthPassword": "",  # Will be filled by user
+                        "SharedSecret": "",  # Will be filled by user
+                        "TokenCard": False,
+                        "DisconnectOnIdle": 0,
+                        "EnableSplitTunneling": 1,
+                        "ProtocolType": "L2TP",
+                        "AuthEAPPlugins": [],
+                        "AuthProtocol": ["Password"],
+                        "UseExtendedAuthentication": 1,
+                        "InterfaceTypeMatch": "Ethernet",
+                        "EncryptionLevel": "Auto",
+                    },
+                    "IPSec": {
+                        "AuthenticationMethod": "SharedSecret",
+                        "SharedSecret": "",  # Will be filled by user
+                        "LocalIdentifierType": "KeyID",
+                        "RemoteAddress": "",
+                        "XAuthEnabled": 1,
+                        "XAuthName": "",  # Will be filled by user
+                        "XAuthPassword": "",  # Will be filled by user
+                        "PromptForVPNPIN": False,
+                    },
+                    "PPP": {
+                        "CommRemoteAddress": "",
+                        "AuthName": "",  # Will be filled by user
+                        "AuthPassword": "",  # Will be filled by user
+                        "TokenCard": False,
+                        "CCPEnabled": 0,
+                        "CCPMPPE40Enabled": 0,
+                        "CCPMPPE128Enabled": 0,
+                        "AuthProtocol": ["PAP", "CHAP", "MSCHAPv2"],
+                        "DialMode": "Manual",
+                        "IdleDisconnectEnabled": 0,
+                        "LCPEchoEnabled": 1,
+                        "LCPEchoFailure": 5,
+                        "LCPEchoInterval": 30,
+                    },
+                }
+            ),
+            "PPTP": PayloadTemplate(
+                {
+                    "PPP": {
+                        "CommRemoteAddress": "",
+                        "AuthName": "",  # Will be filled by user
+                        "AuthPassword": "",  # Will be filled by user
+                        "TokenCard": False,
+                        "AuthEAPPlugins": [],
+                        "AuthProtocol": ["MSCHAPv2"],
+                        "CCPEnabled": 1,
+                        "CCPMPPE40Enabled": 1,
+                        "CCPMPPE128Enabled": 1,
+                    },
+                }
+            ),
+            "IKEv2": PayloadTemplate(
+                {
+                    "IKEv2": {
+                        "RemoteAddress": "",
+                        "RemoteIdentifier": "",
+                        "LocalIdentifier": "",
+                        "AuthenticationMethod": "None",
+                        "ExtendedAuthEnabled": 1,
+                        "AuthName": "",  # Will be filled by user
+                        "AuthPassword": "",  # Will be filled by user
+                        "DeadPeerDetectionRate": "Medium",
+                        "DisableMOBIKE": 0,
+                        "DisableRedirect": 0,
+                        "EnablePFS": 0,
+                        "IKESecurityAssociationParameters": {
+                            "EncryptionAlgorithm": "AES-256",
+                            "IntegrityAlgorithm": "SHA2-256",
+                            "DiffieHellmanGroup": 14,
+                            "LifeTimeInMinutes": 1440,
+                        },
+                        "ChildSecurityAssociationParameters": {
+                            "EncryptionAlgorithm": "AES-256",
+                            "IntegrityAlgorithm": "SHA2-256",
+                            "DiffieHellmanGroup": 14,
+                            "LifeTimeInMinutes": 1440,
+                        },
+                    },
+                }
+            ),
+            "common": PayloadTemplate(
+                {
+                    "IPv4": {
+                        "OverridePrimary": 1,
+                        "ConfigMethod": "Manual",
+                    },
+                }
+            ),
+        }
+
+    def convert_vpn_config(self, vpn_config: Mapping) -> Dict[str, Any]:
+        """
+        Convert a single VPN configuration to mobileconfig format.
 
-    def convert_vpn_config(self, vpn_config: Dict[str, Any]) -> Dict[str, Any]:
-        """Convert a single VPN configuration to mobileconfig format."""
-        vpn_type = self._get_vpn_type(vpn_config["Type"])
-        payload_uuid = str(uuid.uuid4())
+        Accepts a VPNEntry or any mapping with the same keys.
+        """
+        entry = VPNEntry.coerce(vpn_config)
+        vpn_type = self._get_vpn_type(entry.type)
 
         # Base payload structure
         payload = {
             "PayloadType": "com.apple.vpn.managed",
             "PayloadVersion": 1,
-            "PayloadIdentifier": f"{self.identifier}.{vpn_config['Name']}.{payload_uuid}",
-            "PayloadUUID": payload_uuid,
-            "PayloadDisplayName": vpn_config["Name"],
+            **self.payload_identity(entry.name),
+            "PayloadDisplayName": entry.name,
             "PayloadDescription": "Configures VPN settings",
-            "PayloadOrganization": self.organization,
             "VPNType": vpn_type,
             "PayloadEnabled": True,
         }
 
         # Add type-specific configuration
         if vpn_type == "L2TP":
-            self._add_l2tp_config(payload, vpn_config)
+            self._add_l2tp_config(payload, entry)
         elif vpn_type == "PPTP":
-            self._add_pptp_config(payload, vpn_config)
+            self._add_pptp_config(payload, entry)
         elif vpn_type == "IKEv2":
-            self._add_ikev2_config(payload, vpn_config)
+            self._add_ikev2_config(payload, entry)
 
         # Add common settings
-        self._add_common_settings(payload, vpn_config)
+        self._add_common_settings(payload, entry)
 
         return payload
 
-    def generate_mobileconfig(
-        self, vpn_configs: List[Dict[str, Any]]
+    def content_key(self, vpn_config: Mapping) -> Tuple[Any, ...]:
+        """
+        Return the normalized entry fields the payload content depends on.
+
+        Entries with equal keys get payloads that only differ in the keys
+        of payload_identity(). Must cover every field read by the
+        _add_*_config methods and _add_common_settings().
+        """
+        entry = VPNEntry.coerce(vpn_config)
+        vpn_type = self._get_vpn_type(entry.type)
+        key: Tuple[Any, ...] = (
+            entry.name,
+            vpn_type,
+            entry.phone_number,
+            entry.dns_address,
+            entry.dns2_address,
+            entry.dns_suffix,
+        )
+        secret = entry.shared_secret if self.include_secrets else None
+        if vpn_type == "L2TP":
+            key += (_int_flag(entry.use_extended_auth, 1), secret)
+        elif vpn_type == "PPTP":
+            key += (
+                PPTP_ENCRYPTION.get(
+                    str(entry.data_encryption).strip(), PPTP_DEFAULT_ENCRYPTION
+                ),
+            )
+        elif vpn_type == "IKEv2":
+            key += (entry.user_name, bool(entry.shared_secret), secret)
+        return key
+
+    def payload_identity(self, name: str) -> Dict[str, Any]:
+        """
+        Return the payload keys that depend on the converter settings.
+
+        These are the only keys in which the payloads of the same entry
+        differ between converters, see tenants.PayloadPrototypes.
+        """
+        payload_uuid = self._new_uuid(f"payload/{name}")
+        return {
+            "PayloadIdentifier": f"{self.identifier}.{name}.{payload_uuid}",
+            "PayloadUUID": payload_uuid,
+            "PayloadOrganization": self.organization,
+        }
+
+    def iter_payloads(self, vpn_configs: Iterable[Mapping]) -> Iterator[Dict[str, Any]]:
+        """Convert VPN configurations lazily, one payload at a time."""
+        payloads: Iterator[Dict[str, Any]] = map(self.convert_vpn_config, vpn_configs)
+        if self.validator is not None:
+            payloads = self.validator.checked(payloads)
+        if self.instrumentation is None:
+            return payloads
+        return self.instrumentation.iterate("convert", payloads)
+
+    def build_profile(
+        self,
+        payload_content: Iterable[Dict[str, Any]],
+        suffix: Optional[str] = None,
+        display_name: str = "VPN Configuration",
     ) -> Dict[str, Any]:
-        """Generate complete mobileconfig profile from VPN configurations."""
-        payload_content = [self.convert_vpn_config(config) for config in vpn_configs]
-        root_uuid = str(uuid.uuid4())
+        """
+        Wrap payloads into the root profile dictionary.
+
+        ``payload_content`` may be an iterator, e.g. from iter_payloads(),
+        for writing with plistwriter.dump_profile() without holding every
+        payload in memory. With ``suffix`` the profile gets its own
+        identifier ``<identifier>.<suffix>`` and UUID, for one of several
+        profiles generated from the same phonebook.
+        """
+        if suffix is None:
+            identifier = self.identifier
+            root_uuid = self._new_uuid("profile")
+        else:
+            identifier = f"{self.identifier}.{suffix}"
+            root_uuid = self._new_uuid(f"profile/{suffix}")
 
         return {
             "PayloadContent": payload_content,
-            "PayloadDisplayName": "VPN Configuration",
-            "PayloadIdentifier": self.identifier,
+            "PayloadDisplayName": display_name,
+            "PayloadIdentifier": identifier,
             "PayloadRemovalDisallowed": not self.removable,
             "PayloadType": "Configuration",
             "PayloadUUID": root_uuid,
@@ -70,6 +351,10 @@ class VPNProfileConverter:
             "PayloadOrganization": self.organization,
         }
 
+    def generate_mobileconfig(self, vpn_configs: Iterable[Mapping]) -> Dict[str, Any]:
+        """Generate complete mobileconfig profile from VPN configurations."""
+        return self.build_profile(list(self.iter_payloads(vpn_configs)))
+
     def _get_vpn_type(self, type_id: str) -> str:
         """Map Windows VPN type to Apple VPN type."""
         vpn_types = {
@@ -81,83 +366,57 @@ class VPNProfileConverter:
         }
         return vpn_types.get(type_id, "L2TP")
 
-    def _add_l2tp_config(
-        self, payload: Dict[str, Any], vpn_config: Dict[str, Any]
-    ) -> None:
+    def _add_l2tp_config(self, payload: Dict[str, Any], entry: VPNEntry) -> None:
         """Add L2TP specific configuration."""
-        payload.update(
-            {
-                "VPN": {
-                    "RemoteAddress": vpn_config.get("PhoneNumber", ""),
-                    "AuthenticationMethod": "Password",
-                    "CommRemoteAddress": vpn_config.get("PhoneNumber", ""),
-                    "AuthName": "",  # Will be filled by user
-                    "AuthPassword": "",  # Will be filled by user
-                    "SharedSecret": "",  # Will be filled by user
-                    "TokenCard": False,
-                    "DisconnectOnIdle": 0,
-                    "EnableSplitTunneling": 1,
-                    "ProtocolType": "L2TP",
-                    "AuthEAPPlugins": [],
-                    "AuthProtocol": ["Password"],
-                    "UseExtendedAuthentication": int(
-                        vpn_config.get("UseExtendedAuth", "1")
-                    ),
-                    "InterfaceTypeMatch": "Ethernet",
-                    "EncryptionLevel": "Auto",
-                },
-                "IPSec": {
-                    "AuthenticationMethod": "SharedSecret",
-                    "SharedSecret": "",  # Will be filled by user
-                    "LocalIdentifierType": "KeyID",
-                    "RemoteAddress": vpn_config.get("PhoneNumber", ""),
-                    "XAuthEnabled": 1,
-                    "XAuthName": "",  # Will be filled by user
-                    "XAuthPassword": "",  # Will be filled by user
-                    "PromptForVPNPIN": False,
-                },
-                "PPP": {
-                    "CommRemoteAddress": vpn_config.get("PhoneNumber", ""),
-                    "AuthName": "",  # Will be filled by user
-                    "AuthPassword": "",  # Will be filled by user
-                    "TokenCard": False,
-                    "CCPEnabled": 0,
-                    "CCPMPPE40Enabled": 0,
-                    "CCPMPPE128Enabled": 0,
-                    "AuthProtocol": ["PAP", "CHAP", "MSCHAPv2"],
-                    "DialMode": "Manual",
-                    "IdleDisconnectEnabled": 0,
-                    "LCPEchoEnabled": 1,
-                    "LCPEchoFailure": 5,
-                    "LCPEchoInterval": 30,
-                },
-            }
-        )
+        payload.update(self._templates["L2TP"].render())
+
+        remote_address = entry.phone_number
+        vpn = payload["VPN"]
+        vpn["RemoteAddress"] = remote_address
+        vpn["CommRemoteAddress"] = remote_address
+        vpn["UseExtendedAuthentication"] = _int_flag(entry.use_extended_auth, 1)
+        payload["IPSec"]["RemoteAddress"] = remote_address
+        payload["PPP"]["CommRemoteAddress"] = remote_address
+        if self.include_secrets and entry.shared_secret:
+            payload["IPSec"]["SharedSecret"] = entry.shared_secret
 
-    def _add_pptp_config(
-        self, payload: Dict[str, Any], vpn_config: Dict[str, Any]
-    ) -> None:
+    def _add_pptp_config(self, payload: Dict[str, Any], entry: VPNEntry) -> None:
         """Add PPTP specific configuration."""
-        # Implementation for PPTP
-        pass
+        payload.update(self._templates["PPTP"].render())
+
+        ppp = payload["PPP"]
+        ppp["CommRemoteAddress"] = entry.phone_number
+        ccp, mppe40, mppe128 = PPTP_ENCRYPTION.get(
+            str(entry.data_encryption).strip(), PPTP_DEFAULT_ENCRYPTION
+        )
+        ppp["CCPEnabled"] = ccp
+        ppp["CCPMPPE40Enabled"] = mppe40
+        ppp["CCPMPPE128Enabled"] = mppe128
 
-    def _add_ikev2_config(
-        self, payload: Dict[str, Any], vpn_config: Dict[str, Any]
-    ) -> None:
+    def _add_ikev2_config(self, payload: Dict[str, Any], entry: VPNEntry) -> None:
         """Add IKEv2 specific configuration."""
-        # Implementation for IKEv2
-        pass
+        payload.update(self._templates["IKEv2"].render())
+
+        ikev2 = payload["IKEv2"]
+        ikev2["RemoteAddress"] = entry.phone_number
+        ikev2["RemoteIdentifier"] = entry.phone_number
+        ikev2["LocalIdentifier"] = entry.user_name
+        if entry.shared_secret:
+            # Machine authentication with a pre-shared key instead of EAP;
+            # the key itself is filled in on the device unless requested
+            ikev2["AuthenticationMethod"] = "SharedSecret"
+            ikev2["ExtendedAuthEnabled"] = 0
+            if self.include_secrets:
+                ikev2["SharedSecret"] = entry.shared_secret
 
-    def _add_common_settings(
-        self, payload: Dict[str, Any], vpn_config: Dict[str, Any]
-    ) -> None:
+    def _add_common_settings(self, payload: Dict[str, Any], entry: VPNEntry) -> None:
         """Add common VPN settings."""
         # Add DNS settings if available
         dns_addresses = []
-        if vpn_config.get("IpDnsAddress"):
-            dns_addresses.append(vpn_config["IpDnsAddress"])
-        if vpn_config.get("IpDns2Address"):
-            dns_addresses.append(vpn_config["IpDns2Address"])
+        if entry.dns_address:
+            dns_addresses.append(entry.dns_address)
+        if entry.dns2_address:
+            dns_addresses.append(entry.dns2_address)
 
         if dns_addresses:
             payload["DNS"] = {
@@ -165,17 +424,14 @@ class VPNProfileConverter:
                 "SupplementalMatchDomains": [],
             }
 
-        if vpn_config.get("IpDnsSuffix"):
+        if entry.dns_suffix:
             if "DNS" not in payload:
                 payload["DNS"] = {}
-            payload["DNS"]["SearchDomains"] = [vpn_config["IpDnsSuffix"]]
-            payload["DNS"]["SupplementalMatchDomains"] = [vpn_config["IpDnsSuffix"]]
+            payload["DNS"]["SearchDomains"] = [entry.dns_suffix]
+            payload["DNS"]["SupplementalMatchDomains"] = [entry.dns_suffix]
 
         # Add IPv4 settings
-        payload["IPv4"] = {
-            "OverridePrimary": 1,
-            "ConfigMethod": "Manual",
-        }
+        payload.update(self._templates["common"].render())
 
         # Add split tunneling if configured
         payload["EnableSplitTunneling"] = True
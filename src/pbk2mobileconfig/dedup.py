@@ -0,0 +1,64 @@
+"""
+Reuse of converted payloads for identical entries across phonebooks.
+
+Migrating a fleet of user phonebooks means converting the same few
+corporate connections over and over. DedupConverter keys every entry by
+VPNProfileConverter.content_key(), the normalized fields its payload is
+rendered from, converts each distinct key once and afterwards only
+recomputes the identity keys (identifier, UUID, organization) of the
+stored payload. Batch workers each keep one DedupConverter, so an entry is
+converted at most once per worker process however many phonebooks
+contain it.
+"""
+
+from typing import Any, Dict, Mapping, Tuple
+from .converter import VPNProfileConverter
+
+# Maximal number of distinct entries remembered per converter
+DEFAULT_MAX_ENTRIES = 100000
+
+
+class DedupConverter(VPNProfileConverter):
+    """
+    Converter that converts each distinct entry only once.
+
+    Reused payloads share their nested settings dicts, so payloads must be
+    serialized rather than modified. ``hits`` and ``misses`` count reused
+    and converted entries. Once ``max_entries`` distinct entries are
+    stored, further new ones are converted without being remembered.
+    """
+
+    def __init__(
+        self, *args: Any, max_entries: int = DEFAULT_MAX_ENTRIES, **kwargs: Any
+    ):
+        """Initialize converter; arguments are those of VPNProfileConverter."""
+        super().__init__(*args, **kwargs)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._prototypes: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+        self._identity_keys = tuple(self.payload_identity(""))
+
+    @property
+    def distinct(self) -> int:
+        """Number of distinct entries stored."""
+        return len(self._prototypes)
+
+    def convert_vpn_config(self, vpn_config: Mapping) -> Dict[str, Any]:
+        """Convert an entry, reusing the payload of an identical one."""
+        key = self.content_key(vpn_config)
+        prototype = self._prototypes.get(key)
+        if prototype is None:
+            self.misses += 1
+            payload = super().convert_vpn_config(vpn_config)
+            if len(self._prototypes) < self.max_entries:
+                prototype = payload.copy()
+                for identity_key in self._identity_keys:
+                    del prototype[identity_key]
+                self._prototypes[key] = prototype
+            return payload
+
+        self.hits += 1
+        payload = prototype.copy()
+        payload.update(self.payload_identity(key[0]))
+        return payload
@@ -0,0 +1,244 @@
+"""
+Encoding detection for PBK and Connection Manager files.
+
+Files are read once as bytes and the encoding is decided from the raw data:
+byte order marks first, then the null-byte pattern of UTF-16 text without a
+BOM, then strict UTF-8, and only then ``chardet`` on a bounded prefix.
+``chardet`` is imported on first use.
+"""
+
+import os
+import codecs
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Number of leading bytes inspected for null-byte patterns
+SNIFF_SIZE = 4096
+
+# Number of leading bytes handed to chardet
+CHARDET_SAMPLE_SIZE = 64 * 1024
+
+# Minimal chardet confidence before falling back to cp1252
+CHARDET_MIN_CONFIDENCE = 0.5
+
+# Maximal number of paths remembered by the encoding cache
+CACHE_SIZE = 4096
+
+# Size of the blocks read when streaming a file line by line
+CHUNK_SIZE = 64 * 1024
+
+# Error handler decoding stray non-UTF-8 bytes of a stream as cp1252
+FALLBACK_ERRORS = "pbk2mobileconfig-cp1252"
+
+# Checked in order: the UTF-32 marks start with the UTF-16 ones
+BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+# path -> (size, mtime_ns, encoding)
+_encoding_cache: Dict[str, Tuple[int, int, str]] = {}
+
+
+def sniff_encoding(prefix: bytes) -> Optional[str]:
+    """
+    Guess the encoding from a BOM or a UTF-16 null-byte pattern.
+
+    Returns None when the prefix looks like a single-byte or UTF-8 text.
+    """
+    for bom, encoding in BOMS:
+        if prefix.startswith(bom):
+            return encoding
+
+    sample = prefix[:SNIFF_SIZE]
+    if len(sample) < 2:
+        return None
+
+    # ASCII text in UTF-16 has a null in every other byte
+    even_nulls = sample[0::2].count(0)
+    odd_nulls = sample[1::2].count(0)
+    half = len(sample) // 2
+    if odd_nulls > half * 0.3 and even_nulls < half * 0.05:
+        return "utf-16-le"
+    if even_nulls > half * 0.3 and odd_nulls < half * 0.05:
+        return "utf-16-be"
+    return None
+
+
+# cp1252 leaves five bytes undefined; those map to the latin-1 code points
+_CP1252_CHARS = [
+    bytes([byte]).decode("cp1252", "ignore") or chr(byte) for byte in range(256)
+]
+
+
+def _cp1252_fallback(error: UnicodeError) -> Tuple[str, int]:
+    """Decode the bytes rejected by another codec as cp1252."""
+    if not isinstance(error, UnicodeDecodeError):
+        raise error
+    chunk = error.object[error.start : error.end]
+    return "".join(_CP1252_CHARS[byte] for byte in chunk), error.end
+
+
+codecs.register_error(FALLBACK_ERRORS, _cp1252_fallback)
+
+
+def _decodes(data: bytes, encoding: str, final: bool = True) -> bool:
+    """Check whether data decodes cleanly with the given encoding."""
+    try:
+        codecs.getincrementaldecoder(encoding)().decode(data, final)
+    except (UnicodeDecodeError, LookupError):
+        return False
+    return True
+
+
+def detect_encoding(
+    data: bytes, final: bool = True, attempts: Optional[List[str]] = None
+) -> str:
+    """
+    Detect the encoding of raw file content.
+
+    With ``final=False`` the data is treated as a prefix of a longer file,
+    so a multi-byte sequence cut at its end is not an error. The detection
+    steps taken ("sniff", "utf-8", "chardet", ...) are appended to
+    ``attempts`` if given.
+    """
+    if attempts is None:
+        attempts = []
+
+    attempts.append("sniff")
+    encoding = sniff_encoding(data[:SNIFF_SIZE])
+    if encoding:
+        return encoding
+
+    attempts.append("utf-8")
+    if _decodes(data, "utf-8", final):
+        return "utf-8"
+
+    attempts.append("chardet")
+    # chardet is slow to import and only needed for non-UTF-8 legacy files
+    import chardet
+
+    detected = chardet.detect(data[:CHARDET_SAMPLE_SIZE])
+    encoding = detected.get("encoding")
+    if (
+        encoding
+        and (detected.get("confidence") or 0) >= CHARDET_MIN_CONFIDENCE
+        and _decodes(data, encoding, final)
+    ):
+        return encoding
+
+    attempts.append("cp1252")
+    if _decodes(data, "cp1252", final):
+        return "cp1252"
+
+    # latin-1 maps every byte and never fails
+    attempts.append("latin-1")
+    return "latin-1"
+
+
+def _remember(path: str, size: int, mtime_ns: int, encoding: str) -> None:
+    """Store the encoding of a file in the bounded cache."""
+    if path not in _encoding_cache and len(_encoding_cache) >= CACHE_SIZE:
+        del _encoding_cache[next(iter(_encoding_cache))]
+    _encoding_cache[path] = (size, mtime_ns, encoding)
+
+
+def clear_cache() -> None:
+    """Forget all cached encodings."""
+    _encoding_cache.clear()
+
+
+def read_text(file_path: str, attempts: Optional[List[str]] = None) -> str:
+    """
+    Read a file with a single open and decode it with the detected encoding.
+
+    The chosen encoding is cached per path and reused while the file size
+    and modification time stay the same. Detection steps are appended to
+    ``attempts`` as by detect_encoding().
+    """
+    with open(file_path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        data = f.read()
+
+    key = os.path.abspath(file_path)
+    cached = _encoding_cache.get(key)
+    if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+        try:
+            return data.decode(cached[2])
+        except UnicodeDecodeError:
+            pass
+
+    encoding = detect_encoding(data, attempts=attempts)
+    text = decode_bytes(data, file_path, encoding)
+    _remember(key, stat.st_size, stat.st_mtime_ns, encoding)
+    return text
+
+
+def decode_bytes(
+    data: bytes, name: str = "<memory>", encoding: Optional[str] = None
+) -> str:
+    """
+    Decode raw file content with the detected (or the given) encoding.
+
+    ``name`` only appears in the error raised when decoding fails.
+    """
+    encoding = encoding or detect_encoding(data)
+    try:
+        return data.decode(encoding)
+    except UnicodeDecodeError as e:
+        raise ValueError(f"Could not decode file {name} as {encoding}: {e}")
+
+
+def detect_prefix_encoding(
+    file_path: str,
+    stat: os.stat_result,
+    prefix: bytes,
+    attempts: Optional[List[str]] = None,
+) -> str:
+    """
+    Detect the encoding of a file from its first bytes, or recall it.
+
+    Text decoded with the result should use the ``FALLBACK_ERRORS`` error
+    handler, since bytes after the prefix have not been checked.
+    """
+    key = os.path.abspath(file_path)
+    cached = _encoding_cache.get(key)
+    if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+        return cached[2]
+
+    encoding = detect_encoding(prefix, len(prefix) >= stat.st_size, attempts)
+    _remember(key, stat.st_size, stat.st_mtime_ns, encoding)
+    return encoding
+
+
+def iter_lines(
+    file_path: str,
+    chunk_size: int = CHUNK_SIZE,
+    attempts: Optional[List[str]] = None,
+) -> Iterator[str]:
+    """
+    Stream the lines of a file without holding the whole content in memory.
+
+    The encoding is detected from the first block only, so bytes further
+    in the file that are not valid in the detected UTF-8 encoding are
+    decoded as cp1252 instead of failing mid-stream.
+    """
+    with open(file_path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        chunk = f.read(max(chunk_size, CHARDET_SAMPLE_SIZE))
+        encoding = detect_prefix_encoding(file_path, stat, chunk, attempts)
+
+        decoder = codecs.getincrementaldecoder(encoding)(errors=FALLBACK_ERRORS)
+        pending = ""
+        while chunk:
+            text = pending + decoder.decode(chunk)
+            complete, newline, pending = text.rpartition("\n")
+            if newline:
+                yield from complete.splitlines()
+            chunk = f.read(chunk_size)
+
+        pending += decoder.decode(b"", True)
+        if pending:
+            yield from pending.splitlines()
@@ -0,0 +1,42 @@
+"""
+Helpers for writing output files and spreading work over processes.
+
+Shared by the batch, sharding and tenant modules without importing each
+other, so that the in-memory API does not load the batch machinery.
+"""
+
+import os
+from contextlib import contextmanager
+from typing import BinaryIO, Callable, Iterator
+
+OUTPUT_EXTENSION = ".mobileconfig"
+
+
+@contextmanager
+def atomic_output(output_path: str) -> Iterator[BinaryIO]:
+    """Open a file under a temporary name and rename it when complete."""
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    temp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            yield f
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def write_atomically(output_path: str, write: Callable[[BinaryIO], None]) -> None:
+    """Write a file under a temporary name and rename it when complete."""
+    with atomic_output(output_path) as f:
+        write(f)
+
+
+def chunksize(job_count: int, workers: int) -> int:
+    """Pick a chunk size that keeps IPC overhead low for many small files."""
+    chunks, remainder = divmod(job_count, workers * 4)
+    return max(1, chunks + (1 if remainder else 0))
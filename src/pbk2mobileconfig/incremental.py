@@ -0,0 +1,177 @@
+"""
+Incremental regeneration of a profile against its previous version.
+
+regenerate() returns a digest of the source fields and converter settings
+each payload was rendered from. The digests are kept in a state file next
+to the profile rather than in the payloads, which only hold keys Apple
+defines. On the next run, entries whose digest is unchanged reuse the
+previous payload as is, including its PayloadUUID and PayloadIdentifier,
+without being rendered again. Other entries are rendered and still reuse
+the previous payload if only its identity differs, e.g. for profiles
+without a state file.
+"""
+
+import json
+import hashlib
+import plistlib
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+from . import __version__
+from .converter import VPNProfileConverter
+from .fsutil import write_atomically
+from .models import VPNEntry
+
+# Appended to the path of a profile to name its state file
+STATE_SUFFIX = ".digests.json"
+
+# Payload keys that identify a payload rather than describe its content
+IDENTITY_KEYS = ("PayloadUUID", "PayloadIdentifier")
+
+
+class ChangeSummary(NamedTuple):
+    """Names of the entries by how they changed since the previous profile."""
+
+    unchanged: List[str]
+    changed: List[str]
+    added: List[str]
+    removed: List[str]
+
+    @property
+    def has_changes(self) -> bool:
+        """Whether the new profile differs from the previous one."""
+        return bool(self.changed or self.added or self.removed)
+
+
+def load_profile(path: str) -> Dict[str, Any]:
+    """Read a previously generated mobileconfig file."""
+    with open(path, "rb") as f:
+        return plistlib.load(f)
+
+
+def state_path(profile_path: str) -> str:
+    """Return the path of the state file kept next to a profile."""
+    return profile_path + STATE_SUFFIX
+
+
+def load_digests(profile_path: str) -> Dict[str, str]:
+    """
+    Read the source digests of a profile's payloads, by PayloadUUID.
+
+    A missing, unreadable or foreign state file yields no digests, so
+    every entry is rendered and compared instead.
+    """
+    try:
+        with open(state_path(profile_path), encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != __version__:
+            return {}
+        return {str(uuid): str(digest) for uuid, digest in data["payloads"].items()}
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return {}
+
+
+def write_digests(profile_path: str, digests: Mapping[str, str]) -> None:
+    """Write the source digests of a profile's payloads to its state file."""
+    data = json.dumps(
+        {"version": __version__, "payloads": dict(digests)}, indent=2, sort_keys=True
+    )
+    write_atomically(state_path(profile_path), lambda f: f.write(data.encode()))
+
+
+def source_digest(converter: VPNProfileConverter, entry: VPNEntry) -> str:
+    """
+    Hash the entry fields and converter settings a payload is rendered from.
+
+    Only the fields of VPNProfileConverter.content_key() are hashed, so
+    options that never reach the payload do not change the digest.
+    """
+    options = dict(converter.options)
+    options.pop("deterministic_uuids", None)
+    source = {
+        "version": __version__,
+        "options": options,
+        "entry": converter.content_key(entry),
+    }
+    return hashlib.sha256(
+        json.dumps(source, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def _content(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a payload without its identity keys."""
+    return {key: value for key, value in payload.items() if key not in IDENTITY_KEYS}
+
+
+def _same_as_rendered(rendered: Dict[str, Any], previous: Dict[str, Any]) -> bool:
+    """Compare a previous payload against a fresh rendering, ignoring identity."""
+    # plistlib loads arrays as lists, so compare in the same representation
+    rendered = plistlib.loads(plistlib.dumps(rendered))
+    return _content(rendered) == _content(previous)
+
+
+def regenerate(
+    converter: VPNProfileConverter,
+    vpn_configs: Iterable[Mapping],
+    previous_profile: Dict[str, Any],
+    previous_digests: Optional[Mapping[str, str]] = None,
+) -> Tuple[Dict[str, Any], ChangeSummary, Dict[str, str]]:
+    """
+    Build a profile that reuses the unchanged payloads of a previous profile.
+
+    Payloads are matched by PayloadDisplayName. ``previous_digests`` maps
+    the PayloadUUIDs of the previous payloads to their source digests, as
+    read by load_digests(). Changed entries are rendered again and keep
+    their previous PayloadIdentifier with a new PayloadUUID; new entries
+    are rendered from scratch. The root PayloadUUID is kept when nothing
+    changed at all. Returns the profile, the summary of changes and the
+    digests of the new payloads for write_digests().
+    """
+    previous_digests = previous_digests or {}
+    previous_payloads: Dict[str, Dict[str, Any]] = {}
+    for payload in previous_profile.get("PayloadContent", []):
+        previous_payloads.setdefault(payload.get("PayloadDisplayName"), payload)
+
+    summary = ChangeSummary([], [], [], [])
+    payload_content = []
+    digests: Dict[str, str] = {}
+    seen = set()
+    for config in vpn_configs:
+        entry = VPNEntry.coerce(config)
+        seen.add(entry.name)
+        digest = source_digest(converter, entry)
+        previous = previous_payloads.get(entry.name)
+
+        if (
+            previous is not None
+            and previous_digests.get(previous.get("PayloadUUID")) == digest
+        ):
+            payload = dict(previous)
+            summary.unchanged.append(entry.name)
+        else:
+            payload = converter.convert_vpn_config(entry)
+            if previous is None:
+                summary.added.append(entry.name)
+            elif _same_as_rendered(payload, previous):
+                payload = dict(previous)
+                summary.unchanged.append(entry.name)
+            else:
+                payload["PayloadIdentifier"] = previous["PayloadIdentifier"]
+                summary.changed.append(entry.name)
+
+        digests[payload["PayloadUUID"]] = digest
+        payload_content.append(payload)
+
+    summary.removed.extend(name for name in previous_payloads if name not in seen)
+
+    profile = converter.build_profile(payload_content)
+    if not summary.has_changes and "PayloadUUID" in previous_profile:
+        profile["PayloadUUID"] = previous_profile["PayloadUUID"]
+    return profile, summary, digests
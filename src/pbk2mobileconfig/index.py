@@ -0,0 +1,307 @@
+"""
+Byte-offset index of the sections of a PBK file for random access.
+
+Indexes are kept in memory per process. After set_directory() they are
+also stored on disk, one JSON file per phonebook, so that a later process
+looking up a single entry of an unchanged file skips the header scan.
+"""
+
+import os
+import mmap
+import json
+import time
+import codecs
+import hashlib
+import tempfile
+from typing import Dict, List, Optional, Tuple
+from .encoding import (
+    CHARDET_SAMPLE_SIZE,
+    FALLBACK_ERRORS,
+    detect_prefix_encoding,
+)
+from .tokenizer import DEFAULT_SECTION, SECTION_RE, iter_sections
+
+# Maximal number of files whose index is kept in memory
+CACHE_SIZE = 64
+
+# Files modified less than this many seconds ago may change again within
+# the same timestamp tick, so their index is not stored on disk
+RACY_SECONDS = 2.0
+
+# path -> index, validated against the file size and mtime on lookup
+_index_cache: Dict[str, "SectionIndex"] = {}
+
+# Directory of the indexes stored on disk, see set_directory()
+_directory: Optional[str] = None
+
+
+def default_directory() -> str:
+    """Return the per-user directory for indexes stored on disk."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "pbk2mobileconfig", "index")
+
+
+def set_directory(directory: Optional[str]) -> None:
+    """Store indexes in ``directory`` as well as in memory; None disables it."""
+    global _directory
+    _directory = directory
+
+
+def _index_file(key: str) -> str:
+    """Return the file in the index directory for an absolute path."""
+    assert _directory is not None
+    digest = hashlib.sha256(key.encode("utf-8", "surrogateescape")).hexdigest()
+    return os.path.join(_directory, digest + ".json")
+
+
+def _raw_codec(encoding: str, head: bytes) -> Tuple[str, int]:
+    """
+    Resolve an encoding to a BOM-less codec and the length of the BOM.
+
+    Section offsets point into the middle of the file, where a codec that
+    expects a BOM (utf-16, utf-32, utf-8-sig) would decode incorrectly.
+    """
+    name = codecs.lookup(encoding).name
+    if name == "utf-8-sig":
+        bom = codecs.BOM_UTF8
+        return "utf-8", len(bom) if head.startswith(bom) else 0
+    if name == "utf-16":
+        if head.startswith(codecs.BOM_UTF16_BE):
+            return "utf-16-be", 2
+        return "utf-16-le", 2 if head.startswith(codecs.BOM_UTF16_LE) else 0
+    if name == "utf-32":
+        if head.startswith(codecs.BOM_UTF32_BE):
+            return "utf-32-be", 4
+        return "utf-32-le", 4 if head.startswith(codecs.BOM_UTF32_LE) else 0
+    return name, 0
+
+
+class SectionIndex:
+    """
+    Maps section names of a PBK file to their byte ranges.
+
+    A section name appearing several times maps to the ranges of all its
+    occurrences, which read_section() merges like merge_sections().
+    """
+
+    def __init__(
+        self,
+        path: str,
+        stamp: Tuple[int, int],
+        encoding: str,
+        prelude: Tuple[int, int],
+        sections: Dict[str, List[Tuple[int, int]]],
+    ):
+        """Initialize index with the byte ranges found by build()."""
+        self.path = path
+        self.stamp = stamp
+        self.encoding = encoding
+        self.prelude = prelude
+        self.sections = sections
+
+    @classmethod
+    def build(cls, path: str, attempts: Optional[List[str]] = None) -> "SectionIndex":
+        """
+        Scan a PBK file for section headers without decoding it.
+
+        The file is memory-mapped and searched for the encoded
+        ``"\\n["`` sequence, so only header lines are decoded. Encoding
+        detection steps are appended to ``attempts``.
+        """
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            stamp = (stat.st_size, stat.st_mtime_ns)
+            if stat.st_size == 0:
+                return cls(path, stamp, "utf-8", (0, 0), {})
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                head = mm[:CHARDET_SAMPLE_SIZE]
+                encoding, start = _raw_codec(
+                    detect_prefix_encoding(path, stat, head, attempts), head
+                )
+                newline = "\n".encode(encoding)
+                bracket = "[".encode(encoding)
+                unit = len(newline)
+
+                starts: List[int] = []
+                if mm[start : start + unit] == bracket:
+                    starts.append(start)
+                pos = mm.find(newline + bracket, start)
+                while pos != -1:
+                    if (pos - start) % unit == 0:
+                        starts.append(pos + unit)
+                    pos = mm.find(newline + bracket, pos + 1)
+
+                names: List[Tuple[str, int]] = []
+                headers: List[int] = []
+                for offset in starts:
+                    end = mm.find(newline, offset)
+                    while end != -1 and (end - start) % unit:
+                        end = mm.find(newline, end + 1)
+                    line = mm[offset : end if end != -1 else len(mm)]
+                    match = SECTION_RE.match(
+                        line.decode(encoding, FALLBACK_ERRORS).strip()
+                    )
+                    if match:
+                        headers.append(offset)
+                        names.append((match.group("header"), offset))
+
+        ends = dict(zip(headers, headers[1:] + [stat.st_size]))
+        sections: Dict[str, List[Tuple[int, int]]] = {}
+        for name, begin in names:
+            sections.setdefault(name, []).append((begin, ends[begin]))
+        prelude = (start, headers[0] if headers else stat.st_size)
+        return cls(path, stamp, encoding, prelude, sections)
+
+    @classmethod
+    def for_file(
+        cls,
+        path: str,
+        attempts: Optional[List[str]] = None,
+        reads: Optional[List[int]] = None,
+    ) -> "SectionIndex":
+        """
+        Return the cached index of a file, rebuilding it when it changed.
+
+        Indexes are looked up in memory, then in the directory given to
+        set_directory(), and only built when neither is up to date. A
+        build appends its encoding detection steps to ``attempts`` and
+        the size of the scanned file to ``reads``.
+        """
+        key = os.path.abspath(path)
+        stat = os.stat(path)
+        stamp = (stat.st_size, stat.st_mtime_ns)
+        index = _index_cache.get(key)
+        if index is not None and index.stamp == stamp:
+            return index
+
+        index = cls._load(key, path, stamp) if _directory is not None else None
+        if index is None:
+            index = cls.build(path, attempts)
+            if reads is not None:
+                reads.append(index.stamp[0])
+            if _directory is not None and index.stamp == stamp:
+                if time.time() - stat.st_mtime_ns / 1e9 > RACY_SECONDS:
+                    index._store(key)
+        if key not in _index_cache and len(_index_cache) >= CACHE_SIZE:
+            del _index_cache[next(iter(_index_cache))]
+        _index_cache[key] = index
+        return index
+
+    @classmethod
+    def _load(
+        cls, key: str, path: str, stamp: Tuple[int, int]
+    ) -> Optional["SectionIndex"]:
+        """Read a stored index; None if it is missing, unreadable or stale."""
+        try:
+            with open(_index_file(key), encoding="utf-8") as f:
+                data = json.load(f)
+            if data["path"] != key or tuple(data["stamp"]) != stamp:
+                return None
+            sections = {
+                name: [(begin, end) for begin, end in ranges]
+                for name, ranges in data["sections"]
+            }
+            prelude = (data["prelude"][0], data["prelude"][1])
+            return cls(path, stamp, data["encoding"], prelude, sections)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _store(self, key: str) -> None:
+        """Write the index atomically; failures only cost a rebuild later."""
+        data = {
+            "path": key,
+            "stamp": list(self.stamp),
+            "encoding": self.encoding,
+            "prelude": list(self.prelude),
+            # A list of pairs keeps the file order of the sections
+            "sections": list(self.sections.items()),
+        }
+        try:
+            os.makedirs(_directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=_directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(data, f, separators=(",", ":"))
+                os.replace(tmp, _index_file(key))
+            except BaseException:
+                os.remove(tmp)
+                raise
+        except OSError:
+            pass
+
+    def names(self) -> List[str]:
+        """Return the indexed section names in file order."""
+        return [name for name in self.sections if name != DEFAULT_SECTION]
+
+    def __contains__(self, name: str) -> bool:
+        """Check whether a section with the given name exists."""
+        return name != DEFAULT_SECTION and name in self.sections
+
+    def repeated(self) -> List[str]:
+        """Return the names of sections that appear more than once."""
+        return [
+            name
+            for name, ranges in self.sections.items()
+            if len(ranges) > 1 and name != DEFAULT_SECTION
+        ]
+
+    def _read_options(
+        self, begin: int, end: int, reads: Optional[List[int]]
+    ) -> List[Tuple[str, Dict[str, str]]]:
+        """Decode and tokenize a byte range of the file."""
+        if begin >= end:
+            return []
+        with open(self.path, "rb") as f:
+            f.seek(begin)
+            data = f.read(end - begin)
+        if reads is not None:
+            reads.append(len(data))
+        text = data.decode(self.encoding, FALLBACK_ERRORS)
+        return list(iter_sections(text.splitlines()))
+
+    def _read_merged(
+        self,
+        name: str,
+        ranges: List[Tuple[int, int]],
+        merged: Dict[str, str],
+        reads: Optional[List[int]],
+    ) -> Dict[str, str]:
+        """Merge the options of the named section found in byte ranges."""
+        for begin, end in ranges:
+            for section, options in self._read_options(begin, end, reads):
+                if section == name:
+                    merged.update(options)
+        return merged
+
+    def read_defaults(self, reads: Optional[List[int]] = None) -> Dict[str, str]:
+        """
+        Return the default options of every section.
+
+        These are the options placed before the first section and those of
+        ``[DEFAULT]`` sections anywhere in the file, as in ConfigParser.
+        The sizes of the byte ranges read are appended to ``reads``.
+        """
+        defaults = self._read_merged(DEFAULT_SECTION, [self.prelude], {}, reads)
+        return self._read_merged(
+            DEFAULT_SECTION, self.sections.get(DEFAULT_SECTION, []), defaults, reads
+        )
+
+    def read_section(
+        self, name: str, reads: Optional[List[int]] = None
+    ) -> Optional[Dict[str, str]]:
+        """
+        Decode and tokenize only the occurrences of the named section.
+
+        The sizes of the byte ranges read are appended to ``reads``.
+        """
+        if name not in self:
+            return None
+        return self._read_merged(name, self.sections[name], {}, reads)
+
+
+def clear_cache() -> None:
+    """Forget all cached indexes."""
+    _index_cache.clear()
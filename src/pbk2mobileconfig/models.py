@@ -0,0 +1,138 @@
+"""
+Entry model for VPN configurations read from PBK files.
+"""
+
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, NamedTuple, Optional
+
+
+class Field(NamedTuple):
+    """Declaration of a VPNEntry field."""
+
+    key: str  # Key in the dict view, e.g. "SharedSecret"
+    attr: str  # Attribute of VPNEntry, e.g. "shared_secret"
+    option: Optional[str]  # PBK option it is read from, None if not from PBK
+    default: Any = ""
+
+
+FIELDS = (
+    Field("Name", "name", None),
+    Field("Type", "type", "Type"),
+    Field("PhoneNumber", "phone_number", "PhoneNumber"),
+    # Basic settings
+    Field("UserName", "user_name", "UserName"),
+    Field("Password", "password", "Password"),
+    Field("SharedSecret", "shared_secret", "PreSharedKey"),
+    # DNS settings
+    Field("IpDnsAddress", "dns_address", "IpDnsAddress"),
+    Field("IpDns2Address", "dns2_address", "IpDns2Address"),
+    Field("IpDnsSuffix", "dns_suffix", "IpDnsSuffix"),
+    # Device settings
+    Field("Device", "device", "PreferredDevice"),
+    # Authentication settings
+    Field("UseExtendedAuth", "use_extended_auth", "UseExtendedAuthentication", "1"),
+    Field("AuthRestrictions", "auth_restrictions", "AuthRestrictions"),
+    # Encryption settings
+    Field("DataEncryption", "data_encryption", "DataEncryption"),
+    Field("EncryptionType", "encryption_type", "EncryptionType"),
+    # Additional settings from CMS file if available
+    Field("AdditionalSettings", "additional_settings", None, None),
+)
+
+# Compiled once: (attr, lower-cased PBK option, default) for options read from PBK
+_OPTION_FIELDS = tuple(
+    (field.attr, field.option.lower(), field.default)
+    for field in FIELDS
+    if field.option is not None
+)
+
+# Compiled once: dict view key -> attr, in field order
+_KEY_ATTRS = tuple((field.key, field.attr) for field in FIELDS)
+
+# Compiled once: lower-cased dict view key -> attr, for case-insensitive lookup
+_LOOKUP = {field.key.lower(): field.attr for field in FIELDS}
+
+
+class VPNEntry(Mapping):
+    """
+    A VPN configuration with a fixed set of fields and free-form extras.
+
+    Fields are stored in slots; PBK options without a field are kept in
+    ``extra`` under their lower-cased names. The entry is also a read-only
+    mapping with case-insensitive keys, so code written against the
+    dictionaries returned by earlier versions keeps working.
+    """
+
+    __slots__ = tuple(field.attr for field in FIELDS) + ("extra",)
+
+    def __init__(self, extra: Optional[Dict[str, str]] = None, **fields: Any):
+        """Initialize entry from field attributes; omitted fields get defaults."""
+        for field in FIELDS:
+            setattr(self, field.attr, fields.pop(field.attr, field.default))
+        if fields:
+            raise TypeError(f"Unknown VPNEntry fields: {', '.join(fields)}")
+        if self.additional_settings is None:
+            self.additional_settings = {}
+        self.extra = extra if extra is not None else {}
+
+    @classmethod
+    def from_options(
+        cls,
+        name: str,
+        options: Dict[str, str],
+        additional_settings: Optional[Dict[str, Any]] = None,
+    ) -> "VPNEntry":
+        """Build an entry from the lower-cased options of a PBK section."""
+        entry = cls.__new__(cls)
+        entry.name = name
+        for attr, option, default in _OPTION_FIELDS:
+            setattr(entry, attr, options.get(option, default))
+        entry.additional_settings = additional_settings or {}
+        entry.extra = {
+            key: value for key, value in options.items() if key not in _LOOKUP
+        }
+        return entry
+
+    @classmethod
+    def coerce(cls, vpn_config: Mapping) -> "VPNEntry":
+        """Return the entry itself, or build one from a dict-like config."""
+        if isinstance(vpn_config, cls):
+            return vpn_config
+
+        fields: Dict[str, Any] = {}
+        extra: Dict[str, str] = {}
+        for key, value in vpn_config.items():
+            attr = _LOOKUP.get(key.lower())
+            if attr is not None:
+                fields[attr] = value
+            else:
+                extra[key.lower()] = value
+        return cls(extra=extra, **fields)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the entry as a plain dict, as parse() used to."""
+        result = {key: getattr(self, attr) for key, attr in _KEY_ATTRS}
+        result.update(self.extra)
+        return result
+
+    def __getitem__(self, key: str) -> Any:
+        """Look up a field or extra option, ignoring case."""
+        lower = key.lower()
+        attr = _LOOKUP.get(lower)
+        if attr is not None:
+            return getattr(self, attr)
+        return self.extra[lower]
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over field keys followed by extra option names."""
+        for key, _ in _KEY_ATTRS:
+            yield key
+        yield from self.extra
+
+    def __len__(self) -> int:
+        """Return the number of fields and extra options."""
+        return len(_KEY_ATTRS) + len(self.extra)
+
+    def __repr__(self) -> str:
+        """Return a short representation with the entry name and type."""
+        return f"VPNEntry(name={self.name!r}, type={self.type!r})"
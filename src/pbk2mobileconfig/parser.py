@@ -3,172 +3,371 @@ Parser module for reading and parsing Windows PBK files.
 """
 
 import os
-import configparser
-from typing import Dict, Any, List
-import chardet
+import warnings
+from typing import (
+    Dict,
+    Any,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+)
+from .encoding import iter_lines, read_text
+from .index import SectionIndex
+from .models import VPNEntry
+from .sidecars import (
+    SidecarFile,
+    Sidecars,
+    SidecarWarning,
+    find_sidecars,
+    load_sidecar,
+)
+from .stats import Instrumentation
+from .tokenizer import DEFAULT_SECTION, iter_sections, merge_sections
+
+
+class PhonebookWarning(UserWarning):
+    """Streamed entries of a phonebook differ from those of parse()."""
 
 
 class PBKParser:
     """Parser for Windows PBK (Phone Book) files."""
 
-    def __init__(self, pbk_path: str):
-        """Initialize parser with PBK file path."""
+    def __init__(
+        self, pbk_path: str, instrumentation: Optional[Instrumentation] = None
+    ):
+        """
+        Initialize parser with PBK file path.
+
+        With ``instrumentation``, sidecar loading and parsing are recorded
+        as the ``sidecars`` and ``parse`` stages.
+        """
         self.pbk_path = pbk_path
-        self.config = configparser.ConfigParser(strict=False)
-        self.raw_content = ""
+        self.instrumentation = instrumentation
         self._additional_files = {}
+        self._sidecars: Optional[Sidecars] = None
+        self._text: Optional[str] = None
 
-    def read_file_safely(self, file_path: str) -> str:
-        """Read file content with automatic encoding detection."""
-        # Try UTF-8 first (most common)
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                return f.read()
-        except UnicodeDecodeError:
-            pass
-
-        # Try common encodings
-        encodings = [
-            "latin-1",
-            "cp1252",
-            "iso-8859-1",
-            "ascii",
-            "utf-16-le",
-            "utf-16-be",
-        ]
-        for encoding in encodings:
+    @classmethod
+    def from_text(
+        cls,
+        text: str,
+        sidecars: Optional[Mapping[str, str]] = None,
+        name: str = "<memory>",
+        instrumentation: Optional[Instrumentation] = None,
+    ) -> "PBKParser":
+        """
+        Create a parser for PBK content that is already in memory.
+
+        ``sidecars`` maps extensions such as ``.cms`` to decoded sidecar
+        contents. The parser never touches the filesystem; ``name`` stands
+        in for the file path, and ``name`` plus the extension for the
+        paths of the sidecars.
+        """
+        parser = cls(name, instrumentation)
+        parser._text = text
+        parser._additional_files = dict(sidecars or {})
+        parser._sidecars = Sidecars.from_contents(
+            parser._additional_files,
+            {ext: name + ext for ext in parser._additional_files},
+        )
+        return parser
+
+    @classmethod
+    def from_archive(
+        cls,
+        archive_path: str,
+        member: Optional[str] = None,
+        instrumentation: Optional[Instrumentation] = None,
+    ) -> "PBKParser":
+        """
+        Create a parser for a phonebook inside a zip or tar archive.
+
+        The phonebook and the sidecars with the same base name in its
+        archive directory are read into memory without extracting them.
+        Without ``member`` the archive must contain a single phonebook.
+        """
+        from .archive import member_path, open_archive
+        from .encoding import decode_bytes
+
+        archive = open_archive(archive_path)
+        bundle = archive.bundle(member)
+        name = member_path(archive_path, bundle.pbk)
+        data, sidecar_data = archive.read_bundle(bundle)
+        names = {
+            extension: member_path(archive_path, sidecar)
+            for extension, sidecar in bundle.sidecars.items()
+        }
+        sidecars = {}
+        for extension, content in sidecar_data.items():
             try:
-                with open(file_path, "r", encoding=encoding) as f:
-                    return f.read()
-            except UnicodeDecodeError:
-                continue
+                sidecars[extension] = decode_bytes(content, names[extension])
+            except ValueError as e:
+                warnings.warn(
+                    f"Skipping sidecar {names[extension]}: {e}",
+                    SidecarWarning,
+                    stacklevel=2,
+                )
+        parser = cls.from_text(
+            decode_bytes(data, name), sidecars, name, instrumentation
+        )
+        parser._sidecars = Sidecars.from_contents(sidecars, names)
+        return parser
+
+    @classmethod
+    def for_path(
+        cls, path: str, instrumentation: Optional[Instrumentation] = None
+    ) -> "PBKParser":
+        """
+        Create a parser for a PBK file, an archive or an archive member.
 
-        # Fallback to reading as binary and attempt to detect encoding
-        try:
-            with open(file_path, "rb") as f:
-                raw_data = f.read()
-            detected = chardet.detect(raw_data)
-            encoding = detected["encoding"]
-            if encoding:
-                return raw_data.decode(encoding)
-        except Exception as e:
-            raise ValueError(f"Error detecting encoding: {e}")
+        Archive members are given as ``<archive>!<member>``, see the
+        archive module.
+        """
+        from .archive import split_archive_path
 
-        raise ValueError(f"Could not read file {file_path} with any supported encoding")
+        archive = split_archive_path(path)
+        if archive is None:
+            return cls(path, instrumentation)
+        return cls.from_archive(archive[0], archive[1], instrumentation)
+
+    def read_file_safely(
+        self, file_path: str, attempts: Optional[List[str]] = None
+    ) -> str:
+        """Read file content with automatic encoding detection."""
+        return read_text(file_path, attempts)
 
     def _load_additional_files(self) -> None:
-        """Load additional configuration files from the same directory."""
-        base_dir = os.path.dirname(self.pbk_path)
-        base_name = os.path.splitext(os.path.basename(self.pbk_path))[0]
-
-        additional_extensions = [".cmp", ".cms", ".inf"]
-        for ext in additional_extensions:
-            path = os.path.join(base_dir, f"{base_name}{ext}")
-            if os.path.exists(path):
-                try:
-                    content = self.read_file_safely(path)
-                    self._additional_files[ext] = content
-                except Exception:
-                    pass
-
-    def parse(self) -> List[Dict[str, Any]]:
-        """Parse PBK file and return list of VPN configurations."""
-        if not os.path.isfile(self.pbk_path):
-            raise FileNotFoundError(f"File not found: {self.pbk_path}")
+        """Find the sidecar files next to the PBK file; they load lazily."""
+        if self._sidecars is not None:
+            return
+        if self.instrumentation is not None:
+            with self.instrumentation.stage("sidecars"):
+                paths = find_sidecars(self.pbk_path)
+        else:
+            paths = find_sidecars(self.pbk_path)
+        self._sidecars = Sidecars.from_paths(paths, self._load_sidecar)
 
-        # Read main PBK file
-        self.raw_content = self.read_file_safely(self.pbk_path)
+    def _load_sidecar(self, extension: str, path: str) -> Optional[SidecarFile]:
+        """Load a sidecar on first access, recording it as ``sidecars``."""
+        if self.instrumentation is None:
+            return load_sidecar(extension, path)
+        with self.instrumentation.stage("sidecars", complete=False) as stats:
+            attempts: List[str] = []
+            sidecar = load_sidecar(extension, path, attempts)
+            if attempts:
+                stats.encoding_attempts += len(attempts)
+                stats.bytes_read += os.path.getsize(path)
+        return sidecar
 
-        # Load additional files
+    @property
+    def sidecars(self) -> Sidecars:
+        """Sidecar files found next to the PBK file, loaded on first access."""
         self._load_additional_files()
+        assert self._sidecars is not None
+        return self._sidecars
 
-        # Parse configuration
-        if not self.raw_content.startswith("["):
-            self.raw_content = "[DEFAULT]\n" + self.raw_content
-        self.config.read_string(self.raw_content)
+    def iter_entries(self) -> Iterator[VPNEntry]:
+        """
+        Yield VPN configurations one at a time in a single pass over the file.
 
-        vpn_configs = []
+        Only the section currently being read and the names of the sections
+        read so far are held in memory. Options placed before the first
+        section or in ``[DEFAULT]`` sections apply to the entries after
+        them, and the ``PhoneNumber`` of an entry is taken from its own
+        section.
 
-        # Extract phone number from the DEVICE section if present
-        phone_number = ""
-        for line in self.raw_content.splitlines():
-            if line.startswith("PhoneNumber="):
-                phone_number = line.split("=", 1)[1].strip()
+        An entry is final once yielded, so options of a later occurrence
+        of its section or of a ``[DEFAULT]`` section after it are not
+        applied to it, unlike in parse() and ConfigParser(strict=False).
+        Such phonebooks are reported with a PhonebookWarning. Content given
+        to from_text() is in memory and always merged like by parse().
+        """
+        if self.instrumentation is None:
+            return self._iter_entries()
+        return self.instrumentation.iterate("parse", self._iter_entries())
 
-        for section in self.config.sections():
-            vpn_type = self.config.get(section, "Type", fallback="").strip()
+    def _iter_entries(
+        self, conflicts: Optional[List[str]] = None
+    ) -> Iterator[VPNEntry]:
+        """
+        Generate the entries of iter_entries().
 
-            # Skip non-VPN sections
-            if not vpn_type:
+        Options that cannot be applied to entries already yielded are
+        reported with a PhonebookWarning, or with ``conflicts`` appended to
+        that list instead and the generator stopped.
+        """
+        # Load additional files
+        attempts: List[str] = []
+        lines = self._lines(attempts)
+        self._load_additional_files()
+
+        defaults: Dict[str, str] = {}
+        sections: Iterable[Tuple[str, Dict[str, str]]] = iter_sections(lines)
+        if self._text is not None:
+            sections = merge_sections(sections)
+            for section, options in sections:
+                if section == DEFAULT_SECTION:
+                    defaults.update(options)
+
+        # Names only, to notice repeated sections
+        seen: Set[str] = set()
+        for section, options in sections:
+            if self._text is not None:
+                if section == DEFAULT_SECTION:
+                    continue
+            elif section == DEFAULT_SECTION:
+                if seen and not self._conflict(
+                    conflicts, "a [DEFAULT] section follows entries"
+                ):
+                    return
+                defaults.update(options)
                 continue
+            elif section in seen:
+                if not self._conflict(conflicts, f"section {section!r} is repeated"):
+                    return
+                continue
+            else:
+                seen.add(section)
 
-            # Create base VPN configuration
-            vpn_config = {
-                "Name": section,
-                "Type": vpn_type,
-                "PhoneNumber": phone_number,
-                # Basic settings
-                "UserName": self.config.get(section, "UserName", fallback="").strip(),
-                "Password": self.config.get(section, "Password", fallback="").strip(),
-                "SharedSecret": self.config.get(
-                    section, "PreSharedKey", fallback=""
-                ).strip(),
-                # DNS settings
-                "IpDnsAddress": self.config.get(
-                    section, "IpDnsAddress", fallback=""
-                ).strip(),
-                "IpDns2Address": self.config.get(
-                    section, "IpDns2Address", fallback=""
-                ).strip(),
-                "IpDnsSuffix": self.config.get(
-                    section, "IpDnsSuffix", fallback=""
-                ).strip(),
-                # Device settings
-                "Device": self.config.get(
-                    section, "PreferredDevice", fallback=""
-                ).strip(),
-                # Authentication settings
-                "UseExtendedAuth": self.config.get(
-                    section, "UseExtendedAuthentication", fallback="1"
-                ).strip(),
-                "AuthRestrictions": self.config.get(
-                    section, "AuthRestrictions", fallback=""
-                ).strip(),
-                # Encryption settings
-                "DataEncryption": self.config.get(
-                    section, "DataEncryption", fallback=""
-                ).strip(),
-                "EncryptionType": self.config.get(
-                    section, "EncryptionType", fallback=""
-                ).strip(),
-                # Additional settings from CMS file if available
-                "AdditionalSettings": self._parse_additional_settings(section),
-            }
-
-            # Add any section-specific settings
-            for key, value in self.config.items(section):
-                if key.lower() not in [k.lower() for k in vpn_config.keys()]:
-                    vpn_config[key] = value.strip()
-
-            vpn_configs.append(vpn_config)
-
-        return vpn_configs
+            values = {**defaults, **options} if defaults else options
+            vpn_config = self._build_entry(section, values)
+            if vpn_config is not None:
+                yield vpn_config
 
-    def _parse_additional_settings(self, section: str) -> Dict[str, Any]:
-        """Parse additional settings from CMS and other files."""
-        settings = {}
+        if self.instrumentation is not None and self._text is None:
+            self.instrumentation.count(
+                "parse",
+                bytes_read=os.path.getsize(self.pbk_path),
+                encoding_attempts=len(attempts),
+            )
 
-        # Parse CMS file if available
-        if ".cms" in self._additional_files:
-            cms_config = configparser.ConfigParser(strict=False)
-            try:
-                cms_config.read_string(self._additional_files[".cms"])
-                if cms_config.has_section(section):
-                    settings.update(dict(cms_config.items(section)))
-            except configparser.Error:
-                pass
+    def _conflict(self, conflicts: Optional[List[str]], message: str) -> bool:
+        """Report options a stream cannot apply; return whether to go on."""
+        if conflicts is not None:
+            conflicts.append(message)
+            return False
+        warnings.warn(
+            f"{self.pbk_path}: {message}; streamed entries differ from parse()",
+            PhonebookWarning,
+            stacklevel=3,
+        )
+        return True
+
+    def _iter_indexed_entries(self) -> Iterator[VPNEntry]:
+        """Yield the entries with merged options, read through the index."""
+        attempts: List[str] = []
+        reads: List[int] = []
+        index = SectionIndex.for_file(self.pbk_path, attempts, reads)
+        defaults = index.read_defaults(reads)
+        for section in index.names():
+            options = index.read_section(section, reads) or {}
+            values = {**defaults, **options} if defaults else options
+            vpn_config = self._build_entry(section, values)
+            if vpn_config is not None:
+                yield vpn_config
+
+        if self.instrumentation is not None:
+            self.instrumentation.count(
+                "parse", bytes_read=sum(reads), encoding_attempts=len(attempts)
+            )
+
+    def _lines(self, attempts: Optional[List[str]] = None) -> Iterable[str]:
+        """Return the lines of the PBK content, streamed from disk for files."""
+        if self._text is not None:
+            return self._text.splitlines()
+        if not os.path.isfile(self.pbk_path):
+            raise FileNotFoundError(f"File not found: {self.pbk_path}")
+        return iter_lines(self.pbk_path, attempts=attempts)
+
+    def parse(self) -> List[VPNEntry]:
+        """
+        Parse PBK file and return list of VPN configurations.
+
+        Results match ConfigParser(strict=False): a repeated section is one
+        entry at its first occurrence with the options of all occurrences
+        merged, and ``[DEFAULT]`` sections apply to every entry. The file
+        is read in a single pass, and read again through the byte-offset
+        index only when it has repeated sections or a late ``[DEFAULT]``.
+        """
+        if self.instrumentation is None:
+            return self._parse()
+        with self.instrumentation.stage("parse") as stats:
+            entries = self._parse()
+            stats.entries += len(entries)
+        return entries
+
+    def _parse(self) -> List[VPNEntry]:
+        """Collect the entries for parse()."""
+        conflicts: List[str] = []
+        entries = list(self._iter_entries(conflicts))
+        if conflicts:
+            entries = list(self._iter_indexed_entries())
+        return entries
+
+    def get_entry(self, name: str) -> Optional[VPNEntry]:
+        """
+        Return the VPN configuration of a single named entry.
 
-        return settings
+        Only the requested section is decoded and parsed, using a byte-offset
+        index of the file that is reused while the file is unchanged, see
+        index.set_directory() for keeping it across processes.
+        Returns None when there is no VPN entry with that name. Content given
+        to from_text() is scanned instead, as it has no file to index.
+        """
+        if self.instrumentation is None:
+            return self._get_entry(name)
+        with self.instrumentation.stage("parse") as stats:
+            entry = self._get_entry(name)
+            stats.entries += entry is not None
+        return entry
+
+    def _get_entry(self, name: str) -> Optional[VPNEntry]:
+        """Look up a single entry for get_entry()."""
+        if self._text is not None:
+            for entry in self._iter_entries():
+                if entry.name == name:
+                    return entry
+            return None
+
+        if not os.path.isfile(self.pbk_path):
+            raise FileNotFoundError(f"File not found: {self.pbk_path}")
+
+        attempts: List[str] = []
+        reads: List[int] = []
+        index = SectionIndex.for_file(self.pbk_path, attempts, reads)
+        options = index.read_section(name, reads)
+        entry = None
+        if options is not None:
+            defaults = index.read_defaults(reads)
+            values = {**defaults, **options} if defaults else options
+            entry = self._build_entry(name, values)
+
+        if self.instrumentation is not None:
+            self.instrumentation.count(
+                "parse", bytes_read=sum(reads), encoding_attempts=len(attempts)
+            )
+        return entry
+
+    def _build_entry(self, section: str, values: Dict[str, str]) -> Optional[VPNEntry]:
+        """Build a VPN entry from the lower-cased options of a section."""
+        # Skip non-VPN sections
+        if not values.get("type"):
+            return None
+
+        return VPNEntry.from_options(
+            section, values, self._parse_additional_settings(section)
+        )
+
+    def _parse_additional_settings(self, section: str) -> Dict[str, Any]:
+        """Parse additional settings from CMS and other files."""
+        cms = self.sidecars.cms
+        if cms is None:
+            return {}
+        return cms.section(section)
 
     def get_vpn_type_name(self, type_id: str) -> str:
         """Convert numeric VPN type to string name."""
@@ -0,0 +1,71 @@
+"""
+Streaming property list writer for mobileconfig profiles.
+
+The XML writer extends ``plistlib``'s own writer so the output stays
+byte-identical to ``plistlib.dump``, but any iterator found in the value
+(typically ``PayloadContent``) is written item by item as it is consumed,
+so only one payload needs to be in memory at a time.
+"""
+
+import plistlib
+from collections.abc import Iterator
+from typing import Any, BinaryIO, Dict
+
+FORMATS = {
+    "xml": plistlib.FMT_XML,
+    "binary": plistlib.FMT_BINARY,
+}
+
+_END = object()
+
+
+class StreamingPlistWriter(plistlib._PlistWriter):  # type: ignore[name-defined]
+    """XML plist writer that writes iterators as arrays while consuming them."""
+
+    def write_value(self, value: Any) -> None:
+        """Write a value, streaming iterators instead of requiring lists."""
+        if isinstance(value, Iterator):
+            self.write_stream(value)
+        else:
+            super().write_value(value)
+
+    def write_stream(self, items: Iterator) -> None:
+        """Write an iterator exactly like plistlib writes the equivalent list."""
+        first = next(items, _END)
+        if first is _END:
+            self.simple_element("array")
+            return
+
+        self.begin_element("array")
+        self.write_value(first)
+        for value in items:
+            self.write_value(value)
+        self.end_element("array")
+
+
+def _materialize(value: Any) -> Any:
+    """Turn iterators nested in dicts and lists into lists."""
+    if isinstance(value, Iterator):
+        return [_materialize(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _materialize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_materialize(item) for item in value]
+    return value
+
+
+def dump_profile(
+    profile: Dict[str, Any], fp: BinaryIO, fmt: Any = plistlib.FMT_XML
+) -> None:
+    """
+    Write a profile whose values may contain iterators to a binary file.
+
+    XML output is streamed. The binary format stores an offset table and
+    object references sized by the total object count, which are only
+    known once every object exists, so iterators are collected into lists
+    before handing the profile to ``plistlib``.
+    """
+    if fmt == plistlib.FMT_XML:
+        StreamingPlistWriter(fp).write(profile)
+    else:
+        plistlib.dump(_materialize(profile), fp, fmt=fmt)
@@ -0,0 +1,288 @@
+"""
+Local HTTP service converting PBK files to mobileconfig profiles.
+
+A small HTTP/1.1 front end on asyncio accepts ``POST /convert`` with the
+PBK file as request body and converter options as query parameters, and
+returns the profile. Parsing and conversion run on an executor, at most
+``max_concurrency`` requests at a time, each bounded by a timeout. A
+conversion that times out keeps its slot until the executor finishes it.
+Connections are kept alive between requests unless the client closes them.
+"""
+
+import sys
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor
+from http import HTTPStatus
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+from .api import convert_pbk_counted
+from .plistwriter import FORMATS
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_REQUEST_TIMEOUT = 30.0
+DEFAULT_KEEP_ALIVE_TIMEOUT = 5.0
+DEFAULT_MAX_BODY_SIZE = 10 * 1024 * 1024
+
+MAX_HEADER_SIZE = 64 * 1024
+
+CONTENT_TYPE = "application/x-apple-aspen-config"
+
+TRUE_VALUES = ("1", "true", "yes", "on")
+
+
+class HTTPError(Exception):
+    """An error that is answered with the given HTTP status."""
+
+    def __init__(self, status: HTTPStatus, message: str = ""):
+        """Initialize error with a status and an optional message."""
+        super().__init__(message or status.phrase)
+        self.status = status
+
+
+def parse_options(query: str) -> Tuple[Dict[str, Any], str, Optional[str]]:
+    """
+    Parse converter options, format name and entry from a query string.
+
+    Supported parameters are ``org``, ``identifier``, ``removable``,
+    ``deterministic_uuids``, ``include_secrets``, ``format`` (``xml`` or
+    ``binary``) and ``entry``.
+    """
+    params = {key: values[-1] for key, values in parse_qs(query).items()}
+    options = {
+        "organization": params.get("org", "Organization"),
+        "identifier": params.get("identifier", "com.example.vpn"),
+        "removable": params.get("removable", "1").lower() in TRUE_VALUES,
+        "deterministic_uuids": params.get("deterministic_uuids", "0").lower()
+        in TRUE_VALUES,
+        "include_secrets": params.get("include_secrets", "0").lower() in TRUE_VALUES,
+    }
+    fmt = params.get("format", "xml")
+    if fmt not in FORMATS:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"Unknown format: {fmt}")
+    return options, fmt, params.get("entry")
+
+
+class ConversionServer:
+    """Asyncio HTTP server that converts uploaded PBK files on an executor."""
+
+    def __init__(
+        self,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        executor: Optional[Executor] = None,
+        workers: Optional[int] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        request_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+        keep_alive_timeout: float = DEFAULT_KEEP_ALIVE_TIMEOUT,
+        max_body_size: int = DEFAULT_MAX_BODY_SIZE,
+    ):
+        """
+        Initialize server settings.
+
+        Without an ``executor``, conversions run on a process pool with
+        ``workers`` processes that is shut down by close().
+        """
+        self.host = host
+        self.port = port
+        self.max_concurrency = max_concurrency
+        self.request_timeout = request_timeout
+        self.keep_alive_timeout = keep_alive_timeout
+        self.max_body_size = max_body_size
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._workers = workers
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def start(self) -> None:
+        """Start listening; with port 0 the bound port is stored in ``port``."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self._workers)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port, limit=MAX_HEADER_SIZE
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        """Start the server if needed and serve until cancelled."""
+        if self._server is None:
+            await self.start()
+        assert self._server is not None
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        """Stop listening and shut down an executor created by the server."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._owns_executor and self._executor is not None:
+            if sys.version_info >= (3, 9):
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            else:
+                self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def __aenter__(self) -> "ConversionServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Serve requests on a connection until it is closed or idle too long."""
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(
+                        reader.readuntil(b"\r\n\r\n"), self.keep_alive_timeout
+                    )
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._respond(
+                        writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE
+                    )
+                    break
+
+                try:
+                    keep_alive = await self._handle_request(head, reader, writer)
+                except HTTPError as e:
+                    await self._respond(writer, e.status, str(e).encode())
+                    keep_alive = False
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _handle_request(
+        self,
+        head: bytes,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> bool:
+        """Answer one request and return whether to keep the connection open."""
+        try:
+            request_line, *header_lines = head.decode("latin-1").split("\r\n")
+            method, target, version = request_line.split(" ")
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+
+        headers = {}
+        for line in header_lines:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+        connection = headers.get("connection", "").lower()
+        if version == "HTTP/1.0":
+            keep_alive = connection == "keep-alive"
+        else:
+            keep_alive = connection != "close"
+
+        # A plain run of digits; int() would also accept signs and spaces
+        content_length = headers.get("content-length", "0")
+        if not (content_length.isascii() and content_length.isdigit()):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        length = int(content_length)
+        if length > self.max_body_size:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        try:
+            body = await asyncio.wait_for(
+                reader.readexactly(length), self.request_timeout
+            )
+        except asyncio.TimeoutError:
+            raise HTTPError(HTTPStatus.REQUEST_TIMEOUT)
+
+        url = urlsplit(target)
+        if url.path == "/health" and method == "GET":
+            await self._respond(writer, HTTPStatus.OK, b"ok\n", keep_alive=keep_alive)
+        elif url.path == "/convert":
+            if method != "POST":
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+            status, payload, extra = await self._convert(url.query, body)
+            content_type = CONTENT_TYPE if status == HTTPStatus.OK else "text/plain"
+            await self._respond(
+                writer, status, payload, content_type, extra, keep_alive
+            )
+        else:
+            raise HTTPError(HTTPStatus.NOT_FOUND)
+        return keep_alive
+
+    async def _convert(
+        self, query: str, body: bytes
+    ) -> Tuple[HTTPStatus, bytes, Dict[str, str]]:
+        """Run a conversion on the executor within the concurrency limit."""
+        options, fmt, entry = parse_options(query)
+        if not body:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Empty request body")
+
+        assert self._semaphore is not None and self._executor is not None
+        loop = asyncio.get_running_loop()
+
+        async def run() -> Tuple[int, bytes]:
+            await self._semaphore.acquire()
+            try:
+                future = self._executor.submit(
+                    convert_pbk_counted, body, None, entry, fmt, **options
+                )
+            except BaseException:
+                self._semaphore.release()
+                raise
+            # A timed out conversion keeps running on the executor, so its
+            # slot is only freed once the job itself has finished
+            future.add_done_callback(lambda _: self._release(loop))
+            return await asyncio.wrap_future(future)
+
+        try:
+            count, data = await asyncio.wait_for(run(), self.request_timeout)
+        except asyncio.TimeoutError:
+            return HTTPStatus.GATEWAY_TIMEOUT, b"Conversion timed out\n", {}
+        except ValueError as e:
+            return HTTPStatus.UNPROCESSABLE_ENTITY, f"{e}\n".encode(), {}
+        except Exception as e:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, f"{e}\n".encode(), {}
+        return HTTPStatus.OK, data, {"X-VPN-Entries": str(count)}
+
+    def _release(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Free a conversion slot; called from executor threads."""
+        assert self._semaphore is not None
+        try:
+            loop.call_soon_threadsafe(self._semaphore.release)
+        except RuntimeError:
+            # The event loop is closed, so nothing waits for the slot
+            pass
+
+    async def _respond(
+        self,
+        writer: asyncio.StreamWriter,
+        status: HTTPStatus,
+        body: bytes = b"",
+        content_type: str = "text/plain",
+        headers: Optional[Dict[str, str]] = None,
+        keep_alive: bool = False,
+    ) -> None:
+        """Write a complete response."""
+        if not body and status != HTTPStatus.OK:
+            body = f"{status.phrase}\n".encode()
+        lines = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
@@ -0,0 +1,378 @@
+"""
+Splitting the entries of a phonebook across several smaller profiles.
+
+Entries can be written one profile per entry, in shards of at most N
+entries or in shards of at most N bytes. Each profile gets its own
+identifier and UUID so MDM treats them as separate profiles, and the
+shards are rendered and serialized on worker processes in parallel. A
+manifest next to the profiles maps every entry to its file.
+
+Shards by size are planned from estimated payload sizes. Binary plists
+share keys and values between payloads, so their estimates are
+calibrated against whole serialized chunks of payloads, and a rendered
+shard still over the limit is split and rendered again.
+"""
+
+import io
+import os
+import re
+import json
+import math
+import plistlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+from .converter import VPNProfileConverter
+from .fsutil import OUTPUT_EXTENSION, chunksize, write_atomically
+from .models import VPNEntry
+from .plistwriter import dump_profile
+
+MANIFEST_NAME = "manifest.json"
+
+# Digits of the shard number in file names and identifier suffixes
+SHARD_WIDTH = 3
+
+# Number of entries measured per task when sharding by size
+MEASURE_CHUNK_SIZE = 256
+
+
+class Shard(NamedTuple):
+    """Entries to be written to one profile."""
+
+    suffix: str
+    entries: List[VPNEntry]
+
+
+class ShardResult(NamedTuple):
+    """A written profile and the entries it contains."""
+
+    path: str
+    identifier: str
+    entries: List[str]
+    size: int
+
+
+def slugify(name: str) -> str:
+    """Turn an entry name into a file name and identifier component."""
+    return re.sub(r"[^A-Za-z0-9_-]+", "-", name).strip("-") or "entry"
+
+
+def plan_per_entry(entries: Sequence[VPNEntry]) -> List[Shard]:
+    """Plan one profile per entry, named after the entry."""
+    shards = []
+    used: Dict[str, int] = {}
+    for entry in entries:
+        slug = slugify(entry.name)
+        key = slug.lower()
+        used[key] = used.get(key, 0) + 1
+        if used[key] > 1:
+            slug = f"{slug}-{used[key]}"
+        shards.append(Shard(slug, [entry]))
+    return shards
+
+
+def _shard_suffix(number: int) -> str:
+    """Return the suffix of the numbered shard."""
+    return f"part{number:0{SHARD_WIDTH}d}"
+
+
+def plan_by_count(entries: Sequence[VPNEntry], max_entries: int) -> List[Shard]:
+    """Plan shards of at most ``max_entries`` entries each."""
+    if max_entries < 1:
+        raise ValueError("max_entries must be at least 1")
+    return [
+        Shard(_shard_suffix(number + 1), list(entries[start : start + max_entries]))
+        for number, start in enumerate(range(0, len(entries), max_entries))
+    ]
+
+
+def plan_by_size(
+    entries: Sequence[VPNEntry], sizes: Sequence[int], overhead: int, max_bytes: int
+) -> List[Shard]:
+    """
+    Plan shards whose estimated size stays within ``max_bytes``.
+
+    ``sizes`` are the estimated sizes of the entries' payloads and
+    ``overhead`` the size of a profile around them. Entries keep their
+    order; an entry too large on its own gets a shard of its own.
+    """
+    shards: List[Shard] = []
+    current: List[VPNEntry] = []
+    total = overhead
+    for entry, size in zip(entries, sizes):
+        if current and total + size > max_bytes:
+            shards.append(Shard(_shard_suffix(len(shards) + 1), current))
+            current, total = [], overhead
+        current.append(entry)
+        total += size
+    if current:
+        shards.append(Shard(_shard_suffix(len(shards) + 1), current))
+    return shards
+
+
+def _serialize(profile: Dict[str, Any], fmt: Any) -> bytes:
+    """Serialize a profile to bytes."""
+    output = io.BytesIO()
+    dump_profile(profile, output, fmt)
+    return output.getvalue()
+
+
+def payload_size(payload: Dict[str, Any], fmt: Any) -> int:
+    """
+    Estimate the bytes a payload adds to a profile.
+
+    For XML this is exact apart from multi-line strings: the serialized
+    payload without plist header and footer, indented two levels deeper.
+    Binary plists share keys and values between payloads, so the size of
+    the payload on its own is an upper bound.
+    """
+    data = plistlib.dumps(payload, fmt=fmt)
+    if fmt != plistlib.FMT_XML:
+        return len(data)
+    start = data.index(b"<dict>")
+    body = data[start : data.rindex(b"</plist>")]
+    return len(body) + 2 * body.count(b"\n")
+
+
+def profile_overhead(converter: VPNProfileConverter, fmt: Any) -> int:
+    """Return the size of a numbered shard profile without its payloads."""
+    empty = _serialize(converter.build_profile([], _shard_suffix(0)), fmt)
+    if fmt != plistlib.FMT_XML:
+        return len(empty)
+    # An empty array is written as <array/>, a filled one on two lines
+    return len(empty) - len(b"\t<array/>\n") + len(b"\t<array>\n\t</array>\n")
+
+
+# Settings of the current worker process, set by _init_worker
+_worker_converter: Optional[VPNProfileConverter] = None
+_worker_format: Any = plistlib.FMT_XML
+
+
+def _init_worker(options: Dict[str, Any], fmt: Any) -> None:
+    """Create the per-process converter used by the shard tasks."""
+    global _worker_converter, _worker_format
+    _worker_converter = VPNProfileConverter(**options)
+    _worker_format = fmt
+
+
+def _measure_chunk(entries: List[VPNEntry]) -> Tuple[List[int], int]:
+    """
+    Estimate the payload sizes of a chunk of entries.
+
+    For binary plists the size of the chunk serialized as one profile is
+    returned as well, to calibrate the estimates; 0 for XML.
+    """
+    assert _worker_converter is not None
+    payloads = [_worker_converter.convert_vpn_config(entry) for entry in entries]
+    sizes = [payload_size(payload, _worker_format) for payload in payloads]
+    if _worker_format == plistlib.FMT_XML:
+        return sizes, 0
+    profile = _worker_converter.build_profile(payloads, _shard_suffix(0))
+    return sizes, len(_serialize(profile, _worker_format))
+
+
+def calibrate_sizes(
+    measured: Sequence[Tuple[List[int], int]], overhead: int
+) -> List[int]:
+    """
+    Scale binary payload size estimates to what they add to a shared profile.
+
+    The ratio between serialized chunks and the sum of their payloads on
+    their own is taken from the chunk that shares the least.
+    """
+    ratio = max(
+        (total - overhead) / sum(sizes) for sizes, total in measured if sum(sizes)
+    )
+    ratio = min(ratio, 1.0)
+    return [
+        math.ceil(size * ratio) for chunk_sizes, _ in measured for size in chunk_sizes
+    ]
+
+
+def split_oversized(
+    shards: List[Shard],
+    results: List[ShardResult],
+    sizes: Dict[int, int],
+    overhead: int,
+    max_bytes: int,
+) -> Tuple[List[Shard], Optional[int]]:
+    """
+    Split rendered shards over ``max_bytes`` and renumber all shards.
+
+    ``sizes`` maps ``id()`` of the entries to their estimated sizes, which
+    are scaled by how far each oversized shard missed its estimate. Returns
+    the new plan and the position of the first changed shard, or None if
+    every shard fits.
+    """
+    first = None
+    planned: List[List[VPNEntry]] = []
+    for shard, result in zip(shards, results):
+        entries = shard.entries
+        if result.size <= max_bytes or len(entries) < 2:
+            planned.append(entries)
+            continue
+        if first is None:
+            first = len(planned)
+        estimate = sum(sizes[id(entry)] for entry in entries)
+        scale = (result.size - overhead) / max(estimate, 1)
+        scaled = [math.ceil(sizes[id(entry)] * scale) for entry in entries]
+        pieces = [
+            piece.entries
+            for piece in plan_by_size(entries, scaled, overhead, max_bytes)
+        ]
+        if len(pieces) < 2:
+            half = len(entries) // 2
+            pieces = [entries[:half], entries[half:]]
+        planned.extend(pieces)
+    if first is None:
+        return shards, None
+    return [
+        Shard(_shard_suffix(number + 1), entries)
+        for number, entries in enumerate(planned)
+    ], first
+
+
+def _render_shard(task: Tuple[Shard, str, bool]) -> ShardResult:
+    """Render, serialize and write one shard."""
+    assert _worker_converter is not None
+    shard, output_path, per_entry = task
+    display_name = shard.entries[0].name if per_entry else None
+    profile = _worker_converter.build_profile(
+        list(_worker_converter.iter_payloads(shard.entries)),
+        shard.suffix,
+        display_name or f"VPN Configuration ({shard.suffix})",
+    )
+    data = _serialize(profile, _worker_format)
+    write_atomically(output_path, lambda f: f.write(data))
+    return ShardResult(
+        output_path,
+        profile["PayloadIdentifier"],
+        [entry.name for entry in shard.entries],
+        len(data),
+    )
+
+
+def _run(
+    workers: int,
+    options: Dict[str, Any],
+    fmt: Any,
+    function: Callable[[Any], Any],
+    items: List[Any],
+) -> List[Any]:
+    """Apply a task function to items, on worker processes if more than one."""
+    workers = min(workers, max(len(items), 1))
+    if workers == 1:
+        _init_worker(options, fmt)
+        return [function(item) for item in items]
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(options, fmt)
+    ) as executor:
+        return list(
+            executor.map(function, items, chunksize=chunksize(len(items), workers))
+        )
+
+
+def write_shards(
+    entries: Sequence[VPNEntry],
+    output_dir: str,
+    options: Optional[Dict[str, Any]] = None,
+    fmt: Any = plistlib.FMT_XML,
+    per_entry: bool = False,
+    max_entries: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    stem: str = "profile",
+    workers: Optional[int] = None,
+) -> List[ShardResult]:
+    """
+    Write entries as several profiles into ``output_dir`` plus a manifest.
+
+    Exactly one of ``per_entry``, ``max_entries`` and ``max_bytes`` selects
+    the mode. Shards are named ``<stem>-partNNN.mobileconfig``, per-entry
+    profiles after the entry. ``options`` are passed to VPNProfileConverter.
+    """
+    if sum((per_entry, max_entries is not None, max_bytes is not None)) != 1:
+        raise ValueError("Choose one of per_entry, max_entries and max_bytes")
+    if not entries:
+        raise ValueError("No VPN configurations found in the input file")
+
+    options = options or {}
+    workers = workers or os.cpu_count() or 1
+
+    def render(shards: List[Shard]) -> List[ShardResult]:
+        tasks = []
+        for shard in shards:
+            name = shard.suffix if per_entry else f"{stem}-{shard.suffix}"
+            output_path = os.path.join(output_dir, name + OUTPUT_EXTENSION)
+            tasks.append((shard, output_path, per_entry))
+        return _run(workers, options, fmt, _render_shard, tasks)
+
+    if per_entry:
+        results = render(plan_per_entry(entries))
+    elif max_entries is not None:
+        results = render(plan_by_count(entries, max_entries))
+    else:
+        assert max_bytes is not None
+        chunks = [
+            list(entries[start : start + MEASURE_CHUNK_SIZE])
+            for start in range(0, len(entries), MEASURE_CHUNK_SIZE)
+        ]
+        measured = _run(workers, options, fmt, _measure_chunk, chunks)
+        overhead = profile_overhead(VPNProfileConverter(**options), fmt)
+        if fmt == plistlib.FMT_XML:
+            sizes = [size for chunk_sizes, _ in measured for size in chunk_sizes]
+        else:
+            sizes = calibrate_sizes(measured, overhead)
+        shards = plan_by_size(entries, sizes, overhead, max_bytes)
+        results = render(shards)
+
+        # Estimates may fall short, e.g. for multi-line strings in XML or
+        # little sharing in binary plists; shards before the first split
+        # keep their numbers and files
+        estimates = {id(entry): size for entry, size in zip(entries, sizes)}
+        while True:
+            shards, first = split_oversized(
+                shards, results, estimates, overhead, max_bytes
+            )
+            if first is None:
+                break
+            results = results[:first] + render(shards[first:])
+
+    write_manifest(
+        os.path.join(output_dir, MANIFEST_NAME),
+        results,
+        {"per_entry": per_entry, "max_entries": max_entries, "max_bytes": max_bytes},
+    )
+    return results
+
+
+def write_manifest(
+    path: str, results: List[ShardResult], settings: Dict[str, Any]
+) -> None:
+    """Write the JSON manifest mapping entries to profile files."""
+    base_dir = os.path.dirname(path)
+    profiles = []
+    entry_files = {}
+    for result in results:
+        file_name = os.path.relpath(result.path, base_dir)
+        profiles.append(
+            {
+                "file": file_name,
+                "identifier": result.identifier,
+                "entries": result.entries,
+                "bytes": result.size,
+            }
+        )
+        for name in result.entries:
+            entry_files[name] = file_name
+
+    manifest = {"settings": settings, "profiles": profiles, "entries": entry_files}
+    data = json.dumps(manifest, indent=2, ensure_ascii=False).encode("utf-8")
+    write_atomically(path, lambda f: f.write(data + b"\n"))
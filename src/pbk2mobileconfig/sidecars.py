@@ -0,0 +1,252 @@
+"""
+Connection Manager sidecar files (.cms, .cmp, .inf) shipped next to a PBK file.
+
+Sidecars are discovered with a single listing of the phonebook's
+directory, matching base names and extensions case-insensitively, and
+only read when first accessed. Listings and loaded sidecars are cached
+per process while the directory or file is unchanged, so the parsers of
+a batch run share them. Sidecars that cannot be read, decoded or parsed
+are skipped with a SidecarWarning.
+"""
+
+import os
+import time
+import warnings
+from typing import Callable, Dict, List, Optional, Tuple
+from .tokenizer import DEFAULT_SECTION, iter_sections
+
+SIDECAR_EXTENSIONS = (".cmp", ".cms", ".inf")
+
+CACHE_SIZE = 4096
+
+# Directories modified less than this many seconds before being listed may
+# change again within the same timestamp tick, so their listing is not kept
+RACY_SECONDS = 2.0
+
+
+class SidecarWarning(UserWarning):
+    """A sidecar file could not be read, decoded or parsed."""
+
+
+# Directory -> (mtime_ns, {(lower-cased base name, extension): path})
+_listing_cache: Dict[str, Tuple[int, Dict[Tuple[str, str], str]]] = {}
+
+# Sidecar path -> (size, mtime_ns, SidecarFile)
+_sidecar_cache: Dict[str, Tuple[int, int, "SidecarFile"]] = {}
+
+
+def _remember(cache: Dict, key: str, value: Tuple) -> None:
+    """Store a value in a bounded cache, dropping the oldest entry if full."""
+    if key not in cache and len(cache) >= CACHE_SIZE:
+        del cache[next(iter(cache))]
+    cache[key] = value
+
+
+def _list_directory(directory: str) -> Dict[Tuple[str, str], str]:
+    """Return the sidecar files of a directory by base name and extension."""
+    key = os.path.abspath(directory)
+    try:
+        mtime_ns = os.stat(key).st_mtime_ns
+    except OSError:
+        return {}
+    cached = _listing_cache.get(key)
+    if cached is not None and cached[0] == mtime_ns:
+        return cached[1]
+
+    files = {}
+    with os.scandir(key) as entries:
+        for entry in entries:
+            stem, ext = os.path.splitext(entry.name)
+            ext = ext.lower()
+            if ext in SIDECAR_EXTENSIONS and entry.is_file():
+                files[(stem.lower(), ext)] = os.path.join(directory, entry.name)
+    if time.time() - mtime_ns / 1e9 > RACY_SECONDS:
+        _remember(_listing_cache, key, (mtime_ns, files))
+    return files
+
+
+def find_sidecars(pbk_path: str) -> Dict[str, str]:
+    """Return the paths of sidecar files next to a PBK file, by extension."""
+    files = _list_directory(os.path.dirname(pbk_path) or os.curdir)
+    if not files:
+        return {}
+    stem = os.path.splitext(os.path.basename(pbk_path))[0].lower()
+    return {
+        ext: files[(stem, ext)] for ext in SIDECAR_EXTENSIONS if (stem, ext) in files
+    }
+
+
+def load_sidecar(
+    extension: str, path: str, attempts: Optional[List[str]] = None
+) -> Optional["SidecarFile"]:
+    """
+    Read and decode a sidecar file, reusing it while it is unchanged.
+
+    Returns None with a SidecarWarning if the file cannot be read or
+    decoded. Encoding detection steps are appended to ``attempts``.
+    """
+    from .encoding import read_text
+
+    key = os.path.abspath(path)
+    try:
+        stat = os.stat(key)
+        cached = _sidecar_cache.get(key)
+        if cached is not None and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return cached[2]
+        content = read_text(path, attempts)
+    except (OSError, ValueError) as e:
+        warnings.warn(f"Skipping sidecar {path}: {e}", SidecarWarning, stacklevel=2)
+        return None
+
+    sidecar = SidecarFile(extension, content, path)
+    if time.time() - stat.st_mtime_ns / 1e9 > RACY_SECONDS:
+        _remember(_sidecar_cache, key, (stat.st_size, stat.st_mtime_ns, sidecar))
+    return sidecar
+
+
+def clear_cache() -> None:
+    """Forget all cached directory listings and sidecar files."""
+    _listing_cache.clear()
+    _sidecar_cache.clear()
+
+
+class SidecarFile:
+    """A sidecar file indexed by section, parsed once on first access."""
+
+    def __init__(self, extension: str, content: str, path: Optional[str] = None):
+        """Initialize sidecar with its extension, decoded content and path."""
+        self.extension = extension
+        self.content = content
+        self.path = path
+        self._defaults: Dict[str, str] = {}
+        self._sections: Optional[Dict[str, Dict[str, str]]] = None
+
+    def _index(self) -> Dict[str, Dict[str, str]]:
+        """Tokenize the content into sections on first use."""
+        if self._sections is None:
+            sections: Dict[str, Dict[str, str]] = {}
+            try:
+                for name, options in iter_sections(self.content.splitlines()):
+                    if name == DEFAULT_SECTION:
+                        self._defaults.update(options)
+                    else:
+                        sections.setdefault(name, {}).update(options)
+            except ValueError as e:
+                # A malformed sidecar contributes no settings; the warning
+                # points past the accessor that called this method
+                warnings.warn(
+                    f"Ignoring malformed sidecar {self.path or self.extension}: {e}",
+                    SidecarWarning,
+                    stacklevel=3,
+                )
+                self._defaults = {}
+                sections = {}
+            self._sections = sections
+        return self._sections
+
+    def sections(self) -> List[str]:
+        """Return the section names in file order."""
+        return list(self._index())
+
+    def has_section(self, name: str) -> bool:
+        """Check whether the sidecar contains the given section."""
+        return name in self._index()
+
+    def section(self, name: str) -> Dict[str, str]:
+        """
+        Return a copy of the options of a section, including defaults.
+
+        Option names are lower-cased. A missing section yields an empty dict.
+        """
+        options = self._index().get(name)
+        if options is None:
+            return {}
+        return {**self._defaults, **options}
+
+    def get(self, section: str, option: str, fallback: str = "") -> str:
+        """Return a single option value of a section."""
+        options = self._index().get(section)
+        if options is None:
+            return fallback
+        option = option.lower()
+        return options.get(option, self._defaults.get(option, fallback))
+
+
+Loader = Callable[[str, str], Optional[SidecarFile]]
+
+
+class Sidecars:
+    """The sidecar files found for a PBK file, by type."""
+
+    def __init__(
+        self,
+        files: Optional[Dict[str, SidecarFile]] = None,
+        paths: Optional[Dict[str, str]] = None,
+        loader: Loader = load_sidecar,
+    ):
+        """
+        Initialize with loaded sidecar files and paths of unloaded ones.
+
+        Both are keyed by extension. A path is loaded with ``loader`` when
+        its sidecar is first accessed.
+        """
+        self._files = dict(files or {})
+        self._paths = dict(paths or {})
+        self._loader = loader
+
+    @classmethod
+    def from_paths(
+        cls, paths: Dict[str, str], loader: Loader = load_sidecar
+    ) -> "Sidecars":
+        """Build sidecars that are loaded from their paths on first access."""
+        return cls(paths=paths, loader=loader)
+
+    @classmethod
+    def from_contents(
+        cls, contents: Dict[str, str], names: Optional[Dict[str, str]] = None
+    ) -> "Sidecars":
+        """
+        Build sidecars from decoded contents keyed by extension.
+
+        ``names`` maps extensions to the names reported in warnings in
+        place of file paths.
+        """
+        names = names or {}
+        return cls(
+            {
+                ext: SidecarFile(ext, text, names.get(ext))
+                for ext, text in contents.items()
+            }
+        )
+
+    @property
+    def cms(self) -> Optional[SidecarFile]:
+        """Connection Manager service profile (.cms)."""
+        return self.get(".cms")
+
+    @property
+    def cmp(self) -> Optional[SidecarFile]:
+        """Connection Manager profile (.cmp)."""
+        return self.get(".cmp")
+
+    @property
+    def inf(self) -> Optional[SidecarFile]:
+        """Connection Manager installation file (.inf)."""
+        return self.get(".inf")
+
+    def get(self, extension: str) -> Optional[SidecarFile]:
+        """Return the sidecar with the given extension, loading it if needed."""
+        path = self._paths.pop(extension, None)
+        if path is not None:
+            sidecar = self._loader(extension, path)
+            if sidecar is not None:
+                self._files[extension] = sidecar
+        return self._files.get(extension)
+
+    def __contains__(self, extension: str) -> bool:
+        """Check whether a sidecar with the given extension was found."""
+        return extension in self._files or extension in self._paths
+
+    def __len__(self) -> int:
+        """Return the number of sidecar files found."""
+        return len(self._files.keys() | self._paths.keys())
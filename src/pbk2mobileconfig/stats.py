@@ -0,0 +1,192 @@
+"""
+Per-stage timing and memory instrumentation of conversions.
+
+An Instrumentation object is handed to PBKParser, VPNProfileConverter or
+convert_file() and records, per stage, the wall time, bytes read and
+written, encoding detection attempts, processed entries and optionally the
+tracemalloc peak. Parsing, conversion and writing are streamed into each
+other, so stages nest: time spent in an inner stage (e.g. ``parse`` pulled
+by ``convert``) is not counted for the outer one.
+
+Without an Instrumentation object nothing is recorded and the code paths
+are the uninstrumented ones.
+"""
+
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+# Stages in the order a conversion runs through them
+STAGES = ("cache", "sidecars", "parse", "convert", "dump")
+
+_END = object()
+
+
+class StageStats:
+    """Counters of one stage, accumulated over all of its runs."""
+
+    __slots__ = (
+        "name",
+        "seconds",
+        "bytes_read",
+        "bytes_written",
+        "encoding_attempts",
+        "entries",
+        "peak_bytes",
+    )
+
+    def __init__(self, name: str):
+        """Initialize empty counters for the named stage."""
+        self.name = name
+        self.seconds = 0.0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.encoding_attempts = 0
+        self.entries = 0
+        self.peak_bytes: Optional[int] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the counters as a JSON-serializable dictionary."""
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"StageStats({self.as_dict()!r})"
+
+
+Hook = Callable[[StageStats], None]
+
+
+class Instrumentation:
+    """
+    Recorder of per-stage statistics with completion hooks.
+
+    Hooks are called with the StageStats of a stage whenever a run of it
+    completes, e.g. when the parser has yielded its last entry. With
+    ``trace_memory`` the peak of tracemalloc-traced memory while a stage
+    was running is recorded; tracing slows everything down considerably.
+    """
+
+    def __init__(
+        self, hooks: Optional[Iterable[Hook]] = None, trace_memory: bool = False
+    ):
+        """Initialize recorder with optional hooks."""
+        self.stages: Dict[str, StageStats] = {}
+        self.hooks: List[Hook] = list(hooks or [])
+        self.trace_memory = trace_memory
+        self._started_tracing = False
+        # [stats, start of the currently running span] of each active stage
+        self._stack: List[List[Any]] = []
+
+    def add_hook(self, hook: Hook) -> None:
+        """Register a callback for completed stages."""
+        self.hooks.append(hook)
+
+    def _stats(self, name: str) -> StageStats:
+        """Return the counters of a stage, creating them on first use."""
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats(name)
+        return stats
+
+    def _switch(self, now: float) -> None:
+        """Charge the span since the last switch to the innermost stage."""
+        if not self._stack:
+            return
+        top = self._stack[-1]
+        stats = top[0]
+        stats.seconds += now - top[1]
+        top[1] = now
+        if self.trace_memory and tracemalloc.is_tracing():
+            peak = tracemalloc.get_traced_memory()[1]
+            stats.peak_bytes = max(stats.peak_bytes or 0, peak)
+            self._reset_peak()
+
+    def _reset_peak(self) -> None:
+        """Start measuring a new tracemalloc peak for the next span."""
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        elif self._started_tracing:
+            # Python 3.8 has no reset_peak(); restarting the tracing we own
+            # resets the peak, which then counts only new allocations
+            tracemalloc.stop()
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name: str, complete: bool = True) -> Iterator[StageStats]:
+        """
+        Measure the enclosed block as a run of the named stage.
+
+        With ``complete=False`` the block is only a part of a run and the
+        hooks are not called.
+        """
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        stats = self._stats(name)
+        now = time.perf_counter()
+        self._switch(now)
+        self._stack.append([stats, now])
+        try:
+            yield stats
+        finally:
+            self._switch(time.perf_counter())
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1][1] = time.perf_counter()
+            if complete:
+                self._notify(stats)
+
+    def iterate(self, name: str, iterable: Iterable) -> Iterator:
+        """Yield from an iterable, measuring each step as the named stage."""
+        iterator = iter(iterable)
+        stats = self._stats(name)
+        while True:
+            with self.stage(name, complete=False):
+                item = next(iterator, _END)
+                if item is not _END:
+                    stats.entries += 1
+            if item is _END:
+                break
+            yield item
+        self._notify(stats)
+
+    def count(self, name: str, **counters: int) -> None:
+        """Add to counters of a stage, e.g. ``count("parse", bytes_read=n)``."""
+        stats = self._stats(name)
+        for counter, value in counters.items():
+            setattr(stats, counter, getattr(stats, counter) + value)
+
+    def _notify(self, stats: StageStats) -> None:
+        """Call the hooks for a completed stage run."""
+        for hook in self.hooks:
+            hook(stats)
+
+    def as_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Return the counters of all stages, in pipeline order."""
+        order = {name: position for position, name in enumerate(STAGES)}
+        names = sorted(self.stages, key=lambda name: order.get(name, len(order)))
+        return {name: self.stages[name].as_dict() for name in names}
+
+    def close(self) -> None:
+        """Stop tracemalloc if memory tracing started it."""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+
+class CountingWriter:
+    """Binary file wrapper counting the bytes written through it."""
+
+    def __init__(self, fp: Any):
+        """Wrap a binary file object."""
+        self._fp = fp
+        self.written = 0
+
+    def write(self, data: bytes) -> int:
+        """Write data and count its length."""
+        self.written += len(data)
+        return self._fp.write(data)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._fp, name)
@@ -0,0 +1,200 @@
+"""
+Rendering one parsed phonebook for many tenants.
+
+The payloads of an entry only differ between converter settings in the
+keys returned by VPNProfileConverter.payload_identity(). The phonebook is
+therefore parsed and converted once into prototype payloads; a tenant's
+profile consists of shallow copies of the prototypes with just those keys
+recomputed, sharing the nested settings dicts. Tenants are rendered and
+written on worker processes, each receiving the prototypes once.
+
+A tenant manifest is a JSON list of objects with a ``name``, which names
+the output file, and any VPNProfileConverter options, e.g.::
+
+    [{"name": "acme", "organization": "Acme", "identifier": "com.acme.vpn"}]
+"""
+
+import os
+import json
+import plistlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+from .converter import VPNProfileConverter
+from .fsutil import OUTPUT_EXTENSION, chunksize, write_atomically
+from .plistwriter import dump_profile
+
+# Converter options a tenant may set
+TENANT_OPTIONS = ("organization", "identifier", "removable", "deterministic_uuids")
+
+
+class Tenant(NamedTuple):
+    """Name and converter options of one tenant."""
+
+    name: str
+    options: Dict[str, Any]
+
+
+class TenantResult(NamedTuple):
+    """Outcome of rendering the profile of one tenant."""
+
+    name: str
+    output_path: str
+    entries: int = 0
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        """Whether the profile was written successfully."""
+        return self.error is None
+
+
+def parse_tenants(items: Iterable[Mapping[str, Any]]) -> List[Tenant]:
+    """Validate tenant definitions as found in a tenant manifest."""
+    tenants = []
+    names = set()
+    for item in items:
+        options = dict(item)
+        name = options.pop("name", None)
+        if not isinstance(name, str) or not name:
+            raise ValueError(f"Tenant without name: {item!r}")
+        if os.path.basename(name) != name or name in (".", ".."):
+            raise ValueError(f"Invalid tenant name: {name}")
+        if name in names:
+            raise ValueError(f"Duplicate tenant name: {name}")
+        unknown = sorted(set(options) - set(TENANT_OPTIONS))
+        if unknown:
+            raise ValueError(f"Unknown options of tenant {name}: {', '.join(unknown)}")
+        names.add(name)
+        tenants.append(Tenant(name, options))
+    return tenants
+
+
+def load_tenants(path: str) -> List[Tenant]:
+    """Read a JSON tenant manifest."""
+    with open(path, encoding="utf-8") as f:
+        items = json.load(f)
+    if not isinstance(items, list):
+        raise ValueError(f"Tenant manifest must contain a list: {path}")
+    return parse_tenants(items)
+
+
+class PayloadPrototypes:
+    """Converted payloads of a phonebook, without their tenant-specific keys."""
+
+    def __init__(self, payloads: Iterable[Dict[str, Any]]):
+        """Initialize from payloads rendered by any converter."""
+        identity = VPNProfileConverter().payload_identity("")
+        self._payloads: Tuple[Dict[str, Any], ...] = tuple(
+            {key: value for key, value in payload.items() if key not in identity}
+            for payload in payloads
+        )
+
+    @classmethod
+    def from_entries(
+        cls, entries: Iterable[Mapping], include_secrets: bool = False
+    ) -> "PayloadPrototypes":
+        """
+        Convert parsed entries into prototypes.
+
+        ``include_secrets`` applies to every tenant, as it changes the
+        payload content rather than its identity.
+        """
+        converter = VPNProfileConverter(include_secrets=include_secrets)
+        return cls(converter.iter_payloads(entries))
+
+    def __len__(self) -> int:
+        return len(self._payloads)
+
+    def payloads(self, converter: VPNProfileConverter) -> Iterator[Dict[str, Any]]:
+        """
+        Yield the payloads as rendered by the converter.
+
+        Payloads share their nested settings dicts with the prototypes and
+        with the payloads of other converters, so they must not be modified.
+        """
+        for prototype in self._payloads:
+            payload = prototype.copy()
+            payload.update(converter.payload_identity(prototype["PayloadDisplayName"]))
+            yield payload
+
+    def render(self, converter: VPNProfileConverter) -> Dict[str, Any]:
+        """Return the profile the converter would generate, see payloads()."""
+        return converter.build_profile(list(self.payloads(converter)))
+
+
+# Settings of the current worker process, set by _init_worker
+_worker_prototypes: Optional[PayloadPrototypes] = None
+_worker_options: Dict[str, Any] = {}
+_worker_format: Any = plistlib.FMT_XML
+
+
+def _init_worker(
+    prototypes: PayloadPrototypes, options: Dict[str, Any], fmt: Any
+) -> None:
+    """Store the prototypes and shared settings used by _render_tenant."""
+    global _worker_prototypes, _worker_options, _worker_format
+    _worker_prototypes = prototypes
+    _worker_options = options
+    _worker_format = fmt
+
+
+def _render_tenant(task: Tuple[Tenant, str]) -> TenantResult:
+    """Render and write the profile of one tenant."""
+    assert _worker_prototypes is not None
+    tenant, output_path = task
+    try:
+        converter = VPNProfileConverter(**{**_worker_options, **tenant.options})
+        profile = _worker_prototypes.render(converter)
+        write_atomically(
+            output_path, lambda f: dump_profile(profile, f, _worker_format)
+        )
+    except Exception as e:
+        return TenantResult(tenant.name, output_path, error=str(e))
+    return TenantResult(tenant.name, output_path, entries=len(_worker_prototypes))
+
+
+def fan_out(
+    prototypes: PayloadPrototypes,
+    tenants: List[Tenant],
+    output_dir: str,
+    options: Optional[Dict[str, Any]] = None,
+    fmt: Any = plistlib.FMT_XML,
+    workers: Optional[int] = None,
+) -> Iterator[TenantResult]:
+    """
+    Write the profile of every tenant to ``<output_dir>/<name>.mobileconfig``.
+
+    Tenant options override ``options``. Results are yielded in tenant
+    order; a failing tenant does not stop the others. With ``workers=1``
+    the profiles are rendered in the current process.
+    """
+    options = options or {}
+    tasks = [
+        (tenant, os.path.join(output_dir, tenant.name + OUTPUT_EXTENSION))
+        for tenant in tenants
+    ]
+    workers = min(workers or os.cpu_count() or 1, max(len(tasks), 1))
+    if workers == 1:
+        _init_worker(prototypes, options, fmt)
+        for task in tasks:
+            yield _render_tenant(task)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(prototypes, options, fmt),
+    ) as executor:
+        yield from executor.map(
+            _render_tenant, tasks, chunksize=chunksize(len(tasks), workers)
+        )
@@ -0,0 +1,93 @@
+"""
+Line-oriented tokenizer for INI-style PBK and Connection Manager files.
+
+The tokenizer follows the rules ``configparser.ConfigParser(strict=False)``
+applies to these files, but works in a single pass over an iterable of
+lines and yields one section at a time, so memory stays bounded by the
+largest section rather than the whole file. Unlike ConfigParser, repeated
+sections are yielded once per occurrence; merge_sections() combines them.
+"""
+
+import re
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+DEFAULT_SECTION = "DEFAULT"
+COMMENT_PREFIXES = ("#", ";")
+
+SECTION_RE = re.compile(r"\[(?P<header>.+)\]")
+OPTION_RE = re.compile(r"(?P<option>.*?)\s*(?P<vi>=|:)\s*(?P<value>.*)$")
+
+
+def iter_sections(lines: Iterable[str]) -> Iterator[Tuple[str, Dict[str, str]]]:
+    """
+    Yield ``(section name, options)`` pairs from INI-style lines.
+
+    Option names are lower-cased and values stripped. Options appearing
+    before the first section header or in a ``[DEFAULT]`` section are
+    yielded under the name ``DEFAULT``; repeated options in a section keep
+    the last value. Values are returned verbatim, without interpolation,
+    and keep blank lines between continuation lines.
+
+    Raises ValueError for a line that is neither a header, an option,
+    a comment nor a continuation line.
+    """
+    section = DEFAULT_SECTION
+    options: Dict[str, str] = {}
+    option = None
+    option_indent = 0
+    # Blank lines since the last line of the open option; they become part
+    # of its value only if a continuation line follows
+    blank_lines = 0
+
+    for lineno, line in enumerate(lines, 1):
+        stripped = line.strip()
+        if not stripped:
+            blank_lines += 1
+            continue
+        if stripped.startswith(COMMENT_PREFIXES):
+            continue
+
+        indent = len(line) - len(line.lstrip())
+        if option is not None and indent > option_indent:
+            separator = "\n" * (blank_lines + 1)
+            options[option] = f"{options[option]}{separator}{stripped}"
+            blank_lines = 0
+            continue
+        blank_lines = 0
+
+        header = SECTION_RE.match(stripped)
+        if header:
+            if options or section != DEFAULT_SECTION:
+                yield section, options
+            section = header.group("header")
+            options = {}
+            option = None
+            continue
+
+        match = OPTION_RE.match(stripped)
+        if not match or not match.group("option"):
+            raise ValueError(f"Invalid line {lineno}: {line.rstrip()!r}")
+        option = match.group("option").rstrip().lower()
+        option_indent = indent
+        options[option] = match.group("value").strip()
+
+    if options or section != DEFAULT_SECTION:
+        yield section, options
+
+
+def merge_sections(
+    sections: Iterable[Tuple[str, Dict[str, str]]],
+) -> List[Tuple[str, Dict[str, str]]]:
+    """
+    Merge repeated sections as ``ConfigParser(strict=False)`` does.
+
+    Sections keep the position of their first occurrence; options of later
+    occurrences are added to it, replacing earlier values of the same name.
+    """
+    merged: Dict[str, Dict[str, str]] = {}
+    for name, options in sections:
+        if name in merged:
+            merged[name].update(options)
+        else:
+            merged[name] = dict(options)
+    return list(merged.items())
@@ -0,0 +1,340 @@
+"""
+Validation of generated payloads against the com.apple.vpn.managed schema.
+
+The schema lists the keys a VPN payload of each VPNType requires, their
+plist types and, where the profile would be unusable otherwise, that they
+must not be empty or must take one of a few values. It is compiled once
+per VPN type into flat rule tuples, so validating a payload is a single
+pass over its keys without any lookups in the schema itself. Types are
+compared exactly, so e.g. a bool is not accepted where an integer is
+expected.
+
+Validator.checked() validates payloads while they stream through, e.g.
+from VPNProfileConverter.iter_payloads() with a converter ``validator``.
+"""
+
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+PAYLOAD_TYPE = "com.apple.vpn.managed"
+
+# Validation modes of the command line and batch conversion
+MODES = ("warn", "strict")
+
+
+class Field(NamedTuple):
+    """Schema of a payload key."""
+
+    types: Tuple[type, ...]
+    required: bool = True
+    nonempty: bool = False
+    choices: Optional[Tuple[Any, ...]] = None
+    # Type of list items
+    items: Optional[type] = None
+    # Schema of the keys of a dict
+    fields: Optional[Dict[str, "Field"]] = None
+
+
+STRING = (str,)
+INTEGER = (int,)
+BOOLEAN = (bool,)
+ARRAY = (list, tuple)
+DICT = (dict,)
+
+SECURITY_ASSOCIATION: Dict[str, Field] = {
+    "EncryptionAlgorithm": Field(
+        STRING,
+        choices=("DES", "3DES", "AES-128", "AES-256", "AES-128-GCM", "AES-256-GCM"),
+    ),
+    "IntegrityAlgorithm": Field(
+        STRING,
+        choices=("SHA1-96", "SHA1-160", "SHA2-256", "SHA2-384", "SHA2-512"),
+    ),
+    "DiffieHellmanGroup": Field(INTEGER),
+    "LifeTimeInMinutes": Field(INTEGER),
+}
+
+COMMON_FIELDS: Dict[str, Field] = {
+    "PayloadType": Field(STRING, choices=(PAYLOAD_TYPE,)),
+    "PayloadVersion": Field(INTEGER),
+    "PayloadIdentifier": Field(STRING, nonempty=True),
+    "PayloadUUID": Field(STRING, nonempty=True),
+    "PayloadDisplayName": Field(STRING, nonempty=True),
+    "PayloadOrganization": Field(STRING, required=False),
+    "PayloadDescription": Field(STRING, required=False),
+    "PayloadEnabled": Field(BOOLEAN, required=False),
+    "VPNType": Field(STRING, choices=("L2TP", "PPTP", "IKEv2")),
+    "EnableSplitTunneling": Field(BOOLEAN, required=False),
+    "IPv4": Field(
+        DICT,
+        required=False,
+        fields={
+            "OverridePrimary": Field(INTEGER, required=False, choices=(0, 1)),
+        },
+    ),
+    "DNS": Field(
+        DICT,
+        required=False,
+        fields={
+            "ServerAddresses": Field(ARRAY, required=False, items=str),
+            "SearchDomains": Field(ARRAY, required=False, items=str),
+            "SupplementalMatchDomains": Field(ARRAY, required=False, items=str),
+        },
+    ),
+}
+
+PPP_FIELDS: Dict[str, Field] = {
+    "CommRemoteAddress": Field(STRING, nonempty=True),
+    "AuthName": Field(STRING, required=False),
+    "AuthPassword": Field(STRING, required=False),
+    "TokenCard": Field(BOOLEAN, required=False),
+    "AuthEAPPlugins": Field(ARRAY, required=False, items=str),
+    "AuthProtocol": Field(ARRAY, required=False, items=str),
+    "CCPEnabled": Field(INTEGER, required=False, choices=(0, 1)),
+    "CCPMPPE40Enabled": Field(INTEGER, required=False, choices=(0, 1)),
+    "CCPMPPE128Enabled": Field(INTEGER, required=False, choices=(0, 1)),
+}
+
+TYPE_FIELDS: Dict[str, Dict[str, Field]] = {
+    "L2TP": {
+        "VPN": Field(
+            DICT,
+            fields={
+                "RemoteAddress": Field(STRING, nonempty=True),
+                "AuthenticationMethod": Field(STRING, required=False),
+                "UseExtendedAuthentication": Field(
+                    INTEGER, required=False, choices=(0, 1)
+                ),
+            },
+        ),
+        "IPSec": Field(
+            DICT,
+            fields={
+                "AuthenticationMethod": Field(
+                    STRING, choices=("SharedSecret", "Certificate")
+                ),
+                "RemoteAddress": Field(STRING, nonempty=True),
+                # Data in Apple's reference, but strings are accepted as well
+                "SharedSecret": Field((str, bytes), required=False),
+                "LocalIdentifierType": Field(STRING, required=False),
+                "XAuthEnabled": Field(INTEGER, required=False, choices=(0, 1)),
+            },
+        ),
+        "PPP": Field(DICT, fields=PPP_FIELDS),
+    },
+    "PPTP": {
+        "PPP": Field(DICT, fields=PPP_FIELDS),
+    },
+    "IKEv2": {
+        "IKEv2": Field(
+            DICT,
+            fields={
+                "RemoteAddress": Field(STRING, nonempty=True),
+                "RemoteIdentifier": Field(STRING, nonempty=True),
+                "LocalIdentifier": Field(STRING),
+                "AuthenticationMethod": Field(
+                    STRING, choices=("None", "SharedSecret", "Certificate")
+                ),
+                "ExtendedAuthEnabled": Field(INTEGER, choices=(0, 1)),
+                "SharedSecret": Field(STRING, required=False, nonempty=True),
+                "DeadPeerDetectionRate": Field(
+                    STRING, required=False, choices=("None", "Low", "Medium", "High")
+                ),
+                "IKESecurityAssociationParameters": Field(
+                    DICT, required=False, fields=SECURITY_ASSOCIATION
+                ),
+                "ChildSecurityAssociationParameters": Field(
+                    DICT, required=False, fields=SECURITY_ASSOCIATION
+                ),
+            },
+        ),
+    },
+}
+
+
+class ValidationIssue(NamedTuple):
+    """A problem found in the payload of an entry."""
+
+    entry: str
+    # Dotted key path, e.g. ``IKEv2.RemoteAddress``
+    path: str
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.entry}: {self.path}: {self.message}"
+
+
+class ValidationError(ValueError):
+    """Raised in strict mode when generated payloads are invalid."""
+
+    def __init__(self, issues: Iterable[ValidationIssue]):
+        self.issues = list(issues)
+        super().__init__(
+            f"{len(self.issues)} validation issue(s): "
+            + "; ".join(str(issue) for issue in self.issues)
+        )
+
+
+# A compiled Field: key, path, types, type names, required, nonempty,
+# choices, item type and the rules of nested keys
+Rule = Tuple[
+    str,
+    str,
+    Tuple[type, ...],
+    str,
+    bool,
+    bool,
+    Optional[frozenset],
+    Optional[type],
+    Optional[Tuple[Any, ...]],
+]
+
+_MISSING = object()
+
+# Compiled rules by VPNType, see compile_schema()
+_compiled: Dict[Optional[str], Tuple[Rule, ...]] = {}
+
+
+def _compile(fields: Mapping[str, Field], prefix: str = "") -> Tuple[Rule, ...]:
+    """Flatten a schema into rules with precomputed paths and messages."""
+    rules = []
+    for key, field in fields.items():
+        path = prefix + key
+        rules.append(
+            (
+                key,
+                path,
+                field.types,
+                " or ".join(dict.fromkeys(_type_name(t) for t in field.types)),
+                field.required,
+                field.nonempty,
+                None if field.choices is None else frozenset(field.choices),
+                field.items,
+                None if field.fields is None else _compile(field.fields, path + "."),
+            )
+        )
+    return tuple(rules)
+
+
+def _type_name(value_type: type) -> str:
+    """Return the plist name of a Python type."""
+    names = {
+        str: "string",
+        int: "integer",
+        bool: "boolean",
+        bytes: "data",
+        list: "array",
+        tuple: "array",
+        dict: "dictionary",
+        float: "real",
+    }
+    return names.get(value_type, value_type.__name__)
+
+
+def compile_schema(vpn_type: Optional[str]) -> Tuple[Rule, ...]:
+    """Return the compiled rules of a VPNType, compiling them on first use."""
+    rules = _compiled.get(vpn_type)
+    if rules is None:
+        fields = dict(COMMON_FIELDS)
+        fields.update(TYPE_FIELDS.get(vpn_type or "", {}))
+        rules = _compiled[vpn_type] = _compile(fields)
+    return rules
+
+
+def _check(
+    rules: Tuple[Rule, ...], values: Mapping, problems: List[Tuple[str, str]]
+) -> None:
+    """Append (path, message) for every rule the values violate."""
+    for key, path, types, names, required, nonempty, choices, items, nested in rules:
+        value = values.get(key, _MISSING)
+        if value is _MISSING:
+            if required:
+                problems.append((path, "missing"))
+            continue
+        if type(value) not in types:
+            problems.append((path, f"expected {names}, got {_type_name(type(value))}"))
+            continue
+        if nonempty and not value:
+            problems.append((path, "empty"))
+        elif choices is not None and value not in choices:
+            problems.append((path, f"unexpected value {value!r}"))
+        if items is not None:
+            for position, item in enumerate(value):
+                if type(item) is not items:
+                    problems.append(
+                        (
+                            f"{path}[{position}]",
+                            f"expected {_type_name(items)}, "
+                            f"got {_type_name(type(item))}",
+                        )
+                    )
+        if nested is not None:
+            _check(nested, value, problems)
+
+
+def validate_payload(payload: Mapping[str, Any]) -> List[ValidationIssue]:
+    """Return every problem of a VPN payload; empty if it is valid."""
+    problems: List[Tuple[str, str]] = []
+    vpn_type = payload.get("VPNType")
+    _check(
+        compile_schema(vpn_type if isinstance(vpn_type, str) else None),
+        payload,
+        problems,
+    )
+    if not problems:
+        return []
+    entry = payload.get("PayloadDisplayName")
+    entry = entry if isinstance(entry, str) and entry else "<unnamed>"
+    return [ValidationIssue(entry, path, message) for path, message in problems]
+
+
+def validate_payloads(payloads: Iterable[Mapping[str, Any]]) -> List[ValidationIssue]:
+    """Return the problems of many payloads, in payload order."""
+    issues: List[ValidationIssue] = []
+    for payload in payloads:
+        issues.extend(validate_payload(payload))
+    return issues
+
+
+def validate_profile(profile: Mapping[str, Any]) -> List[ValidationIssue]:
+    """Return the problems of the VPN payloads of a configuration profile."""
+    return validate_payloads(profile.get("PayloadContent", ()))
+
+
+class Validator:
+    """
+    Validation of the payloads of a conversion as they are generated.
+
+    Issues are collected in ``issues``. In ``strict`` mode checked()
+    raises ValidationError with all issues of its payloads after the
+    last payload, so a streamed profile is never completed.
+    """
+
+    def __init__(self, strict: bool = False):
+        """Initialize validator."""
+        self.strict = strict
+        self.issues: List[ValidationIssue] = []
+
+    def validate(self, payload: Mapping[str, Any]) -> List[ValidationIssue]:
+        """Validate one payload and record its issues."""
+        issues = validate_payload(payload)
+        self.issues.extend(issues)
+        return issues
+
+    def checked(self, payloads: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Yield the payloads unchanged, validating each one."""
+        start = len(self.issues)
+        for payload in payloads:
+            self.validate(payload)
+            yield payload
+        if self.strict and len(self.issues) > start:
+            raise ValidationError(self.issues[start:])
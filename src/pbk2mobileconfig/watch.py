@@ -0,0 +1,280 @@
+"""
+Watch directories and reconvert phonebooks when they or their sidecars change.
+
+Changes are detected with inotify on Linux and by polling modification
+times elsewhere. Bursts of writes are debounced, and only the affected
+phonebooks are handed to a ConversionPool that stays alive between events.
+"""
+
+import os
+import sys
+import time
+import select
+import struct
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from .batch import PBK_EXTENSION, BatchResult, ConversionPool, plan_jobs
+from .sidecars import SIDECAR_EXTENSIONS, find_sidecars
+
+WATCHED_EXTENSIONS = (PBK_EXTENSION,) + SIDECAR_EXTENSIONS
+
+DEFAULT_INTERVAL = 1.0
+DEFAULT_DEBOUNCE = 0.5
+
+
+def _is_watched(path: str) -> bool:
+    """Check whether a file is a phonebook or a sidecar."""
+    return path.lower().endswith(WATCHED_EXTENSIONS)
+
+
+def _list_phonebooks(directory: str) -> Dict[str, str]:
+    """Return the phonebooks of a directory by lower-cased base name."""
+    phonebooks: Dict[str, str] = {}
+    try:
+        with os.scandir(directory or os.curdir) as entries:
+            for entry in entries:
+                stem, ext = os.path.splitext(entry.name)
+                if ext.lower() == PBK_EXTENSION and entry.is_file():
+                    path = os.path.join(directory, entry.name)
+                    phonebooks.setdefault(stem.lower(), path)
+    except OSError:
+        pass
+    return phonebooks
+
+
+def affected_phonebooks(paths: Iterable[str]) -> Set[str]:
+    """
+    Map changed phonebooks and sidecars to the phonebooks to reconvert.
+
+    Sidecars are paired with phonebooks by base name and extension
+    case-insensitively, like sidecars.find_sidecars().
+    """
+    affected = set()
+    listings: Dict[str, Dict[str, str]] = {}
+    for path in paths:
+        base, ext = os.path.splitext(path)
+        if ext.lower() == PBK_EXTENSION:
+            if os.path.isfile(path):
+                affected.add(path)
+            continue
+        directory, stem = os.path.split(base)
+        if directory not in listings:
+            listings[directory] = _list_phonebooks(directory)
+        phonebook = listings[directory].get(stem.lower())
+        if phonebook is not None:
+            affected.add(phonebook)
+    return affected
+
+
+def _scan(roots: List[str]) -> Dict[str, Tuple[int, int]]:
+    """Return (mtime_ns, size) of every watched file below the roots."""
+    snapshot = {}
+    for root in roots:
+        for directory, _, files in os.walk(root):
+            for name in files:
+                if _is_watched(name):
+                    path = os.path.join(directory, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+
+class PollingWatcher:
+    """Detects changes by comparing modification times between scans."""
+
+    def __init__(self, roots: List[str], interval: float = DEFAULT_INTERVAL):
+        """Initialize watcher and take the initial snapshot."""
+        self.roots = roots
+        self.interval = interval
+        self._snapshot = _scan(roots)
+
+    def files(self) -> List[str]:
+        """Return all watched files present at the last scan."""
+        return list(self._snapshot)
+
+    def poll(self, timeout: float) -> Set[str]:
+        """Wait up to timeout seconds and return the paths that changed."""
+        time.sleep(min(timeout, self.interval))
+        snapshot = _scan(self.roots)
+        changed = {
+            path
+            for path, stamp in snapshot.items()
+            if self._snapshot.get(path) != stamp
+        }
+        self._snapshot = snapshot
+        return changed
+
+    def close(self) -> None:
+        """Release watcher resources."""
+
+    def __enter__(self) -> "PollingWatcher":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+class InotifyWatcher:
+    """Detects changes with the Linux inotify API, watching directories recursively."""
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_Q_OVERFLOW = 0x00004000
+    IN_ISDIR = 0x40000000
+    MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self, roots: List[str]):
+        """Initialize watcher; raises OSError when inotify is unavailable."""
+        import ctypes
+        import ctypes.util
+
+        self.roots = roots
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: Dict[int, str] = {}
+        for root in roots:
+            self._watch_tree(root)
+
+    def _watch_tree(self, root: str) -> List[str]:
+        """Watch a directory and its subdirectories; return files found."""
+        import ctypes
+
+        found = []
+        for directory, _, files in os.walk(root):
+            wd = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(directory), self.MASK
+            )
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"Cannot watch {directory}")
+            self._dirs[wd] = directory
+            found.extend(os.path.join(directory, name) for name in files)
+        return found
+
+    def files(self) -> List[str]:
+        """Return all watched files currently present."""
+        return list(_scan(self.roots))
+
+    def poll(self, timeout: float) -> Set[str]:
+        """Wait up to timeout seconds and return the paths that changed."""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        changed = set()
+        data = os.read(self._fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & self.IN_Q_OVERFLOW:
+                # Events were lost; treat everything as changed
+                return set(self.files())
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    changed.update(self._watch_tree(path))
+            else:
+                changed.add(path)
+
+        return {path for path in changed if _is_watched(path)}
+
+    def close(self) -> None:
+        """Release the inotify file descriptor."""
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def __enter__(self) -> "InotifyWatcher":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def create_watcher(
+    roots: List[str], interval: float = DEFAULT_INTERVAL, polling: bool = False
+):
+    """Return an inotify watcher where available, a polling watcher otherwise."""
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(roots)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(roots, interval)
+
+
+def _is_stale(pbk_path: str, output_path: str) -> bool:
+    """Check whether an output is missing or older than its inputs."""
+    try:
+        output_mtime = os.stat(output_path).st_mtime_ns
+    except FileNotFoundError:
+        return True
+    for path in [pbk_path] + list(find_sidecars(pbk_path).values()):
+        try:
+            if os.stat(path).st_mtime_ns > output_mtime:
+                return True
+        except FileNotFoundError:
+            continue
+    return False
+
+
+def watch(
+    roots: List[str],
+    output_dir: str,
+    pool: ConversionPool,
+    on_result: Callable[[BatchResult], None],
+    stop: Optional[threading.Event] = None,
+    debounce: float = DEFAULT_DEBOUNCE,
+    interval: float = DEFAULT_INTERVAL,
+    polling: bool = False,
+) -> None:
+    """
+    Convert stale phonebooks below the roots, then keep reconverting changes.
+
+    Outputs mirror the layout below the common parent of the roots. Changes
+    are collected until no new event arrived for ``debounce`` seconds and
+    then converted together. Runs until ``stop`` is set.
+    """
+    stop = stop or threading.Event()
+    roots = [os.path.abspath(root) for root in roots]
+    base = os.path.commonpath(roots)
+
+    def convert(paths: Iterable[str], only_stale: bool = False) -> None:
+        jobs = plan_jobs(sorted(paths), output_dir, root=base)
+        if only_stale:
+            jobs = [job for job in jobs if _is_stale(*job)]
+        for result in pool.convert(jobs):
+            on_result(result)
+
+    with create_watcher(roots, interval, polling) as watcher:
+        convert(affected_phonebooks(watcher.files()), only_stale=True)
+
+        pending: Set[str] = set()
+        last_event = 0.0
+        while not stop.is_set():
+            timeout = interval
+            if pending:
+                remaining = last_event + debounce - time.monotonic()
+                timeout = max(0.0, min(interval, remaining))
+            changed = watcher.poll(timeout)
+            if changed:
+                pending.update(changed)
+                last_event = time.monotonic()
+            elif pending and time.monotonic() - last_event >= debounce:
+                convert(affected_phonebooks(pending))
+                pending.clear()
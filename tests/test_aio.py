@@ -0,0 +1,116 @@
+"""
+Tests for the asyncio API converting many phonebooks.
+"""
+import time
+import asyncio
+import plistlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from pbk2mobileconfig import aio
+from pbk2mobileconfig.aio import convert_many
+
+PBK_CONTENT = "[Office VPN]\nType=4\nPhoneNumber=vpn.example.com\n"
+CMS_CONTENT = "[Office VPN]\nDialRetry=3\n"
+
+# Latency of every open, read and listing on the slow filesystem
+LATENCY = 0.05
+
+
+class SlowFilesystem:
+    """Stand-in for a network mount: every blocking read takes LATENCY."""
+
+    def __init__(self, monkeypatch):
+        self.started = []
+        self._lock = threading.Lock()
+        read_file, find_sidecars = aio._read_file, aio.find_sidecars
+
+        def slow_read_file(path):
+            if path.endswith(".pbk"):
+                with self._lock:
+                    self.started.append(path)
+            time.sleep(LATENCY)
+            return read_file(path)
+
+        def slow_find_sidecars(path):
+            time.sleep(LATENCY)
+            return find_sidecars(path)
+
+        monkeypatch.setattr(aio, "_read_file", slow_read_file)
+        monkeypatch.setattr(aio, "find_sidecars", slow_find_sidecars)
+
+
+def _phonebooks(tmp_path, count):
+    paths = []
+    for number in range(count):
+        (tmp_path / f"office{number}.pbk").write_text(PBK_CONTENT)
+        (tmp_path / f"office{number}.cms").write_text(CMS_CONTENT)
+        paths.append(str(tmp_path / f"office{number}.pbk"))
+    return paths
+
+
+async def _collect(paths, **kwargs):
+    return [
+        result
+        async for result in convert_many(
+            paths, executor=ThreadPoolExecutor(2), **kwargs
+        )
+    ]
+
+
+def test_convert_many_hides_read_latency(tmp_path, monkeypatch):
+    """Test that reads of many phonebooks on slow storage overlap."""
+    filesystem = SlowFilesystem(monkeypatch)
+    paths = _phonebooks(tmp_path, 16) + [str(tmp_path / "missing.pbk")]
+
+    start = time.perf_counter()
+    results = asyncio.run(_collect(paths, max_concurrency=8, format="binary"))
+    elapsed = time.perf_counter() - start
+
+    # Serially, the listing, phonebook and sidecar of each file add up
+    serial = 16 * 3 * LATENCY
+    assert elapsed < serial / 3
+    assert len(filesystem.started) == 17
+    assert sorted(result.index for result in results) == list(range(17))
+    failed = [result for result in results if not result.ok]
+    assert [result.input_path for result in failed] == [paths[-1]]
+    profile = plistlib.loads(results[0].data)
+    assert profile["PayloadContent"][0]["PayloadDisplayName"] == "Office VPN"
+
+
+def test_convert_many_backpressure_and_cancellation(tmp_path, monkeypatch):
+    """Test that a slow consumer stops reads and leaving the loop cancels."""
+    filesystem = SlowFilesystem(monkeypatch)
+    paths = _phonebooks(tmp_path, 12)
+
+    async def main():
+        consumed = 0
+        results = convert_many(paths, max_concurrency=3, executor=ThreadPoolExecutor(1))
+        async for result in results:
+            assert result.ok
+            consumed += 1
+            assert len(filesystem.started) - consumed <= 3
+            await asyncio.sleep(2 * LATENCY)
+            if consumed == 4:
+                break
+        await results.aclose()
+        started = len(filesystem.started)
+        await asyncio.sleep(4 * LATENCY)
+        assert len(filesystem.started) == started
+        assert asyncio.all_tasks() == {asyncio.current_task()}
+        return consumed, started
+
+    consumed, started = asyncio.run(main())
+    assert consumed == 4
+    assert started <= 4 + 3
+
+
+def test_convert_many_rejects_unknown_format():
+    """Test argument validation before anything is read."""
+
+    async def main():
+        async for _ in convert_many([], format="json"):
+            pass
+
+    with pytest.raises(ValueError, match="Unknown format"):
+        asyncio.run(main())
@@ -0,0 +1,124 @@
+"""
+Tests for the Python API.
+"""
+import io
+import os
+import contextlib
+import builtins
+import plistlib
+import pytest
+from pbk2mobileconfig import (
+    convert_pbk,
+    convert_pbk_bytes,
+    convert_pbk_to_mobileconfig,
+)
+
+PBK_CONTENT = """[Office VPN]
+Type=4
+PhoneNumber=vpn.example.com
+PreSharedKey=secret
+
+[Home VPN]
+Type=1
+PhoneNumber=home.example.com
+"""
+
+CMS_CONTENT = """[Office VPN]
+DialRetry=3
+"""
+
+
+@contextlib.contextmanager
+def _no_disk_io(monkeypatch):
+    """Fail on any attempt to open or stat a file inside the block."""
+
+    def forbidden(*args, **kwargs):
+        raise AssertionError(f"Unexpected filesystem access: {args}")
+
+    with monkeypatch.context() as patch:
+        for module, name in (
+            (builtins, "open"),
+            (io, "open"),
+            (os, "stat"),
+            (os.path, "isfile"),
+            (os.path, "exists"),
+        ):
+            patch.setattr(module, name, forbidden)
+        yield
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        PBK_CONTENT,
+        PBK_CONTENT.encode("utf-16"),
+        PBK_CONTENT.encode("cp1252"),
+    ],
+    ids=["text", "utf-16", "cp1252"],
+)
+def test_convert_pbk_in_memory(source, monkeypatch):
+    """Test converting text and encoded bytes without touching the disk."""
+    with _no_disk_io(monkeypatch):
+        profile = convert_pbk(
+            source, sidecars={"CMS": CMS_CONTENT.encode()}, organization="Acme"
+        )
+    payloads = profile["PayloadContent"]
+    assert [p["PayloadDisplayName"] for p in payloads] == ["Office VPN", "Home VPN"]
+    assert profile["PayloadOrganization"] == "Acme"
+
+
+def test_convert_pbk_file_object_and_entry(monkeypatch):
+    """Test binary file objects and selecting a single entry."""
+    with _no_disk_io(monkeypatch):
+        profile = convert_pbk(io.BytesIO(PBK_CONTENT.encode()), entry="Home VPN")
+    assert [p["PayloadDisplayName"] for p in profile["PayloadContent"]] == ["Home VPN"]
+
+    with pytest.raises(ValueError, match="Entry not found"):
+        convert_pbk(PBK_CONTENT, entry="Missing")
+
+
+def test_convert_pbk_errors():
+    """Test errors for empty phonebooks and unknown sidecars or formats."""
+    with pytest.raises(ValueError, match="No VPN configurations"):
+        convert_pbk("[Notes]\nText=1\n")
+    with pytest.raises(ValueError, match="Unsupported sidecar"):
+        convert_pbk(PBK_CONTENT, sidecars={"txt": ""})
+    with pytest.raises(ValueError, match="Unknown format"):
+        convert_pbk_bytes(PBK_CONTENT, format="json")
+
+
+def test_convert_pbk_bytes_formats():
+    """Test serialized output in both formats."""
+    xml = convert_pbk_bytes(PBK_CONTENT, deterministic_uuids=True)
+    binary = convert_pbk_bytes(PBK_CONTENT, format="binary", deterministic_uuids=True)
+    assert xml.startswith(b"<?xml")
+    assert binary.startswith(b"bplist00")
+    assert plistlib.loads(xml) == plistlib.loads(binary)
+
+
+def test_convert_pbk_to_mobileconfig(tmp_path):
+    """Test the file-based API picks up sidecar files."""
+    pbk = tmp_path / "office.pbk"
+    pbk.write_text(PBK_CONTENT)
+    (tmp_path / "office.cms").write_text(CMS_CONTENT)
+    output = tmp_path / "office.mobileconfig"
+
+    options = {"identifier": "com.acme.vpn", "deterministic_uuids": True}
+    count = convert_pbk_to_mobileconfig(str(pbk), str(output), **options)
+    assert count == 2
+    with open(output, "rb") as f:
+        profile = plistlib.load(f)
+    assert profile == plistlib.loads(convert_pbk_bytes(PBK_CONTENT, **options))
+
+
+def test_convert_pbk_to_mobileconfig_keeps_output_on_error(tmp_path):
+    """Test that a failed write leaves the previous profile intact."""
+    pbk = tmp_path / "office.pbk"
+    pbk.write_text(PBK_CONTENT)
+    output = tmp_path / "office.mobileconfig"
+    output.write_bytes(b"previous")
+
+    with pytest.raises(ValueError, match="Unknown format"):
+        convert_pbk_to_mobileconfig(str(pbk), str(output), format="yaml")
+    assert output.read_bytes() == b"previous"
+    assert sorted(os.listdir(tmp_path)) == ["office.mobileconfig", "office.pbk"]
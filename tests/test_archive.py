@@ -0,0 +1,181 @@
+"""
+Tests for reading phonebooks from zip and tar archives.
+"""
+import io
+import os
+import json
+import plistlib
+import tarfile
+import zipfile
+import pytest
+from pbk2mobileconfig.archive import Archive, split_archive_path
+from pbk2mobileconfig.batch import (
+    ARCHIVE_MANIFEST,
+    collect_inputs,
+    plan_jobs,
+    run_batch,
+    run_batch_to_archive,
+)
+from pbk2mobileconfig.cache import ConversionCache
+from pbk2mobileconfig.cli import main
+from pbk2mobileconfig import sidecars as sidecars_module
+from pbk2mobileconfig.parser import PBKParser
+from pbk2mobileconfig.sidecars import SidecarWarning
+
+CORP_PBK = "[Corp VPN]\nType=4\nPhoneNumber=vpn.example.com\n"
+CORP_CMS = "[Corp VPN]\nDialRetry=3\n"
+LAB_PBK = "[Lab VPN]\nType=1\nPhoneNumber=lab.example.com\n"
+
+MEMBERS = {
+    "corp/Corp.CMS": CORP_CMS,
+    "corp/corp.pbk": CORP_PBK,
+    "corp/other.cms": "[Corp VPN]\nDialRetry=9\n",
+    "lab/lab.pbk": LAB_PBK,
+}
+
+
+def _write_zip(path, members=MEMBERS):
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, content in members.items():
+            archive.writestr(name, content.encode("utf-16"))
+
+
+def _write_tar(path, members=MEMBERS):
+    with tarfile.open(path, "w:gz") as archive:
+        for name, content in members.items():
+            data = content.encode("utf-8")
+            info = tarfile.TarInfo("./" + name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+
+def test_split_archive_path(tmp_path):
+    """Test recognizing archive and member paths."""
+    assert split_archive_path("a/b.zip!c/d.pbk") == ("a/b.zip", "c/d.pbk")
+    assert split_archive_path("b.tar.gz") == ("b.tar.gz", None)
+    assert split_archive_path("x!y.pbk") is None
+    literal = tmp_path / "odd.zip!name.pbk"
+    literal.write_text(CORP_PBK)
+    assert split_archive_path(str(literal)) is None
+
+
+@pytest.mark.parametrize("write", [_write_zip, _write_tar])
+def test_bundles_pair_sidecars_by_base_name(tmp_path, write):
+    """Test pairing sidecars with phonebooks inside an archive."""
+    path = str(tmp_path / ("bundles.zip" if write is _write_zip else "b.tgz"))
+    write(path)
+    with Archive(path) as archive:
+        bundles = archive.bundles()
+        assert [bundle.pbk for bundle in bundles] == ["corp/corp.pbk", "lab/lab.pbk"]
+        assert bundles[0].sidecars == {".cms": "corp/Corp.CMS"}
+        assert bundles[1].sidecars == {}
+
+    parser = PBKParser.for_path(f"{path}!corp/corp.pbk")
+    entries = parser.parse()
+    assert [entry.name for entry in entries] == ["Corp VPN"]
+    assert entries[0].additional_settings == {"dialretry": "3"}
+
+
+def test_undecodable_sidecar_in_archive_warns(tmp_path):
+    """Test that an archived sidecar that cannot be decoded is skipped."""
+    path = str(tmp_path / "bad.zip")
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("corp.pbk", CORP_PBK)
+        archive.writestr("corp.cms", b"\xef\xbb\xbf\xff\xfe")
+
+    with pytest.warns(SidecarWarning, match=r"bad\.zip!corp\.cms"):
+        parser = PBKParser.for_path(path)
+    entries = parser.parse()
+    assert [entry.name for entry in entries] == ["Corp VPN"]
+    assert entries[0].additional_settings == {}
+
+
+def test_malformed_sidecar_in_archive_names_member(tmp_path):
+    """Test that a malformed archived sidecar is reported by its member path."""
+    path = str(tmp_path / "bad.zip")
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("corp/corp.pbk", CORP_PBK)
+        archive.writestr("corp/Corp.CMS", "[Corp VPN]\nnot an option\n")
+
+    parser = PBKParser.for_path(path)
+    with pytest.warns(SidecarWarning, match=r"bad\.zip!corp/Corp\.CMS") as record:
+        entries = parser.parse()
+    assert entries[0].additional_settings == {}
+    assert record[0].filename != sidecars_module.__file__
+
+
+def test_single_phonebook_archive_in_cli(tmp_path, capsys):
+    """Test converting an archive path directly, without extracting it."""
+    path = tmp_path / "corp.zip"
+    _write_zip(path, {"corp.pbk": CORP_PBK, "corp.cms": CORP_CMS})
+    output = tmp_path / "corp.mobileconfig"
+
+    assert main([str(path), str(output)]) == 0
+    with open(output, "rb") as f:
+        assert len(plistlib.load(f)["PayloadContent"]) == 1
+    # Nothing was extracted next to the archive
+    assert sorted(os.listdir(tmp_path)) == ["corp.mobileconfig", "corp.zip"]
+
+    _write_zip(path)
+    assert main([str(path), str(output)]) == 1
+    assert "contains 2 phonebooks" in capsys.readouterr().out
+
+
+def test_batch_over_archive(tmp_path):
+    """Test batch conversion of every bundle in an archive, with caching."""
+    path = tmp_path / "fleet.tar.gz"
+    _write_tar(path)
+    inputs = collect_inputs([str(path)])
+    assert inputs == [f"{path}!corp/corp.pbk", f"{path}!lab/lab.pbk"]
+
+    jobs = plan_jobs(inputs, str(tmp_path / "out"))
+    assert [os.path.relpath(job.output_path, tmp_path / "out") for job in jobs] == [
+        os.path.join("corp", "corp.mobileconfig"),
+        os.path.join("lab", "lab.mobileconfig"),
+    ]
+
+    cache = ConversionCache(str(tmp_path / "cache"))
+    for _ in range(2):
+        results = list(run_batch(jobs, workers=2, cache=cache))
+        assert [result.entries for result in results] == [1, 1]
+        assert all(result.ok for result in results)
+    assert len(cache._entries()) == 2
+
+
+def test_batch_into_zip_archive(tmp_path):
+    """Test streaming batch output and a manifest into one zip archive."""
+    path = tmp_path / "fleet.zip"
+    _write_zip(path, dict(MEMBERS, **{"broken/broken.pbk": "[No type]\n"}))
+    jobs = plan_jobs(collect_inputs([str(path)]), "")
+    output = tmp_path / "profiles.zip"
+
+    results = list(run_batch_to_archive(jobs, str(output), workers=2))
+    assert [result.ok for result in results] == [True, True, False]
+    with zipfile.ZipFile(output) as archive:
+        assert archive.namelist() == [
+            "corp/corp.mobileconfig",
+            "lab/lab.mobileconfig",
+            ARCHIVE_MANIFEST,
+        ]
+        manifest = json.loads(archive.read(ARCHIVE_MANIFEST))
+        profile = plistlib.loads(archive.read("lab/lab.mobileconfig"))
+    assert profile["PayloadContent"][0]["PayloadDisplayName"] == "Lab VPN"
+    assert [item["file"] for item in manifest["profiles"]] == [
+        "corp/corp.mobileconfig",
+        "lab/lab.mobileconfig",
+    ]
+    assert manifest["errors"][0]["input"].endswith("!broken/broken.pbk")
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_cli_archive_to_stdout(tmp_path, monkeypatch, capsys):
+    """Test streaming a tar.gz archive to stdout with messages on stderr."""
+    pbk = tmp_path / "corp.pbk"
+    pbk.write_text(CORP_PBK)
+    stdout = io.TextIOWrapper(io.BytesIO())
+    monkeypatch.setattr("sys.stdout", stdout)
+
+    assert main(["batch", str(pbk), "--output-archive", "-", "-j", "1"]) == 0
+    assert "Successfully converted 1 of 1" in capsys.readouterr().err
+    with tarfile.open(fileobj=io.BytesIO(stdout.buffer.getvalue())) as archive:
+        assert archive.getnames() == ["corp.mobileconfig", ARCHIVE_MANIFEST]
@@ -0,0 +1,80 @@
+"""
+Tests for the batch conversion module.
+"""
+import os
+import plistlib
+import pytest
+from pbk2mobileconfig.batch import collect_inputs, plan_jobs, run_batch
+from pbk2mobileconfig.cli import main
+
+PBK_CONTENT = """[Test VPN]
+Type=4
+PhoneNumber=vpn.example.com
+"""
+
+
+def _make_tree(tmp_path):
+    """Create two identically named phonebooks in different folders."""
+    for user in ("alice", "bob"):
+        user_dir = tmp_path / "in" / user
+        user_dir.mkdir(parents=True)
+        (user_dir / "rasphone.pbk").write_text(PBK_CONTENT)
+    (tmp_path / "in" / "notes.txt").write_text("not a phonebook")
+    return tmp_path / "in"
+
+
+def test_collect_inputs_sources(tmp_path):
+    """Test expanding directories, globs and manifests."""
+    input_dir = _make_tree(tmp_path)
+    manifest = tmp_path / "inputs.txt"
+    manifest.write_text("# fleet\nin/alice/rasphone.pbk\n\n")
+
+    from_dir = collect_inputs([str(input_dir)])
+    assert [os.path.basename(os.path.dirname(p)) for p in from_dir] == [
+        "alice",
+        "bob",
+    ]
+    assert len(collect_inputs([str(input_dir / "*" / "*.pbk")])) == 2
+    assert collect_inputs(["@" + str(manifest)]) == [
+        str(tmp_path / "in/alice/rasphone.pbk")
+    ]
+    # Duplicates across sources are dropped
+    assert len(collect_inputs([str(input_dir), "@" + str(manifest)])) == 2
+
+
+def test_plan_jobs_mirrors_layout(tmp_path):
+    """Test that identically named inputs get distinct outputs."""
+    input_dir = _make_tree(tmp_path)
+    jobs = plan_jobs(collect_inputs([str(input_dir)]), str(tmp_path / "out"))
+
+    outputs = {job.output_path for job in jobs}
+    assert outputs == {
+        str(tmp_path / "out" / "alice" / "rasphone.mobileconfig"),
+        str(tmp_path / "out" / "bob" / "rasphone.mobileconfig"),
+    }
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_batch_reports_errors(tmp_path, workers):
+    """Test that a failing file does not stop the run."""
+    input_dir = _make_tree(tmp_path)
+    paths = collect_inputs([str(input_dir)]) + [str(tmp_path / "missing.pbk")]
+    jobs = plan_jobs(paths, str(tmp_path / "out"))
+
+    results = list(run_batch(jobs, workers=workers))
+
+    assert [r.ok for r in results] == [True, True, False]
+    assert "File not found" in results[2].error
+    with open(results[0].output_path, "rb") as f:
+        profile = plistlib.load(f)
+    assert profile["PayloadContent"][0]["PayloadDisplayName"] == "Test VPN"
+
+
+def test_batch_cli(tmp_path, capsys):
+    """Test the batch subcommand of the command line interface."""
+    input_dir = _make_tree(tmp_path)
+    out_dir = tmp_path / "out"
+
+    assert main(["batch", str(input_dir), "-o", str(out_dir), "-j", "1"]) == 0
+    assert (out_dir / "bob" / "rasphone.mobileconfig").exists()
+    assert "2 of 2" in capsys.readouterr().out
@@ -0,0 +1,47 @@
+"""
+Tests for the benchmark generator and baseline comparison.
+"""
+import pytest
+from benchmarks.generator import ENCODINGS, write_phonebook
+from benchmarks.suite import find_regressions, run_scenario
+from pbk2mobileconfig.parser import PBKParser
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_generated_phonebook_parses(tmp_path, encoding):
+    """Test that generated phonebooks parse in every encoding."""
+    paths = write_phonebook(str(tmp_path), 50, encoding, sidecar=True)
+    assert set(paths) == {".pbk", ".cms"}
+
+    parser = PBKParser(paths[".pbk"])
+    entries = parser.parse()
+    assert len(entries) == 50
+    assert {entry["Type"] for entry in entries} <= {"1", "2", "4", "8", "10"}
+    # About half of the entries have sidecar settings
+    assert 0 < sum(1 for entry in entries if entry["AdditionalSettings"]) < 50
+    assert any("ü" in entry.name or "é" in entry.name for entry in entries)
+
+
+def test_generator_is_deterministic(tmp_path):
+    """Test that a seed always produces the same phonebook."""
+    first = write_phonebook(str(tmp_path), 20, name="first")
+    second = write_phonebook(str(tmp_path), 20, name="second")
+    with open(first[".pbk"], "rb") as a, open(second[".pbk"], "rb") as b:
+        assert a.read() == b.read()
+
+
+def test_run_scenario_and_regressions(tmp_path):
+    """Test measuring all stages and comparing them against a baseline."""
+    results = {"10-utf-8": run_scenario(str(tmp_path), 10, rounds=1)}
+    stages = results["10-utf-8"]
+    assert set(stages) == {"parse", "convert", "validate", "dump-xml", "dump-binary"}
+    assert all(metrics["seconds"] > 0 for metrics in stages.values())
+    assert stages["parse"]["peak_bytes"] > 0
+
+    assert find_regressions(results, results) == []
+    faster = {
+        "10-utf-8": {"parse": {"seconds": stages["parse"]["seconds"] / 2}}
+    }
+    regressions = find_regressions(results, faster, tolerance=0.25)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("10-utf-8 parse seconds")
@@ -0,0 +1,68 @@
+"""
+Tests for the conversion cache module.
+"""
+import os
+import plistlib
+from pbk2mobileconfig.batch import convert_file
+from pbk2mobileconfig.cache import ConversionCache, input_key
+from pbk2mobileconfig.converter import VPNProfileConverter
+from pbk2mobileconfig.parser import PBKParser
+
+PBK_CONTENT = "[Test VPN]\nType=4\nPhoneNumber=vpn.example.com\n"
+
+
+def test_input_key_covers_inputs(tmp_path):
+    """Test that the key changes with the PBK, its sidecars and options."""
+    pbk_file = tmp_path / "profile.pbk"
+    pbk_file.write_text(PBK_CONTENT)
+    options = {"identifier": "com.example.vpn"}
+
+    key = input_key(str(pbk_file), options)
+    assert input_key(str(pbk_file), dict(options)) == key
+    assert input_key(str(pbk_file), {"identifier": "com.other.vpn"}) != key
+
+    (tmp_path / "profile.cms").write_text("[Test VPN]\nDialup=0\n")
+    with_sidecar = input_key(str(pbk_file), options)
+    assert with_sidecar != key
+
+    pbk_file.write_text(PBK_CONTENT + "IpDnsAddress=10.0.0.1\n")
+    assert input_key(str(pbk_file), options) not in (key, with_sidecar)
+
+
+def test_cache_hit_skips_conversion(tmp_path, monkeypatch):
+    """Test that a cached conversion is reused without parsing."""
+    pbk_file = tmp_path / "profile.pbk"
+    pbk_file.write_text(PBK_CONTENT)
+    cache = ConversionCache(str(tmp_path / "cache"))
+    converter = VPNProfileConverter(deterministic_uuids=True)
+
+    first = tmp_path / "first.mobileconfig"
+    assert convert_file(str(pbk_file), str(first), converter, cache=cache) == 1
+
+    def fail(self):
+        raise AssertionError("parsed despite cache hit")
+
+    monkeypatch.setattr(PBKParser, "iter_entries", fail)
+    second = tmp_path / "second.mobileconfig"
+    assert convert_file(str(pbk_file), str(second), converter, cache=cache) == 1
+    assert second.read_bytes() == first.read_bytes()
+    assert plistlib.loads(second.read_bytes())["PayloadContent"][0][
+        "PayloadDisplayName"
+    ] == "Test VPN"
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """Test that eviction removes the oldest entries first."""
+    cache = ConversionCache(str(tmp_path / "cache"), max_size=150)
+    for i, key in enumerate(["aa01", "bb02", "cc03"]):
+        cache.put(key, 1, b"x" * 100)
+        os.utime(cache._path(key), (1000 + i, 1000 + i))
+
+    # Reading refreshes the entry, making "bb02" the least recently used
+    assert cache.get("aa01") == (1, b"x" * 100)
+
+    assert cache.evict() == 2
+    assert cache.get("aa01") is not None
+    assert cache.get("bb02") is None
+    assert cache.get("cc03") is None
+    assert cache.size() <= 150
@@ -0,0 +1,104 @@
+"""
+Tests for the command line interface.
+"""
+import plistlib
+from pbk2mobileconfig.cli import main
+
+PBK_CONTENT = """[First VPN]
+Type=4
+PhoneNumber=first.example.com
+
+[Corp-VPN]
+Type=4
+PhoneNumber=corp.example.com
+"""
+
+
+def test_convert_file(tmp_path):
+    """Test converting a whole phonebook."""
+    pbk_file = tmp_path / "test.pbk"
+    pbk_file.write_text(PBK_CONTENT)
+    output = tmp_path / "test.mobileconfig"
+
+    assert main([str(pbk_file), str(output), "--org", "Test Org"]) == 0
+    with open(output, "rb") as f:
+        profile = plistlib.load(f)
+    assert len(profile["PayloadContent"]) == 2
+    assert profile["PayloadOrganization"] == "Test Org"
+
+
+def test_convert_single_entry(tmp_path, capsys):
+    """Test converting one named entry with --entry."""
+    pbk_file = tmp_path / "test.pbk"
+    pbk_file.write_text(PBK_CONTENT)
+    output = tmp_path / "test.mobileconfig"
+    index_dir = tmp_path / "index"
+    options = ["--index-dir", str(index_dir)]
+
+    assert main([str(pbk_file), str(output), "--entry", "Corp-VPN"] + options) == 0
+    with open(output, "rb") as f:
+        profile = plistlib.load(f)
+    assert [p["PayloadDisplayName"] for p in profile["PayloadContent"]] == [
+        "Corp-VPN"
+    ]
+
+    assert main([str(pbk_file), str(output), "--entry", "Missing"] + options) == 1
+    assert "Entry not found: Missing" in capsys.readouterr().out
+
+
+def test_convert_binary_format(tmp_path):
+    """Test writing a binary property list with --format."""
+    pbk_file = tmp_path / "test.pbk"
+    pbk_file.write_text(PBK_CONTENT)
+    output = tmp_path / "test.mobileconfig"
+
+    assert main([str(pbk_file), str(output), "--format", "binary"]) == 0
+    data = output.read_bytes()
+    assert data.startswith(b"bplist00")
+    assert len(plistlib.loads(data)["PayloadContent"]) == 2
+    # No temporary file is left behind
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "test.mobileconfig",
+        "test.pbk",
+    ]
+
+
+def test_include_secrets(tmp_path):
+    """Test that pre-shared keys are written only with --include-secrets."""
+    pbk_file = tmp_path / "test.pbk"
+    pbk_file.write_text(
+        "[IKE VPN]\nType=10\nPhoneNumber=ike.example.com\nPreSharedKey=secret\n"
+    )
+    output = tmp_path / "test.mobileconfig"
+
+    assert main([str(pbk_file), str(output)]) == 0
+    with open(output, "rb") as f:
+        payload = plistlib.load(f)["PayloadContent"][0]
+    assert "SharedSecret" not in payload["IKEv2"]
+
+    assert main([str(pbk_file), str(output), "--include-secrets"]) == 0
+    with open(output, "rb") as f:
+        payload = plistlib.load(f)["PayloadContent"][0]
+    assert payload["IKEv2"]["SharedSecret"] == "secret"
+
+
+def test_input_named_like_subcommand(tmp_path, monkeypatch):
+    """Test that an existing file named like a subcommand is converted."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "batch").write_text(PBK_CONTENT)
+
+    assert main(["batch", "batch.mobileconfig"]) == 0
+    assert main(["--", "batch", "again.mobileconfig"]) == 0
+    for name in ("batch.mobileconfig", "again.mobileconfig"):
+        with open(tmp_path / name, "rb") as f:
+            assert len(plistlib.load(f)["PayloadContent"]) == 2
+
+
+def test_subcommand_without_such_file(tmp_path, monkeypatch):
+    """Test that the subcommand is used when no file of its name exists."""
+    monkeypatch.chdir(tmp_path)
+    pbk_file = tmp_path / "test.pbk"
+    pbk_file.write_text(PBK_CONTENT)
+
+    assert main(["batch", str(pbk_file), "--output-dir", "out", "-j", "1"]) == 0
+    assert (tmp_path / "out" / "test.mobileconfig").exists()
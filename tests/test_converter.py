@@ -70,3 +70,135 @@ def test_empty_config_list():
     converter = VPNProfileConverter()
     result = converter.generate_mobileconfig([])
     assert len(result["PayloadContent"]) == 0
+
+
+def test_convert_pptp_config():
+    """Test converting PPTP VPN configuration."""
+    converter = VPNProfileConverter()
+
+    result = converter.convert_vpn_config(
+        {
+            "Name": "PPTP VPN",
+            "Type": "2",
+            "PhoneNumber": "pptp.example.com",
+            "DataEncryption": "256",
+        }
+    )
+
+    assert result["VPNType"] == "PPTP"
+    assert result["PPP"]["CommRemoteAddress"] == "pptp.example.com"
+    assert result["PPP"]["CCPMPPE128Enabled"] == 1
+    assert result["PPP"]["CCPMPPE40Enabled"] == 0
+
+
+def test_convert_ikev2_config():
+    """Test converting IKEv2 VPN configuration."""
+    converter = VPNProfileConverter()
+    vpn_config = {"Name": "IKEv2 VPN", "Type": "10", "PhoneNumber": "ike.example.com"}
+
+    result = converter.convert_vpn_config(vpn_config)
+    assert result["VPNType"] == "IKEv2"
+    assert result["IKEv2"]["RemoteAddress"] == "ike.example.com"
+    assert result["IKEv2"]["RemoteIdentifier"] == "ike.example.com"
+    assert result["IKEv2"]["AuthenticationMethod"] == "None"
+    assert result["IKEv2"]["ExtendedAuthEnabled"] == 1
+
+    vpn_config["SharedSecret"] = "secret"
+    result = converter.convert_vpn_config(vpn_config)
+    assert result["IKEv2"]["AuthenticationMethod"] == "SharedSecret"
+    assert result["IKEv2"]["ExtendedAuthEnabled"] == 0
+    assert "SharedSecret" not in result["IKEv2"]
+
+    result = VPNProfileConverter(include_secrets=True).convert_vpn_config(vpn_config)
+    assert result["IKEv2"]["AuthenticationMethod"] == "SharedSecret"
+    assert result["IKEv2"]["SharedSecret"] == "secret"
+
+
+def test_l2tp_shared_secret_only_on_request():
+    """Test that an L2TP pre-shared key is embedded only with include_secrets."""
+    vpn_config = {
+        "Name": "L2TP VPN",
+        "Type": "4",
+        "PhoneNumber": "l2tp.example.com",
+        "SharedSecret": "secret",
+    }
+    plain = VPNProfileConverter()
+    result = plain.convert_vpn_config(vpn_config)
+    assert result["IPSec"]["SharedSecret"] == ""
+
+    with_secrets = VPNProfileConverter(include_secrets=True)
+    result = with_secrets.convert_vpn_config(vpn_config)
+    assert result["IPSec"]["SharedSecret"] == "secret"
+
+    other = dict(vpn_config, SharedSecret="other")
+    assert plain.content_key(vpn_config) == plain.content_key(other)
+    assert with_secrets.content_key(vpn_config) != with_secrets.content_key(other)
+
+
+def test_payloads_do_not_share_state():
+    """Test that payloads rendered from templates are independent."""
+    converter = VPNProfileConverter()
+    vpn_config = {"Name": "Test VPN", "Type": "10", "PhoneNumber": "vpn.example.com"}
+
+    first = converter.convert_vpn_config(vpn_config)
+    first["IKEv2"]["IKESecurityAssociationParameters"]["DiffieHellmanGroup"] = 2
+    first["IPv4"]["OverridePrimary"] = 0
+
+    second = converter.convert_vpn_config(vpn_config)
+    sa_parameters = second["IKEv2"]["IKESecurityAssociationParameters"]
+    assert sa_parameters["DiffieHellmanGroup"] == 14
+    assert second["IPv4"]["OverridePrimary"] == 1
+
+    l2tp = converter.convert_vpn_config({"Name": "L2TP", "Type": "4"})
+    l2tp["PPP"]["AuthProtocol"].append("EAP")
+    l2tp = converter.convert_vpn_config({"Name": "L2TP", "Type": "4"})
+    assert l2tp["PPP"]["AuthProtocol"] == ["PAP", "CHAP", "MSCHAPv2"]
+
+
+def test_empty_extended_auth_flag():
+    """Test that an empty UseExtendedAuthentication value uses the default."""
+    converter = VPNProfileConverter()
+    result = converter.convert_vpn_config(
+        {"Name": "Test VPN", "Type": "4", "UseExtendedAuth": ""}
+    )
+    assert result["VPN"]["UseExtendedAuthentication"] == 1
+
+
+def test_int_flags():
+    """Test that flags given as ints in entry dicts are accepted."""
+    converter = VPNProfileConverter()
+    l2tp = converter.convert_vpn_config(
+        {"Name": "L2TP", "Type": "4", "UseExtendedAuth": 0}
+    )
+    assert l2tp["VPN"]["UseExtendedAuthentication"] == 0
+
+    pptp = converter.convert_vpn_config(
+        {"Name": "PPTP", "Type": "2", "DataEncryption": 0}
+    )
+    assert pptp["PPP"]["CCPEnabled"] == 0
+
+    assert converter.content_key(
+        {"Name": "L2TP", "Type": "4", "UseExtendedAuth": 0}
+    ) == converter.content_key({"Name": "L2TP", "Type": "4", "UseExtendedAuth": "0"})
+
+
+def test_deterministic_uuids():
+    """Test that deterministic mode makes output reproducible."""
+    vpn_configs = [{"Name": "Test VPN", "Type": "4"}]
+
+    first = VPNProfileConverter(deterministic_uuids=True).generate_mobileconfig(
+        vpn_configs
+    )
+    second = VPNProfileConverter(deterministic_uuids=True).generate_mobileconfig(
+        vpn_configs
+    )
+    assert first == second
+    assert uuid.UUID(first["PayloadUUID"]).version == 5
+
+    other = VPNProfileConverter(
+        identifier="com.other.vpn", deterministic_uuids=True
+    ).generate_mobileconfig(vpn_configs)
+    assert other["PayloadUUID"] != first["PayloadUUID"]
+
+    random = VPNProfileConverter().generate_mobileconfig(vpn_configs)
+    assert random["PayloadUUID"] != first["PayloadUUID"]
@@ -0,0 +1,95 @@
+"""
+Tests for reusing the payloads of identical entries.
+"""
+import plistlib
+import pytest
+from pbk2mobileconfig.batch import plan_jobs, run_batch
+from pbk2mobileconfig.cli import main
+from pbk2mobileconfig.converter import VPNProfileConverter
+from pbk2mobileconfig.dedup import DedupConverter
+from pbk2mobileconfig.incremental import IDENTITY_KEYS
+from pbk2mobileconfig.models import FIELDS, VPNEntry
+
+CORPORATE = """[Corp VPN]
+Type=4
+PhoneNumber=vpn.example.com
+IpDnsAddress=10.0.0.1
+
+[Cloud VPN]
+Type=10
+PhoneNumber=cloud.example.com
+"""
+
+BASE = {
+    "name": "VPN",
+    "phone_number": "vpn.example.com",
+    "user_name": "alice",
+    "shared_secret": "secret",
+    "dns_address": "10.0.0.1",
+    "dns2_address": "10.0.0.2",
+    "dns_suffix": "corp.example.com",
+    "use_extended_auth": "1",
+    "data_encryption": "256",
+}
+
+
+def _content(payload):
+    return {
+        key: value
+        for key, value in payload.items()
+        if key not in IDENTITY_KEYS + ("PayloadOrganization",)
+    }
+
+
+@pytest.mark.parametrize("vpn_type", ["1", "4", "10"])
+@pytest.mark.parametrize(
+    "field", [field for field in FIELDS if field.option is not None]
+)
+def test_content_key_covers_payload_fields(vpn_type, field):
+    """Test that entries with equal keys never get different payloads."""
+    converter = VPNProfileConverter(deterministic_uuids=True)
+    entry = VPNEntry(**dict(BASE, type=vpn_type))
+    for value in ("", "0", "2", "other"):
+        fields = dict(BASE, type=vpn_type)
+        fields[field.attr] = value
+        changed = VPNEntry(**fields)
+        if converter.content_key(changed) == converter.content_key(entry):
+            assert _content(converter.convert_vpn_config(changed)) == _content(
+                converter.convert_vpn_config(entry)
+            )
+
+
+def test_dedup_converter_matches_plain_converter():
+    """Test that reused payloads equal freshly converted ones."""
+    options = {"identifier": "com.example.vpn", "deterministic_uuids": True}
+    plain = VPNProfileConverter(**options)
+    dedup = DedupConverter(**options)
+    entries = [VPNEntry(**dict(BASE, type="4")) for _ in range(3)]
+
+    payloads = [dedup.convert_vpn_config(entry) for entry in entries]
+    assert (dedup.hits, dedup.misses, dedup.distinct) == (2, 1, 1)
+    expected = plistlib.dumps(plain.convert_vpn_config(entries[0]))
+    assert all(plistlib.dumps(payload) == expected for payload in payloads)
+
+    random_uuids = DedupConverter()
+    first, second = (random_uuids.convert_vpn_config(entry) for entry in entries[:2])
+    assert first["PayloadUUID"] != second["PayloadUUID"]
+
+
+def test_batch_dedup_statistics(tmp_path, capsys):
+    """Test reuse counts across phonebooks in batch mode."""
+    input_dir = tmp_path / "in"
+    for user in ("alice", "bob", "carol"):
+        (input_dir / user).mkdir(parents=True)
+        (input_dir / user / "rasphone.pbk").write_text(CORPORATE)
+
+    jobs = plan_jobs(
+        sorted(str(path) for path in input_dir.glob("*/rasphone.pbk")),
+        str(tmp_path / "out"),
+    )
+    results = list(run_batch(jobs, workers=1, dedup=True))
+    assert [result.reused for result in results] == [0, 2, 2]
+
+    args = [str(input_dir), "-o", str(tmp_path / "cli"), "-j", "1", "--dedup"]
+    assert main(["batch"] + args) == 0
+    assert "Reused the payloads of 4 of 6 entries" in capsys.readouterr().out
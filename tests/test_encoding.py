@@ -0,0 +1,88 @@
+"""
+Tests for the encoding detection module.
+"""
+import pytest
+from pbk2mobileconfig import encoding
+from pbk2mobileconfig.encoding import (
+    detect_encoding,
+    iter_lines,
+    read_text,
+    sniff_encoding,
+)
+from pbk2mobileconfig.parser import PBKParser
+
+PBK_CONTENT = "[Test VPN]\nType=4\nPhoneNumber=vpn.example.com\nIpDnsSuffix=café.example\n"
+
+
+@pytest.mark.parametrize(
+    "data, expected",
+    [
+        (PBK_CONTENT.encode("utf-16"), "utf-16"),
+        (PBK_CONTENT.encode("utf-16-le"), "utf-16-le"),
+        (PBK_CONTENT.encode("utf-16-be"), "utf-16-be"),
+        (PBK_CONTENT.encode("utf-8-sig"), "utf-8-sig"),
+        (PBK_CONTENT.encode("utf-8"), None),
+    ],
+)
+def test_sniff_encoding(data, expected):
+    """Test BOM and null-byte pattern sniffing."""
+    assert sniff_encoding(data) == expected
+
+
+@pytest.mark.parametrize("codec", ["utf-8", "utf-16", "utf-16-le", "cp1252"])
+def test_read_text_roundtrip(tmp_path, codec):
+    """Test that files in common encodings decode to the original text."""
+    path = tmp_path / "test.pbk"
+    path.write_bytes(PBK_CONTENT.encode(codec))
+    encoding.clear_cache()
+    assert read_text(str(path)) == PBK_CONTENT
+
+
+def test_detect_encoding_fallback():
+    """Test that undecodable data still falls back to a single-byte codec."""
+    assert detect_encoding(b"\x81\x8d\x8f") == "latin-1"
+
+
+def test_read_text_uses_cache(tmp_path, monkeypatch):
+    """Test that the encoding is detected once per unchanged file."""
+    path = tmp_path / "test.pbk"
+    path.write_bytes(PBK_CONTENT.encode("utf-16"))
+    encoding.clear_cache()
+
+    calls = []
+    original = encoding.detect_encoding
+    monkeypatch.setattr(
+        encoding,
+        "detect_encoding",
+        lambda data, **kwargs: calls.append(1) or original(data, **kwargs),
+    )
+    read_text(str(path))
+    read_text(str(path))
+    assert len(calls) == 1
+
+
+def test_parse_utf16_pbk(tmp_path):
+    """Test parsing a UTF-16 phonebook as exported by rasphone."""
+    path = tmp_path / "test.pbk"
+    path.write_bytes(PBK_CONTENT.encode("utf-16"))
+    configs = PBKParser(str(path)).parse()
+    assert configs[0]["Name"] == "Test VPN"
+    assert configs[0]["IpDnsSuffix"] == "café.example"
+
+
+@pytest.mark.parametrize("codec", ["utf-8", "utf-16"])
+def test_iter_lines_small_chunks(tmp_path, codec):
+    """Test that lines split across read blocks are reassembled."""
+    path = tmp_path / "test.pbk"
+    content = PBK_CONTENT * 2000
+    path.write_bytes(content.replace("\n", "\r\n").encode(codec))
+    encoding.clear_cache()
+    assert list(iter_lines(str(path), chunk_size=7)) == content.splitlines()
+
+
+def test_iter_lines_late_invalid_byte(tmp_path):
+    """Test that stray cp1252 bytes after the sniffed prefix still decode."""
+    path = tmp_path / "test.pbk"
+    path.write_bytes(b"A=1\n" * 20000 + b"B=caf\xe9\n")
+    encoding.clear_cache()
+    assert list(iter_lines(str(path)))[-1] == "B=café"
@@ -0,0 +1,164 @@
+"""
+Tests for the incremental regeneration module.
+"""
+import os
+import plistlib
+from pbk2mobileconfig.cli import main
+from pbk2mobileconfig.converter import VPNProfileConverter
+from pbk2mobileconfig.incremental import (
+    load_digests,
+    regenerate,
+    state_path,
+    write_digests,
+)
+
+VPN_CONFIGS = [
+    {"Name": "First VPN", "Type": "4", "PhoneNumber": "first.example.com"},
+    {"Name": "Second VPN", "Type": "10", "PhoneNumber": "second.example.com"},
+    {"Name": "Third VPN", "Type": "2", "PhoneNumber": "third.example.com"},
+]
+
+
+def _roundtrip(profile):
+    """Serialize and load a profile like a file on disk."""
+    return plistlib.loads(plistlib.dumps(profile))
+
+
+def _by_name(profile):
+    """Index the payloads of a profile by entry name."""
+    return {p["PayloadDisplayName"]: p for p in profile["PayloadContent"]}
+
+
+def test_regenerate_reuses_unchanged_payloads(monkeypatch):
+    """Test that only changed entries are rendered and get new UUIDs."""
+    converter = VPNProfileConverter()
+    previous, _, digests = regenerate(converter, VPN_CONFIGS, {})
+    previous = _roundtrip(previous)
+
+    configs = [dict(config) for config in VPN_CONFIGS[:2]]
+    configs[1]["PhoneNumber"] = "moved.example.com"
+    configs.append({"Name": "Fourth VPN", "Type": "4"})
+
+    rendered = []
+    original = converter.convert_vpn_config
+    monkeypatch.setattr(
+        converter,
+        "convert_vpn_config",
+        lambda config: rendered.append(config["Name"]) or original(config),
+    )
+    profile, summary, _ = regenerate(converter, configs, previous, digests)
+
+    assert rendered == ["Second VPN", "Fourth VPN"]
+    assert summary.unchanged == ["First VPN"]
+    assert summary.changed == ["Second VPN"]
+    assert summary.added == ["Fourth VPN"]
+    assert summary.removed == ["Third VPN"]
+
+    old, new = _by_name(previous), _by_name(profile)
+    assert new["First VPN"] == old["First VPN"]
+    assert new["Second VPN"]["PayloadUUID"] != old["Second VPN"]["PayloadUUID"]
+    assert (
+        new["Second VPN"]["PayloadIdentifier"] == old["Second VPN"]["PayloadIdentifier"]
+    )
+    assert new["Second VPN"]["IKEv2"]["RemoteAddress"] == "moved.example.com"
+    assert profile["PayloadUUID"] != previous["PayloadUUID"]
+
+
+def test_regenerate_without_changes_keeps_root_uuid():
+    """Test that an unchanged phonebook reproduces the previous profile."""
+    converter = VPNProfileConverter()
+    previous = _roundtrip(regenerate(converter, VPN_CONFIGS, {})[0])
+
+    profile, summary, _ = regenerate(converter, VPN_CONFIGS, previous)
+
+    assert not summary.has_changes
+    assert _roundtrip(profile) == previous
+
+
+def test_regenerate_profile_without_digests():
+    """Test profiles from plain conversions are compared by rendering."""
+    converter = VPNProfileConverter()
+    previous = _roundtrip(converter.generate_mobileconfig(VPN_CONFIGS))
+
+    configs = [dict(config) for config in VPN_CONFIGS]
+    configs[0]["IpDnsAddress"] = "10.0.0.1"
+    profile, summary, digests = regenerate(converter, configs, previous)
+
+    assert summary.unchanged == ["Second VPN", "Third VPN"]
+    assert summary.changed == ["First VPN"]
+    old, new = _by_name(previous), _by_name(profile)
+    assert new["Third VPN"]["PayloadUUID"] == old["Third VPN"]["PayloadUUID"]
+    assert set(digests) == {payload["PayloadUUID"] for payload in new.values()}
+
+
+def test_payloads_hold_only_apple_keys():
+    """Test that digests are returned rather than added to the payloads."""
+    converter = VPNProfileConverter()
+    profile, _, _ = regenerate(converter, VPN_CONFIGS, {})
+    plain = converter.generate_mobileconfig(VPN_CONFIGS)
+    assert [sorted(payload) for payload in profile["PayloadContent"]] == [
+        sorted(payload) for payload in plain["PayloadContent"]
+    ]
+
+
+def test_digests_roundtrip(tmp_path):
+    """Test that digests survive the state file and ignore foreign files."""
+    profile_path = str(tmp_path / "vpn.mobileconfig")
+    assert load_digests(profile_path) == {}
+
+    write_digests(profile_path, {"uuid": "digest"})
+    assert load_digests(profile_path) == {"uuid": "digest"}
+
+    with open(state_path(profile_path), "w") as f:
+        f.write("[]")
+    assert load_digests(profile_path) == {}
+
+
+def test_regenerate_ignores_fields_not_rendered(monkeypatch):
+    """Test that fields missing from the payload do not mint new UUIDs."""
+    converter = VPNProfileConverter()
+    previous, _, digests = regenerate(converter, VPN_CONFIGS, {})
+    previous = _roundtrip(previous)
+
+    configs = [dict(config) for config in VPN_CONFIGS]
+    configs[0]["AdditionalSettings"] = {"Dialing": {"RedialCount": "3"}}
+    configs[1]["Unrelated"] = "value"
+    rendered = []
+    original = converter.convert_vpn_config
+    monkeypatch.setattr(
+        converter,
+        "convert_vpn_config",
+        lambda config: rendered.append(config["Name"]) or original(config),
+    )
+    profile, summary, _ = regenerate(converter, configs, previous, digests)
+
+    assert rendered == []
+    assert not summary.has_changes
+    assert _roundtrip(profile) == previous
+
+
+def test_previous_cli(tmp_path, capsys):
+    """Test the --previous option of the command line interface."""
+    pbk_file = tmp_path / "test.pbk"
+    pbk_file.write_text("[First VPN]\nType=4\n\n[Second VPN]\nType=4\n")
+    first = tmp_path / "first.mobileconfig"
+    second = tmp_path / "second.mobileconfig"
+
+    assert main([str(pbk_file), str(first)]) == 0
+    pbk_file.write_text("[First VPN]\nType=4\n\n[Second VPN]\nType=2\n")
+    assert main([str(pbk_file), str(second), "--previous", str(first)]) == 0
+
+    out = capsys.readouterr().out
+    assert "Unchanged: 1" in out
+    assert "Changed: 1 (Second VPN)" in out
+    assert os.path.exists(state_path(str(second)))
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+    third = tmp_path / "third.mobileconfig"
+    assert main([str(pbk_file), str(third), "--previous", str(second)]) == 0
+    assert "Unchanged: 2" in capsys.readouterr().out
+    with open(second, "rb") as f:
+        previous = plistlib.load(f)
+    assert load_digests(str(second)).keys() == {
+        payload["PayloadUUID"] for payload in previous["PayloadContent"]
+    }
@@ -0,0 +1,113 @@
+"""
+Tests for the section index module.
+"""
+import os
+import pytest
+from pbk2mobileconfig import index
+from pbk2mobileconfig.index import SectionIndex
+from pbk2mobileconfig.parser import PBKParser
+
+PBK_CONTENT = """Encoding=1
+[First VPN]
+Type=4
+PhoneNumber=first.example.com
+
+[Broken]
+this line would fail a full parse
+
+[Corp-VPN]
+Type=2
+PhoneNumber=corp.example.com
+"""
+
+
+@pytest.mark.parametrize("codec", ["utf-8", "utf-8-sig", "utf-16", "utf-16-le"])
+def test_section_index(tmp_path, codec):
+    """Test that section byte ranges are found in common encodings."""
+    path = tmp_path / "test.pbk"
+    path.write_bytes(PBK_CONTENT.encode(codec))
+
+    section_index = SectionIndex.build(str(path))
+
+    assert section_index.names() == ["First VPN", "Broken", "Corp-VPN"]
+    assert section_index.read_defaults() == {"encoding": "1"}
+    assert section_index.read_section("First VPN") == {
+        "type": "4",
+        "phonenumber": "first.example.com",
+    }
+    assert section_index.read_section("Missing") is None
+
+
+def test_get_entry(tmp_path):
+    """Test random access to a single entry of a phonebook."""
+    path = tmp_path / "test.pbk"
+    path.write_text(PBK_CONTENT)
+    parser = PBKParser(str(path))
+
+    entry = parser.get_entry("Corp-VPN")
+    assert entry["Name"] == "Corp-VPN"
+    assert entry["PhoneNumber"] == "corp.example.com"
+    assert entry["encoding"] == "1"
+    assert parser.get_entry("Missing") is None
+
+
+def test_get_entry_applies_default_section(tmp_path):
+    """Test that get_entry() applies [DEFAULT] sections like parse()."""
+    path = tmp_path / "test.pbk"
+    path.write_text(
+        "Encoding=1\n[DEFAULT]\nPhoneNumber=def.example.com\nDevice=vpn\n"
+        "[First VPN]\nType=4\n[Corp-VPN]\nType=2\nDevice=modem\n"
+    )
+    parser = PBKParser(str(path))
+
+    section_index = SectionIndex.build(str(path))
+    assert section_index.names() == ["First VPN", "Corp-VPN"]
+    assert "DEFAULT" not in section_index
+    assert section_index.read_defaults() == {
+        "encoding": "1",
+        "phonenumber": "def.example.com",
+        "device": "vpn",
+    }
+    entries = parser.parse()
+    assert entries[0]["PhoneNumber"] == "def.example.com"
+    for entry in entries:
+        assert parser.get_entry(entry.name).as_dict() == entry.as_dict()
+    assert parser.get_entry("DEFAULT") is None
+
+
+def test_index_cache_tracks_changes(tmp_path):
+    """Test that a cached index is rebuilt when the file changes."""
+    path = tmp_path / "test.pbk"
+    path.write_text("[First VPN]\nType=4\n")
+    index.clear_cache()
+    assert SectionIndex.for_file(str(path)) is SectionIndex.for_file(str(path))
+
+    path.write_text("[First VPN]\nType=4\n[Second VPN]\nType=4\n")
+    assert "Second VPN" in SectionIndex.for_file(str(path))
+
+
+def test_index_is_stored_on_disk(tmp_path, monkeypatch):
+    """Test that a later process reuses the stored index of unchanged files."""
+    path = tmp_path / "test.pbk"
+    path.write_text(PBK_CONTENT)
+    os.utime(path, ns=(0, 10**9))
+    index.clear_cache()
+    index.set_directory(str(tmp_path / "index"))
+    try:
+        built = SectionIndex.for_file(str(path))
+        assert len(os.listdir(tmp_path / "index")) == 1
+
+        index.clear_cache()
+        monkeypatch.setattr(SectionIndex, "build", None)
+        loaded = SectionIndex.for_file(str(path))
+        assert loaded is not built
+        assert loaded.names() == built.names()
+        assert loaded.read_section("Corp-VPN") == built.read_section("Corp-VPN")
+
+        monkeypatch.undo()
+        path.write_text(PBK_CONTENT + "[Second VPN]\nType=4\n")
+        index.clear_cache()
+        assert "Second VPN" in SectionIndex.for_file(str(path))
+    finally:
+        index.set_directory(None)
+        index.clear_cache()
@@ -0,0 +1,68 @@
+"""
+Tests for the entry model module.
+"""
+import pickle
+import pytest
+from pbk2mobileconfig.models import VPNEntry
+
+
+def test_from_options():
+    """Test building an entry from tokenized PBK options."""
+    entry = VPNEntry.from_options(
+        "Test VPN",
+        {
+            "type": "4",
+            "phonenumber": "vpn.example.com",
+            "presharedkey": "secret",
+            "device": "WAN Miniport",
+            "encoding": "1",
+        },
+    )
+
+    assert entry.name == "Test VPN"
+    assert entry.shared_secret == "secret"
+    assert entry.use_extended_auth == "1"
+    # Options named like a field are not duplicated as extras
+    assert entry.extra == {"presharedkey": "secret", "encoding": "1"}
+
+
+def test_mapping_view():
+    """Test case-insensitive, dict-compatible access."""
+    entry = VPNEntry(name="Test VPN", type="4", extra={"encoding": "1"})
+
+    assert entry["Name"] == "Test VPN"
+    assert entry["PHONENUMBER"] == ""
+    assert entry["Encoding"] == "1"
+    assert entry.get("missing", "x") == "x"
+    assert "ipdnsaddress" in entry
+    with pytest.raises(KeyError):
+        entry["missing"]
+
+    as_dict = entry.as_dict()
+    assert list(as_dict)[:3] == ["Name", "Type", "PhoneNumber"]
+    assert as_dict["encoding"] == "1"
+    assert entry == as_dict
+    assert len(entry) == len(as_dict)
+
+
+def test_coerce_dict():
+    """Test converting a plain dict configuration into an entry."""
+    entry = VPNEntry.coerce({"name": "Test VPN", "Type": "4", "Custom": "x"})
+
+    assert entry.name == "Test VPN"
+    assert entry.type == "4"
+    assert entry.extra == {"custom": "x"}
+    assert VPNEntry.coerce(entry) is entry
+
+
+def test_unknown_field():
+    """Test that unknown constructor fields are rejected."""
+    with pytest.raises(TypeError):
+        VPNEntry(nickname="x")
+
+
+def test_entry_is_compact_and_picklable():
+    """Test that entries use slots and survive process boundaries."""
+    entry = VPNEntry(name="Test VPN", type="4")
+    assert not hasattr(entry, "__dict__")
+    assert pickle.loads(pickle.dumps(entry)) == entry
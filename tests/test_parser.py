@@ -3,7 +3,8 @@ Tests for the PBK parser module.
 """
 import os
 import pytest
-from pbk2mobileconfig.parser import PBKParser
+from pbk2mobileconfig.index import SectionIndex
+from pbk2mobileconfig.parser import PBKParser, PhonebookWarning
 
 
 def test_parse_basic_pbk(tmp_path):
@@ -60,3 +61,125 @@ def test_get_vpn_type_name():
     assert parser.get_vpn_type_name("2") == "PPTP"
     assert parser.get_vpn_type_name("10") == "IKEv2"
     assert parser.get_vpn_type_name("999") == "Unknown"
+
+
+def test_iter_entries_multiple_sections(tmp_path):
+    """Test streaming several entries with their own phone numbers."""
+    pbk_content = """[Corp VPN]
+Type=2
+IpDnsAddress=10.0.0.1
+NETCOMPONENTS=
+ms_msclient=1
+
+DEVICE=vpn
+PhoneNumber=vpn1.example.com
+
+[Settings]
+Encoding=1
+
+[Branch VPN]
+Type=4
+PhoneNumber=vpn2.example.com
+PreSharedKey = secret
+"""
+    pbk_file = tmp_path / "multi.pbk"
+    pbk_file.write_text(pbk_content)
+
+    parser = PBKParser(str(pbk_file))
+    entries = parser.iter_entries()
+    first = next(entries)
+    assert first["Name"] == "Corp VPN"
+    assert first["PhoneNumber"] == "vpn1.example.com"
+    assert first["ms_msclient"] == "1"
+
+    rest = list(entries)
+    assert [entry["Name"] for entry in rest] == ["Branch VPN"]
+    assert rest[0]["PhoneNumber"] == "vpn2.example.com"
+    assert rest[0]["SharedSecret"] == "secret"
+    assert parser.parse() == [first] + rest
+
+
+def test_parse_invalid_line(tmp_path):
+    """Test that malformed lines are reported as ValueError."""
+    pbk_file = tmp_path / "broken.pbk"
+    pbk_file.write_text("[Test VPN]\nType=4\nthis is not an option\n")
+
+    with pytest.raises(ValueError, match="line 3"):
+        PBKParser(str(pbk_file)).parse()
+
+
+def test_repeated_sections_are_merged(tmp_path):
+    """Test that a section repeated later keeps all its options."""
+    content = """[Corp]
+Type=4
+PhoneNumber=corp.example.com
+
+[Branch]
+Type=4
+PhoneNumber=branch.example.com
+
+[Corp]
+IpDnsAddress=10.0.0.1
+PhoneNumber=vpn.example.com
+"""
+    pbk_file = tmp_path / "repeated.pbk"
+    pbk_file.write_text(content)
+    parser = PBKParser(str(pbk_file))
+
+    entries = parser.parse()
+    assert [entry["Name"] for entry in entries] == ["Corp", "Branch"]
+    assert entries[0]["IpDnsAddress"] == "10.0.0.1"
+    assert entries[0]["PhoneNumber"] == "vpn.example.com"
+    assert parser.get_entry("Corp") == entries[0]
+    assert PBKParser.from_text(content).parse() == entries
+
+
+def test_parse_reads_once_without_repeated_sections(tmp_path, monkeypatch):
+    """Test that the byte-offset index is only used for repeated sections."""
+    pbk_file = tmp_path / "test.pbk"
+    pbk_file.write_text("[First]\nType=4\n\n[Second]\nType=4\n")
+
+    def fail(path):
+        raise AssertionError("index built")
+
+    monkeypatch.setattr(SectionIndex, "for_file", fail)
+    assert [entry.name for entry in PBKParser(str(pbk_file)).parse()] == [
+        "First",
+        "Second",
+    ]
+
+
+def test_late_default_section(tmp_path):
+    """Test that a [DEFAULT] section applies to entries before it."""
+    content = """[First]
+Type=4
+
+[DEFAULT]
+PhoneNumber=def.example.com
+
+[Second]
+Type=4
+"""
+    pbk_file = tmp_path / "default.pbk"
+    pbk_file.write_text(content)
+    parser = PBKParser(str(pbk_file))
+
+    entries = parser.parse()
+    assert [entry["PhoneNumber"] for entry in entries] == ["def.example.com"] * 2
+    assert PBKParser.from_text(content).parse() == entries
+    assert parser.get_entry("First") == entries[0]
+
+    # A stream cannot go back to entries it has yielded
+    with pytest.warns(PhonebookWarning, match=r"\[DEFAULT\] section follows"):
+        streamed = list(parser.iter_entries())
+    assert [entry["PhoneNumber"] for entry in streamed] == ["", "def.example.com"]
+
+
+def test_iter_entries_warns_about_repeated_sections(tmp_path):
+    """Test that a stream reports sections it cannot merge."""
+    pbk_file = tmp_path / "repeated.pbk"
+    pbk_file.write_text("[Corp]\nType=4\n[Branch]\nType=4\n[Corp]\nDevice=x\n")
+
+    with pytest.warns(PhonebookWarning, match="'Corp' is repeated"):
+        entries = list(PBKParser(str(pbk_file)).iter_entries())
+    assert [entry.name for entry in entries] == ["Corp", "Branch"]
@@ -0,0 +1,53 @@
+"""
+Tests for the streaming plist writer module.
+"""
+import io
+import plistlib
+import pytest
+from pbk2mobileconfig.converter import VPNProfileConverter
+from pbk2mobileconfig.plistwriter import dump_profile
+
+VPN_CONFIGS = [
+    {"Name": "L2TP VPN", "Type": "4", "PhoneNumber": "l2tp.example.com"},
+    {"Name": "PPTP VPN", "Type": "2", "IpDnsAddress": "10.0.0.1"},
+    {"Name": "IKEv2 <&> VPN", "Type": "10", "IpDnsSuffix": "example.com"},
+]
+
+
+@pytest.mark.parametrize("fmt", [plistlib.FMT_XML, plistlib.FMT_BINARY])
+def test_output_matches_plistlib(fmt):
+    """Test that streamed output is byte-identical to plistlib."""
+    converter = VPNProfileConverter()
+    payloads = [converter.convert_vpn_config(config) for config in VPN_CONFIGS]
+    profile = converter.build_profile(payloads)
+
+    streamed = io.BytesIO()
+    dump_profile(converter.build_profile(iter(payloads)), streamed, fmt)
+    # Same root UUID for both profiles
+    profile["PayloadUUID"] = plistlib.loads(streamed.getvalue())["PayloadUUID"]
+
+    assert streamed.getvalue() == plistlib.dumps(profile, fmt=fmt)
+
+
+def test_empty_stream_matches_plistlib():
+    """Test that an empty iterator is written like an empty list."""
+    streamed = io.BytesIO()
+    dump_profile({"PayloadContent": iter([])}, streamed)
+    assert streamed.getvalue() == plistlib.dumps({"PayloadContent": []})
+
+
+def test_payloads_written_while_consumed():
+    """Test that each payload is written before the next one is produced."""
+    converter = VPNProfileConverter()
+    output = io.BytesIO()
+    sizes = []
+
+    def payloads():
+        for config in VPN_CONFIGS:
+            sizes.append(output.tell())
+            yield converter.convert_vpn_config(config)
+
+    dump_profile(converter.build_profile(payloads()), output)
+
+    assert sizes[0] < sizes[1] < sizes[2]
+    assert len(plistlib.loads(output.getvalue())["PayloadContent"]) == 3
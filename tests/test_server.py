@@ -0,0 +1,199 @@
+"""
+Tests for the HTTP conversion service.
+"""
+import time
+import asyncio
+import plistlib
+from concurrent.futures import ThreadPoolExecutor
+from pbk2mobileconfig import server as server_module
+from pbk2mobileconfig.server import ConversionServer
+
+PBK_CONTENT = b"""[Office VPN]
+Type=4
+PhoneNumber=vpn.example.com
+PreSharedKey=secret
+"""
+
+
+async def _request(reader, writer, method, target, body=b"", headers=None):
+    """Send one request and read the response on an open connection."""
+    lines = [f"{method} {target} HTTP/1.1", "Host: localhost"]
+    lines.append(f"Content-Length: {len(body)}")
+    lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+    await writer.drain()
+
+    head = await reader.readuntil(b"\r\n\r\n")
+    status_line, *header_lines = head.decode().split("\r\n")
+    response_headers = {}
+    for line in header_lines:
+        if line:
+            name, _, value = line.partition(":")
+            response_headers[name.lower()] = value.strip()
+    data = await reader.readexactly(int(response_headers["content-length"]))
+    return int(status_line.split()[1]), response_headers, data
+
+
+def _run(test, executor=None, **settings):
+    """Run a test coroutine against a server on a free localhost port."""
+
+    async def main():
+        async with ConversionServer(
+            port=0, executor=executor or ThreadPoolExecutor(2), **settings
+        ) as server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            try:
+                return await test(reader, writer, server)
+            finally:
+                writer.close()
+
+    return asyncio.run(main())
+
+
+def test_convert_with_keep_alive():
+    """Test several conversions over one kept-alive connection."""
+
+    async def test(reader, writer, server):
+        responses = []
+        for query in ("", "?org=Acme&format=binary&deterministic_uuids=1"):
+            responses.append(
+                await _request(reader, writer, "POST", "/convert" + query, PBK_CONTENT)
+            )
+        return responses
+
+    (status, headers, data), (status2, headers2, data2) = _run(test)
+    assert status == 200 and status2 == 200
+    assert headers["connection"] == "keep-alive"
+    assert headers["x-vpn-entries"] == "1"
+    assert plistlib.loads(data)["PayloadContent"][0]["VPNType"] == "L2TP"
+    assert data2.startswith(b"bplist00")
+    assert plistlib.loads(data2)["PayloadOrganization"] == "Acme"
+
+
+def test_convert_errors():
+    """Test error statuses for bad requests and failed conversions."""
+
+    async def test(reader, writer, server):
+        statuses = []
+        for target, body in (
+            ("/convert?entry=Missing", PBK_CONTENT),
+            ("/convert", b"[Notes]\nText=1\n"),
+            ("/convert?format=json", PBK_CONTENT),
+        ):
+            # Each error closes the connection, so reconnect every time
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            status, _, _ = await _request(reader, writer, "POST", target, body)
+            statuses.append(status)
+            writer.close()
+        return statuses
+
+    assert _run(test) == [422, 422, 400]
+
+
+def test_invalid_content_length():
+    """Test that a negative or non-integer Content-Length is rejected."""
+
+    async def test(reader, writer, server):
+        statuses = []
+        for length in ("-1", "abc", "+5", "1.5"):
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            writer.write(
+                f"POST /convert HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode()
+            )
+            statuses.append(int((await reader.readline()).split()[1]))
+            writer.close()
+        return statuses
+
+    assert _run(test) == [400] * 4
+
+
+def test_request_timeout(monkeypatch):
+    """Test that slow conversions are answered with 504."""
+
+    def slow_convert(*args, **options):
+        time.sleep(0.5)
+        return 1, b""
+
+    monkeypatch.setattr(server_module, "convert_pbk_counted", slow_convert)
+
+    async def test(reader, writer, server):
+        return await _request(reader, writer, "POST", "/convert", PBK_CONTENT)
+
+    status, _, _ = _run(test, request_timeout=0.1)
+    assert status == 504
+
+
+def test_concurrency_limit(monkeypatch):
+    """Test that no more than max_concurrency conversions run at once."""
+    running = []
+    peak = []
+
+    def tracked_convert(*args, **options):
+        running.append(1)
+        peak.append(len(running))
+        time.sleep(0.05)
+        running.pop()
+        return 1, b"profile"
+
+    monkeypatch.setattr(server_module, "convert_pbk_counted", tracked_convert)
+
+    async def test(reader, writer, server):
+        async def one():
+            r, w = await asyncio.open_connection("127.0.0.1", server.port)
+            try:
+                return (await _request(r, w, "POST", "/convert", PBK_CONTENT))[0]
+            finally:
+                w.close()
+
+        return await asyncio.gather(*(one() for _ in range(6)))
+
+    statuses = _run(test, executor=ThreadPoolExecutor(6), max_concurrency=2)
+    assert statuses == [200] * 6
+    assert max(peak) <= 2
+
+
+def test_timed_out_conversions_hold_their_slot(monkeypatch):
+    """Test that a timed out conversion still counts against the limit."""
+    running = []
+    peak = []
+
+    def slow_convert(*args, **options):
+        running.append(1)
+        peak.append(len(running))
+        time.sleep(0.3)
+        running.pop()
+        return 1, b"profile"
+
+    monkeypatch.setattr(server_module, "convert_pbk_counted", slow_convert)
+
+    async def test(reader, writer, server):
+        statuses = []
+        for _ in range(2):
+            r, w = await asyncio.open_connection("127.0.0.1", server.port)
+            statuses.append((await _request(r, w, "POST", "/convert", PBK_CONTENT))[0])
+            w.close()
+        # Let the first conversion finish before the server shuts down
+        await asyncio.sleep(0.4)
+        return statuses
+
+    statuses = _run(
+        test, executor=ThreadPoolExecutor(4), max_concurrency=1, request_timeout=0.1
+    )
+    assert statuses == [504, 504]
+    assert peak == [1]
+
+
+def test_process_pool_and_health():
+    """Test the default process pool executor and the health endpoint."""
+
+    async def main():
+        async with ConversionServer(port=0, workers=1) as server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            health = await _request(reader, writer, "GET", "/health")
+            converted = await _request(reader, writer, "POST", "/convert", PBK_CONTENT)
+            writer.close()
+            return health, converted
+
+    health, converted = asyncio.run(main())
+    assert health[0] == 200
+    assert converted[0] == 200
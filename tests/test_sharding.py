@@ -0,0 +1,115 @@
+"""
+Tests for splitting phonebooks into several profiles.
+"""
+import json
+import plistlib
+import pytest
+from pbk2mobileconfig.cli import main
+from pbk2mobileconfig.parser import PBKParser
+from pbk2mobileconfig.sharding import MANIFEST_NAME, plan_per_entry, write_shards
+
+OPTIONS = {"identifier": "com.example.vpn", "deterministic_uuids": True}
+
+
+def _phonebook(tmp_path, count):
+    """Write a phonebook with ``count`` entries and return its parsed entries."""
+    pbk = tmp_path / "fleet.pbk"
+    pbk.write_text(
+        "".join(
+            f"[VPN {number}]\nType=4\nPhoneNumber=vpn{number}.example.com\n\n"
+            for number in range(count)
+        )
+    )
+    return pbk, PBKParser(str(pbk)).parse()
+
+
+def _load(path):
+    with open(path, "rb") as f:
+        return plistlib.load(f)
+
+
+def test_per_entry_profiles(tmp_path):
+    """Test one profile per entry with its own identifier and UUID."""
+    _, entries = _phonebook(tmp_path, 3)
+    results = write_shards(entries, str(tmp_path), OPTIONS, per_entry=True, workers=1)
+
+    profiles = [_load(result.path) for result in results]
+    assert [result.entries for result in results] == [["VPN 0"], ["VPN 1"], ["VPN 2"]]
+    assert [profile["PayloadDisplayName"] for profile in profiles] == [
+        "VPN 0",
+        "VPN 1",
+        "VPN 2",
+    ]
+    assert profiles[0]["PayloadIdentifier"] == "com.example.vpn.VPN-0"
+    assert len({profile["PayloadUUID"] for profile in profiles}) == 3
+
+
+def test_per_entry_names_are_unique():
+    """Test that entries with the same slug get distinct names."""
+    parser = PBKParser.from_text("[a b]\nType=1\n\n[a/b]\nType=1\n\n[*]\nType=1\n")
+    shards = plan_per_entry(parser.parse())
+    assert [shard.suffix for shard in shards] == ["a-b", "a-b-2", "entry"]
+
+
+def test_max_entries_and_manifest(tmp_path):
+    """Test shards by entry count and the manifest describing them."""
+    _, entries = _phonebook(tmp_path, 5)
+    results = write_shards(
+        entries, str(tmp_path), OPTIONS, max_entries=2, stem="fleet", workers=2
+    )
+
+    assert [len(result.entries) for result in results] == [2, 2, 1]
+    with open(tmp_path / MANIFEST_NAME) as f:
+        manifest = json.load(f)
+    assert [profile["file"] for profile in manifest["profiles"]] == [
+        "fleet-part001.mobileconfig",
+        "fleet-part002.mobileconfig",
+        "fleet-part003.mobileconfig",
+    ]
+    assert manifest["entries"]["VPN 4"] == "fleet-part003.mobileconfig"
+    assert manifest["profiles"][1]["identifier"] == "com.example.vpn.part002"
+
+
+@pytest.mark.parametrize("fmt", [plistlib.FMT_XML, plistlib.FMT_BINARY])
+def test_max_bytes(tmp_path, fmt):
+    """Test that shards by size stay within the limit and keep all entries."""
+    _, entries = _phonebook(tmp_path, 40)
+    results = write_shards(
+        entries, str(tmp_path), OPTIONS, fmt, max_bytes=8000, workers=1
+    )
+
+    assert len(results) > 1
+    names = []
+    for result in results:
+        assert result.size <= 8000
+        profile = _load(result.path)
+        content = profile["PayloadContent"]
+        names.extend(payload["PayloadDisplayName"] for payload in content)
+    assert names == [entry.name for entry in entries]
+
+
+def test_max_bytes_binary_fills_shards(tmp_path):
+    """Test that binary shards are filled close to the limit, not far below."""
+    _, entries = _phonebook(tmp_path, 200)
+    results = write_shards(
+        entries, str(tmp_path), OPTIONS, plistlib.FMT_BINARY, max_bytes=20000
+    )
+
+    sizes = [result.size for result in results]
+    assert max(sizes) <= 20000
+    assert max(sizes) > 15000
+    assert sum(len(result.entries) for result in results) == len(entries)
+    names = [name for result in results for name in result.entries]
+    assert names == [entry.name for entry in entries]
+
+
+def test_cli_max_bytes(tmp_path, capsys):
+    """Test splitting from the command line."""
+    pbk, _ = _phonebook(tmp_path, 10)
+    output = tmp_path / "out"
+
+    assert main([str(pbk), str(output), "--max-bytes", "4K", "-j", "1"]) == 0
+    assert "into" in capsys.readouterr().out
+    files = sorted(path.name for path in output.iterdir())
+    assert files[0] == "fleet-part001.mobileconfig"
+    assert MANIFEST_NAME in files
@@ -0,0 +1,144 @@
+"""
+Tests for the sidecar files module.
+"""
+import os
+import pytest
+from pbk2mobileconfig import encoding, sidecars
+from pbk2mobileconfig.parser import PBKParser
+from pbk2mobileconfig.sidecars import (
+    SidecarFile,
+    Sidecars,
+    SidecarWarning,
+    find_sidecars,
+)
+
+CMS_CONTENT = """[Connection Manager]
+Version=1
+
+[Test VPN]
+Dialup=0
+TunnelAddress = vpn.example.com
+
+[Other VPN]
+Dialup=1
+"""
+
+
+def test_sidecar_file_sections():
+    """Test the section-indexed sidecar API."""
+    cms = SidecarFile(".cms", CMS_CONTENT)
+
+    assert cms.sections() == ["Connection Manager", "Test VPN", "Other VPN"]
+    assert cms.has_section("Test VPN")
+    assert cms.section("Test VPN") == {
+        "dialup": "0",
+        "tunneladdress": "vpn.example.com",
+    }
+    assert cms.get("Other VPN", "Dialup") == "1"
+    assert cms.get("Missing", "Dialup", fallback="x") == "x"
+    assert cms.section("Missing") == {}
+
+
+def test_sidecar_file_malformed():
+    """Test that a malformed sidecar contributes no settings."""
+    cms = SidecarFile(".cms", "[Test VPN]\nnot an option\n")
+    with pytest.warns(SidecarWarning, match="malformed") as record:
+        assert cms.sections() == []
+    assert record[0].filename == __file__
+
+
+def test_malformed_sidecar_in_memory_is_named():
+    """Test that sidecars given as text are reported under the phonebook name."""
+    parser = PBKParser.from_text(
+        "[Test VPN]\nType=4\n", {".cms": "[Test VPN]\nnot an option\n"}
+    )
+    with pytest.warns(SidecarWarning, match=r"sidecar <memory>\.cms:"):
+        parser.parse()
+
+
+def test_sidecars_by_type():
+    """Test typed access to sidecars by extension."""
+    sidecars = Sidecars.from_contents({".cms": CMS_CONTENT})
+    assert sidecars.cms is not None
+    assert sidecars.cmp is None
+    assert ".cms" in sidecars
+    assert len(sidecars) == 1
+
+
+def test_parser_shares_parsed_cms(tmp_path, monkeypatch):
+    """Test that the .cms file is tokenized once for all entries."""
+    (tmp_path / "profile.pbk").write_text(
+        "[Test VPN]\nType=4\n\n[Other VPN]\nType=4\n"
+    )
+    (tmp_path / "profile.cms").write_text(CMS_CONTENT)
+
+    calls = []
+    original = SidecarFile._index
+
+    def counting_index(self):
+        if self._sections is None:
+            calls.append(self.extension)
+        return original(self)
+
+    monkeypatch.setattr(SidecarFile, "_index", counting_index)
+
+    parser = PBKParser(str(tmp_path / "profile.pbk"))
+    configs = parser.parse()
+
+    assert configs[0]["AdditionalSettings"]["tunneladdress"] == "vpn.example.com"
+    assert configs[1]["AdditionalSettings"] == {"dialup": "1"}
+    assert calls == [".cms"]
+    assert parser.sidecars.cms.has_section("Connection Manager")
+
+
+def _old(*paths):
+    """Date files back so that their listings and contents may be cached."""
+    for path in paths:
+        os.utime(path, (1_000_000_000, 1_000_000_000))
+
+
+def test_sidecars_found_with_one_listing_and_shared(tmp_path, monkeypatch):
+    """Test discovery by a cached listing and sharing between parsers."""
+    sidecars.clear_cache()
+    (tmp_path / "corp.pbk").write_text("[Test VPN]\nType=4\n")
+    (tmp_path / "Corp.CMS").write_text(CMS_CONTENT)
+    (tmp_path / "corp.inf").write_text("[Version]\n")
+    _old(tmp_path / "Corp.CMS", tmp_path)
+
+    listings = []
+    scandir = os.scandir
+    monkeypatch.setattr(
+        os, "scandir", lambda path: listings.append(path) or scandir(path)
+    )
+
+    pbk = str(tmp_path / "corp.pbk")
+    assert find_sidecars(pbk) == {
+        ".cms": str(tmp_path / "Corp.CMS"),
+        ".inf": str(tmp_path / "corp.inf"),
+    }
+    first, second = PBKParser(pbk), PBKParser(pbk)
+    assert first.parse()[0]["AdditionalSettings"]["dialup"] == "0"
+    assert second.parse() and second.sidecars.cms is first.sidecars.cms
+    assert len(listings) == 1
+
+
+def test_sidecars_load_lazily_and_warn(tmp_path, monkeypatch):
+    """Test that only accessed sidecars are read and failures are reported."""
+    (tmp_path / "corp.pbk").write_text("[Test VPN]\nType=4\n")
+    (tmp_path / "corp.cms").write_text(CMS_CONTENT)
+    (tmp_path / "corp.cmp").write_text("[Connection Manager]\n")
+
+    read = []
+
+    def failing_read_text(path, attempts=None):
+        read.append(os.path.basename(path))
+        raise OSError("device not ready")
+
+    monkeypatch.setattr(encoding, "read_text", failing_read_text)
+    parser = PBKParser(str(tmp_path / "corp.pbk"))
+    with pytest.warns(SidecarWarning, match="corp.cms: device not ready"):
+        entries = parser.parse()
+
+    assert entries[0]["AdditionalSettings"] == {}
+    assert read == ["corp.cms"]
+    assert ".cmp" in parser.sidecars
@@ -0,0 +1,86 @@
+"""
+Startup-time regression tests based on ``python -X importtime``.
+"""
+import os
+import sys
+import subprocess
+from pbk2mobileconfig import __version__
+
+# Modules only needed once a conversion actually runs
+LAZY_MODULES = (
+    "chardet",
+    "plistlib",
+    "asyncio",
+    "pbk2mobileconfig.parser",
+    "pbk2mobileconfig.converter",
+    "pbk2mobileconfig.batch",
+)
+
+# Budget for the import time of the package's own modules, in microseconds
+IMPORT_BUDGET_US = 30000
+
+RUNS = 3
+
+
+def _importtime(*args):
+    """Run Python with -X importtime; return stdout and {module: (self, total)}."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, total, name = line[len("import time:") :].split("|")
+        modules[name.strip()] = (int(own), int(total))
+    return result.stdout, modules
+
+
+def test_cli_import_is_lazy():
+    """Test that importing the CLI loads no conversion machinery."""
+    _, modules = _importtime("-c", "import pbk2mobileconfig.cli")
+    assert "pbk2mobileconfig.cli" in modules
+    assert [name for name in LAZY_MODULES if name in modules] == []
+
+
+def test_cli_import_within_budget():
+    """Test the import time of the package's modules against a budget."""
+    timings = []
+    for _ in range(RUNS):
+        _, modules = _importtime("-c", "import pbk2mobileconfig.cli")
+        timings.append(
+            sum(
+                own
+                for name, (own, _) in modules.items()
+                if name.startswith("pbk2mobileconfig")
+            )
+        )
+    best = min(timings)
+    assert best < IMPORT_BUDGET_US
+
+
+def test_version_skips_argparse():
+    """Test that --version returns before building any argument parser."""
+    stdout, modules = _importtime("-m", "pbk2mobileconfig.cli", "--version")
+    assert stdout.strip() == f"pbk2mobileconfig {__version__}"
+    assert "argparse" not in modules
+    assert [name for name in LAZY_MODULES if name in modules] == []
+
+
+def test_api_import_skips_batch_machinery():
+    """Test that the in-memory API loads no batch or process pool modules."""
+    _, modules = _importtime("-c", "import pbk2mobileconfig.api")
+    assert "pbk2mobileconfig.api" in modules
+    heavy = (
+        "pbk2mobileconfig.batch",
+        "pbk2mobileconfig.archive",
+        "pbk2mobileconfig.cache",
+        "pbk2mobileconfig.tenants",
+        "concurrent.futures.process",
+    )
+    assert [name for name in heavy if name in modules] == []
@@ -0,0 +1,158 @@
+"""
+Tests for the per-stage instrumentation.
+"""
+import json
+import time
+import tracemalloc
+import pytest
+from pbk2mobileconfig import encoding, index
+from pbk2mobileconfig.batch import convert_file
+from pbk2mobileconfig.cache import ConversionCache
+from pbk2mobileconfig.cli import main
+from pbk2mobileconfig.converter import VPNProfileConverter
+from pbk2mobileconfig.parser import PBKParser
+from pbk2mobileconfig.stats import Instrumentation
+
+PBK_CONTENT = """[Office VPN]
+Type=4
+PhoneNumber=vpn.example.com
+
+[Home VPN]
+Type=1
+PhoneNumber=home.example.com
+"""
+
+
+def test_nested_stages_are_exclusive():
+    """Test that time spent in an inner stage is not charged to the outer."""
+    instrumentation = Instrumentation()
+
+    def slow_items():
+        for item in range(3):
+            time.sleep(0.02)
+            yield item
+
+    with instrumentation.stage("dump"):
+        assert list(instrumentation.iterate("parse", slow_items())) == [0, 1, 2]
+
+    stages = instrumentation.stages
+    assert stages["parse"].entries == 3
+    assert stages["parse"].seconds >= 0.06
+    assert stages["dump"].seconds < 0.02
+
+
+@pytest.mark.parametrize("reset_peak", [True, False])
+def test_trace_memory(monkeypatch, reset_peak):
+    """Test peak memory per stage, also without tracemalloc.reset_peak()."""
+    if not reset_peak and hasattr(tracemalloc, "reset_peak"):
+        monkeypatch.delattr(tracemalloc, "reset_peak")
+    instrumentation = Instrumentation(trace_memory=True)
+    try:
+        with instrumentation.stage("parse"):
+            data = bytearray(1024 * 1024)
+            del data
+        with instrumentation.stage("dump"):
+            pass
+    finally:
+        instrumentation.close()
+
+    assert not tracemalloc.is_tracing()
+    assert instrumentation.stages["parse"].peak_bytes >= 1024 * 1024
+    assert instrumentation.stages["dump"].peak_bytes < 1024 * 1024
+
+
+def test_hooks_called_per_completed_stage(tmp_path):
+    """Test hooks and counters for a parse with a sidecar."""
+    pbk = tmp_path / "office.pbk"
+    pbk.write_text(PBK_CONTENT)
+    (tmp_path / "office.cms").write_text("[Office VPN]\nDialup=0\n")
+
+    completed = []
+    instrumentation = Instrumentation(hooks=[lambda s: completed.append(s.name)])
+    entries = PBKParser(str(pbk), instrumentation).parse()
+
+    assert len(entries) == 2
+    assert completed == ["sidecars", "parse"]
+    parse = instrumentation.stages["parse"]
+    assert parse.entries == 2
+    assert parse.bytes_read == pbk.stat().st_size
+    assert parse.encoding_attempts >= 1
+    assert instrumentation.stages["sidecars"].bytes_read > 0
+
+
+def test_get_entry_records_bytes_read(tmp_path):
+    """Test that a lookup counts the index scan and the sections it reads."""
+    pbk = tmp_path / "office.pbk"
+    pbk.write_text(PBK_CONTENT)
+    encoding.clear_cache()
+    index.clear_cache()
+
+    instrumentation = Instrumentation()
+    parser = PBKParser(str(pbk), instrumentation)
+    assert parser.get_entry("Home VPN") is not None
+    parse = instrumentation.stages["parse"]
+    section = len(PBK_CONTENT) - PBK_CONTENT.index("[Home VPN]")
+    assert parse.bytes_read == pbk.stat().st_size + section
+    assert parse.encoding_attempts >= 1
+
+    # The cached index is not scanned again
+    instrumentation = Instrumentation()
+    PBKParser(str(pbk), instrumentation).get_entry("Home VPN")
+    assert instrumentation.stages["parse"].bytes_read == section
+    assert instrumentation.stages["parse"].encoding_attempts == 0
+
+
+def test_cache_miss_records_hashed_inputs(tmp_path):
+    """Test that the cache stage counts the inputs it hashes."""
+    pbk = tmp_path / "office.pbk"
+    pbk.write_text(PBK_CONTENT)
+    cms = tmp_path / "office.cms"
+    cms.write_text("[Office VPN]\nDialup=0\n")
+    output = tmp_path / "office.mobileconfig"
+    cache = ConversionCache(str(tmp_path / "cache"))
+    inputs = pbk.stat().st_size + cms.stat().st_size
+
+    converter = VPNProfileConverter(deterministic_uuids=True)
+    instrumentation = Instrumentation()
+    convert_file(
+        str(pbk), str(output), converter, cache=cache, instrumentation=instrumentation
+    )
+    assert instrumentation.stages["cache"].bytes_read == inputs
+
+    instrumentation = Instrumentation()
+    convert_file(
+        str(pbk), str(output), converter, cache=cache, instrumentation=instrumentation
+    )
+    cached = instrumentation.stages["cache"]
+    assert cached.bytes_read == inputs + output.stat().st_size
+    assert cached.entries == 2
+
+
+def test_convert_file_records_all_stages(tmp_path):
+    """Test that a streamed conversion records every stage."""
+    pbk = tmp_path / "office.pbk"
+    pbk.write_text(PBK_CONTENT)
+    output = tmp_path / "office.mobileconfig"
+
+    instrumentation = Instrumentation(trace_memory=True)
+    converter = VPNProfileConverter(instrumentation=instrumentation)
+    convert_file(str(pbk), str(output), converter, instrumentation=instrumentation)
+    instrumentation.close()
+
+    stages = instrumentation.as_dict()
+    assert list(stages) == ["sidecars", "parse", "convert", "dump"]
+    assert stages["convert"]["entries"] == 2
+    assert stages["dump"]["bytes_written"] == output.stat().st_size
+    assert all(stats["peak_bytes"] for stats in stages.values())
+
+
+def test_cli_stats_json(tmp_path, capsys):
+    """Test the --stats json output."""
+    pbk = tmp_path / "office.pbk"
+    pbk.write_text(PBK_CONTENT)
+    output = tmp_path / "office.mobileconfig"
+
+    assert main([str(pbk), str(output), "--stats", "json"]) == 0
+    stats = json.loads(capsys.readouterr().err)
+    assert stats["stages"]["parse"]["entries"] == 2
+    assert stats["stages"]["dump"]["peak_bytes"] is None
@@ -0,0 +1,105 @@
+"""
+Tests for rendering one phonebook for many tenants.
+"""
+import json
+import plistlib
+import pytest
+from pbk2mobileconfig import convert_pbk_for_tenants
+from pbk2mobileconfig.cli import main
+from pbk2mobileconfig.converter import VPNProfileConverter
+from pbk2mobileconfig.parser import PBKParser
+from pbk2mobileconfig.tenants import PayloadPrototypes, fan_out, parse_tenants
+
+PBK_CONTENT = """[Office VPN]
+Type=4
+PhoneNumber=vpn.example.com
+PreSharedKey=secret
+
+[Home VPN]
+Type=1
+PhoneNumber=home.example.com
+
+[Cloud VPN]
+Type=2
+PhoneNumber=cloud.example.com
+"""
+
+TENANTS = [
+    {"name": "acme", "organization": "Acme", "identifier": "com.acme.vpn"},
+    {"name": "globex", "organization": "Globex", "identifier": "com.globex.vpn"},
+    {"name": "initech", "removable": False},
+]
+
+
+def _entries():
+    return PBKParser.from_text(PBK_CONTENT).parse()
+
+
+def test_prototypes_render_like_converter():
+    """Test that a rendered profile equals a full conversion."""
+    prototypes = PayloadPrototypes.from_entries(_entries())
+    for options in TENANTS[:2]:
+        converter = VPNProfileConverter(
+            organization=options["organization"],
+            identifier=options["identifier"],
+            deterministic_uuids=True,
+        )
+        expected = converter.generate_mobileconfig(_entries())
+        assert plistlib.dumps(prototypes.render(converter)) == plistlib.dumps(
+            expected
+        )
+
+
+def test_fan_out_writes_profile_per_tenant(tmp_path):
+    """Test profiles of several tenants rendered on worker processes."""
+    prototypes = PayloadPrototypes.from_entries(_entries())
+    results = list(
+        fan_out(prototypes, parse_tenants(TENANTS), str(tmp_path), workers=2)
+    )
+
+    assert [result.name for result in results] == ["acme", "globex", "initech"]
+    assert all(result.ok and result.entries == 3 for result in results)
+    with open(tmp_path / "globex.mobileconfig", "rb") as f:
+        profile = plistlib.load(f)
+    assert profile["PayloadIdentifier"] == "com.globex.vpn"
+    payload = profile["PayloadContent"][0]
+    assert payload["PayloadOrganization"] == "Globex"
+    assert payload["PayloadIdentifier"].startswith("com.globex.vpn.Office VPN.")
+    with open(tmp_path / "initech.mobileconfig", "rb") as f:
+        assert plistlib.load(f)["PayloadRemovalDisallowed"] is True
+
+
+@pytest.mark.parametrize(
+    "tenants, message",
+    [
+        ([{"organization": "Acme"}], "without name"),
+        ([{"name": "../acme"}], "Invalid tenant name"),
+        ([{"name": "acme"}, {"name": "acme"}], "Duplicate"),
+        ([{"name": "acme", "colour": "red"}], "Unknown options"),
+    ],
+)
+def test_parse_tenants_rejects_invalid(tenants, message):
+    """Test validation of tenant definitions."""
+    with pytest.raises(ValueError, match=message):
+        parse_tenants(tenants)
+
+
+def test_api_and_cli(tmp_path, capsys):
+    """Test the API function and the --tenants option."""
+    pbk = tmp_path / "corp.pbk"
+    pbk.write_text(PBK_CONTENT)
+    results = convert_pbk_for_tenants(
+        str(pbk), TENANTS, str(tmp_path / "api"), workers=1
+    )
+    assert [result.ok for result in results] == [True, True, True]
+
+    manifest = tmp_path / "tenants.json"
+    manifest.write_text(json.dumps(TENANTS))
+    output = tmp_path / "cli"
+    assert main([str(pbk), str(output), "--tenants", str(manifest), "-j", "1"]) == 0
+    assert "for 3 of 3 tenant(s)" in capsys.readouterr().out
+    assert sorted(path.name for path in output.iterdir()) == [
+        "acme.mobileconfig",
+        "globex.mobileconfig",
+        "initech.mobileconfig",
+    ]
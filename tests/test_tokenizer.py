@@ -0,0 +1,66 @@
+"""
+Tests for the INI tokenizer module.
+"""
+import configparser
+import pytest
+from pbk2mobileconfig.tokenizer import iter_sections
+
+
+def test_iter_sections_basic():
+    """Test sections, defaults, comments and repeated options."""
+    lines = [
+        "Encoding=1",
+        "# comment",
+        "[First]",
+        "Type = 4",
+        "; comment",
+        "Device=modem",
+        "",
+        "DEVICE=vpn",
+        "[Second]",
+        "Name: value",
+    ]
+
+    assert list(iter_sections(lines)) == [
+        ("DEFAULT", {"encoding": "1"}),
+        ("First", {"type": "4", "device": "vpn"}),
+        ("Second", {"name": "value"}),
+    ]
+
+
+def test_iter_sections_continuation():
+    """Test that indented lines continue the previous value."""
+    lines = ["[First]", "Routes=10.0.0.0", "  10.1.0.0", "Type=4"]
+
+    assert list(iter_sections(lines)) == [
+        ("First", {"routes": "10.0.0.0\n10.1.0.0", "type": "4"}),
+    ]
+
+
+def test_iter_sections_continuation_after_blank_lines():
+    """Test that blank lines inside a value are kept like ConfigParser."""
+    text = "[First]\nNote=first\n\n  second\n\n\n  third\nType=4\n\nName=x\n"
+    expected = {"note": "first\n\nsecond\n\n\nthird", "type": "4", "name": "x"}
+
+    assert list(iter_sections(text.splitlines())) == [("First", expected)]
+    parser = configparser.ConfigParser(strict=False, interpolation=None)
+    parser.read_string(text)
+    assert dict(parser["First"]) == expected
+
+
+def test_iter_sections_is_lazy():
+    """Test that a section is yielded before the rest is read."""
+
+    def lines():
+        yield "[First]"
+        yield "Type=4"
+        yield "[Second]"
+        raise AssertionError("read too far")
+
+    assert next(iter_sections(lines())) == ("First", {"type": "4"})
+
+
+def test_iter_sections_invalid_line():
+    """Test that lines without a delimiter are rejected."""
+    with pytest.raises(ValueError):
+        list(iter_sections(["[First]", "garbage"]))
@@ -0,0 +1,114 @@
+"""
+Tests for validating generated payloads.
+"""
+import os
+import plistlib
+import pytest
+from pbk2mobileconfig.api import convert_pbk
+from pbk2mobileconfig.batch import plan_jobs, run_batch
+from pbk2mobileconfig.cli import main
+from pbk2mobileconfig.converter import VPNProfileConverter
+from pbk2mobileconfig.validation import (
+    ValidationError,
+    Validator,
+    validate_payload,
+    validate_profile,
+)
+
+VALID = """[L2TP VPN]
+Type=4
+PhoneNumber=l2tp.example.com
+
+[PPTP VPN]
+Type=1
+PhoneNumber=pptp.example.com
+
+[IKEv2 VPN]
+Type=10
+PhoneNumber=ikev2.example.com
+"""
+
+INVALID = VALID + """
+[No Address]
+Type=10
+"""
+
+
+def test_generated_payloads_are_valid():
+    """Test that converted entries of every VPN type pass validation."""
+    assert validate_profile(convert_pbk(VALID)) == []
+
+
+def test_issues_name_entry_and_key():
+    """Test that every problem is reported with entry and key path."""
+    payload = VPNProfileConverter().convert_vpn_config(
+        {"Name": "Corp", "Type": "1", "PhoneNumber": "vpn.example.com"}
+    )
+    payload["PPP"]["CCPEnabled"] = True
+    payload["DNS"] = {"ServerAddresses": ["10.0.0.1", 53]}
+    del payload["PayloadUUID"]
+
+    assert [str(issue) for issue in validate_payload(payload)] == [
+        "Corp: PayloadUUID: missing",
+        "Corp: DNS.ServerAddresses[1]: expected string, got integer",
+        "Corp: PPP.CCPEnabled: expected integer, got boolean",
+    ]
+    # An empty stub payload misses its type-specific settings
+    stub = {key: payload[key] for key in ("PayloadDisplayName", "VPNType")}
+    assert "Corp: PPP: missing" in map(str, validate_payload(stub))
+
+
+def test_strict_conversion_reports_all_issues():
+    """Test strict mode in the library and the streaming validator."""
+    with pytest.raises(ValidationError) as excinfo:
+        convert_pbk(INVALID, strict=True)
+    assert [str(issue) for issue in excinfo.value.issues] == [
+        "No Address: IKEv2.RemoteAddress: empty",
+        "No Address: IKEv2.RemoteIdentifier: empty",
+    ]
+
+    validator = Validator()
+    converter = VPNProfileConverter(validator=validator)
+    profile = converter.generate_mobileconfig(
+        [{"Name": "A", "Type": "4"}, {"Name": "B", "Type": "1"}]
+    )
+    assert len(profile["PayloadContent"]) == 2
+    assert [issue.entry for issue in validator.issues] == ["A", "A", "A", "B"]
+
+
+def test_cli_validate_and_strict(tmp_path, capsys):
+    """Test that --validate warns and --strict writes nothing."""
+    pbk = tmp_path / "corp.pbk"
+    pbk.write_text(INVALID)
+    output = tmp_path / "corp.mobileconfig"
+
+    assert main([str(pbk), str(output), "--validate"]) == 0
+    assert "Warning: No Address: IKEv2.RemoteAddress: empty" in capsys.readouterr().err
+    with open(output, "rb") as f:
+        assert len(plistlib.load(f)["PayloadContent"]) == 4
+
+    os.remove(output)
+    assert main([str(pbk), str(output), "--strict"]) == 1
+    captured = capsys.readouterr()
+    assert "Error: No Address: IKEv2.RemoteIdentifier: empty" in captured.err
+    assert "2 validation issue(s)" in captured.out
+    assert os.listdir(tmp_path) == ["corp.pbk"]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_batch_validation(tmp_path, workers):
+    """Test that batch results carry the issues of their own phonebook."""
+    for name, content in (("good", VALID), ("bad", INVALID)):
+        (tmp_path / f"{name}.pbk").write_text(content)
+    jobs = plan_jobs(
+        [str(tmp_path / "good.pbk"), str(tmp_path / "bad.pbk")],
+        str(tmp_path / "out"),
+    )
+
+    warned = list(run_batch(jobs, workers=workers, validate="warn"))
+    assert [result.ok for result in warned] == [True, True]
+    assert [len(result.issues) for result in warned] == [0, 2]
+
+    strict = list(run_batch(jobs, workers=workers, validate="strict"))
+    assert [result.ok for result in strict] == [True, False]
+    assert strict[1].issues == warned[1].issues
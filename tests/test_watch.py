@@ -0,0 +1,181 @@
+"""
+Tests for the watch mode module.
+"""
+import os
+import time
+import threading
+import pytest
+from pbk2mobileconfig.batch import ConversionPool
+from pbk2mobileconfig.watch import (
+    InotifyWatcher,
+    PollingWatcher,
+    affected_phonebooks,
+    watch,
+)
+
+PBK_CONTENT = """[Test VPN]
+Type=4
+PhoneNumber=vpn.example.com
+"""
+
+
+def _wait_for(condition, timeout=10.0):
+    """Wait until a condition holds or fail after timeout seconds."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return
+        time.sleep(0.02)
+    pytest.fail("Timed out waiting for condition")
+
+
+def _inotify_available():
+    try:
+        InotifyWatcher([os.getcwd()]).close()
+    except (OSError, AttributeError):
+        return False
+    return True
+
+
+def test_affected_phonebooks(tmp_path):
+    """Test mapping changed sidecars to their phonebooks."""
+    pbk = tmp_path / "office.pbk"
+    pbk.write_text(PBK_CONTENT)
+    changed = [
+        str(tmp_path / "office.cms"),
+        str(tmp_path / "orphan.cms"),
+        str(tmp_path / "deleted.pbk"),
+    ]
+    assert affected_phonebooks(changed) == {str(pbk)}
+
+
+def test_affected_phonebooks_ignores_case(tmp_path):
+    """Test that sidecars find phonebooks whose names differ in case."""
+    pbk = tmp_path / "Office.Pbk"
+    pbk.write_text(PBK_CONTENT)
+    changed = [str(tmp_path / "office.CMS"), str(tmp_path / "OFFICE.inf")]
+    assert affected_phonebooks(changed) == {str(pbk)}
+
+
+def test_polling_watcher_detects_changes(tmp_path):
+    """Test that new and modified files are reported once."""
+    (tmp_path / "a.pbk").write_text(PBK_CONTENT)
+    watcher = PollingWatcher([str(tmp_path)], interval=0.01)
+    assert watcher.poll(0.01) == set()
+
+    (tmp_path / "b.pbk").write_text(PBK_CONTENT)
+    (tmp_path / "notes.txt").write_text("ignored")
+    assert watcher.poll(0.01) == {str(tmp_path / "b.pbk")}
+    assert watcher.poll(0.01) == set()
+
+
+@pytest.mark.parametrize(
+    "polling",
+    [
+        True,
+        pytest.param(
+            False,
+            marks=pytest.mark.skipif(
+                not _inotify_available(), reason="inotify not available"
+            ),
+        ),
+    ],
+)
+def test_watch_reconverts_changes(tmp_path, polling):
+    """Test the initial pass and reconversion after pbk and sidecar changes."""
+    input_dir = tmp_path / "in"
+    (input_dir / "site").mkdir(parents=True)
+    (input_dir / "site" / "existing.pbk").write_text(PBK_CONTENT)
+    output_dir = tmp_path / "out"
+
+    results = []
+    stop = threading.Event()
+    with ConversionPool(workers=1) as pool:
+        thread = threading.Thread(
+            target=watch,
+            args=([str(input_dir)], str(output_dir), pool, results.append),
+            kwargs={
+                "stop": stop,
+                "debounce": 0.05,
+                "interval": 0.05,
+                "polling": polling,
+            },
+        )
+        thread.start()
+        try:
+            # Stale outputs are converted on start
+            _wait_for(lambda: len(results) == 1)
+            assert os.path.exists(output_dir / "site" / "existing.mobileconfig")
+
+            # New phonebooks in new directories are picked up
+            (input_dir / "new").mkdir()
+            time.sleep(0.1)
+            (input_dir / "new" / "added.pbk").write_text(PBK_CONTENT)
+            _wait_for(lambda: len(results) == 2)
+            assert results[-1].ok
+            assert results[-1].output_path == str(
+                output_dir / "new" / "added.mobileconfig"
+            )
+
+            # A sidecar change reconverts its phonebook
+            (input_dir / "site" / "existing.cms").write_text("[Test VPN]\n")
+            _wait_for(lambda: len(results) == 3)
+            assert results[-1].input_path == str(
+                input_dir / "site" / "existing.pbk"
+            )
+        finally:
+            stop.set()
+            thread.join()
+
+
+def test_watch_skips_up_to_date_outputs(tmp_path):
+    """Test that the initial pass leaves current outputs alone."""
+    input_dir = tmp_path / "in"
+    input_dir.mkdir()
+    pbk = input_dir / "office.pbk"
+    pbk.write_text(PBK_CONTENT)
+    output = tmp_path / "out" / "office.mobileconfig"
+    output.parent.mkdir()
+    output.write_text("current")
+    os.utime(pbk, ns=(0, 0))
+
+    results = []
+    stop = threading.Event()
+    stop.set()
+    with ConversionPool(workers=1) as pool:
+        watch([str(input_dir)], str(tmp_path / "out"), pool, results.append, stop)
+    assert results == []
+    assert output.read_text() == "current"
+
+
+def test_watch_reconverts_outputs_older_than_sidecars(tmp_path):
+    """Test that the initial pass sees sidecars whose names differ in case."""
+    input_dir = tmp_path / "in"
+    input_dir.mkdir()
+    pbk = input_dir / "office.pbk"
+    pbk.write_text(PBK_CONTENT)
+    cms = input_dir / "Office.CMS"
+    cms.write_text("[Test VPN]\nDialRetry=3\n")
+    output = tmp_path / "out" / "office.mobileconfig"
+    output.parent.mkdir()
+    output.write_text("stale")
+    os.utime(pbk, ns=(0, 0))
+    os.utime(output, ns=(1, 1))
+
+    results = []
+    stop = threading.Event()
+    stop.set()
+    with ConversionPool(workers=1) as pool:
+        watch([str(input_dir)], str(tmp_path / "out"), pool, results.append, stop)
+    assert [result.ok for result in results] == [True]
+    assert output.read_text() != "stale"
+
+
+def test_cli_watch_requires_directories(tmp_path, capsys):
+    """Test that watch mode rejects non-directory sources."""
+    from pbk2mobileconfig.cli import main
+
+    pbk = tmp_path / "office.pbk"
+    pbk.write_text(PBK_CONTENT)
+    assert main(["batch", str(pbk), "-o", str(tmp_path), "--watch"]) == 1
+    assert "requires directories" in capsys.readouterr().out